@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""Benchmark static package discovery against setuptools' finders on a large source tree.
+
+Usage::
+
+    PYTHONPATH=. python benchmarks/bench_find_packages.py --packages 5000 --modules 10 --repeat 5
+
+The setuptools timing includes importing setuptools, which pyprojectify never has to do.
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+from pyprojectify.packages import find_packages
+
+
+def generate_tree(root: Path, packages: int, modules: int) -> None:
+    """Write a src layout with packages nested three levels deep, each with modules files."""
+    for i in range(packages):
+        package = root / 'src' / 'top{}'.format(i % 10) / 'mid{}'.format(i % 100) / 'pkg{}'.format(i)
+        package.mkdir(parents=True, exist_ok=True)
+        for parent in (package, package.parent, package.parent.parent):
+            (parent / '__init__.py').touch()
+        for j in range(modules):
+            (package / 'module{}.py'.format(j)).touch()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--packages', type=int, default=5000)
+    parser.add_argument('--modules', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_tree(Path(tmp), args.packages, args.modules)
+        found = find_packages(tmp, 'src', exclude=['*.mid9*'])
+        static = min(timeit.repeat(lambda: find_packages(tmp, 'src', exclude=['*.mid9*']), number=1,
+                                   repeat=args.repeat))
+
+        # a fresh interpreter per run, so that the import of setuptools is paid as in a migration
+        code = ('import time; t = time.perf_counter(); import setuptools; '
+                'p = setuptools.find_packages({!r}, exclude=["*.mid9*"]); '
+                'print(time.perf_counter() - t, len(p))').format(str(Path(tmp) / 'src'))
+        runs = [subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.PIPE,
+                               universal_newlines=True).stdout.split() for _ in range(args.repeat)]
+        setuptools_time = min(float(seconds) for seconds, _ in runs)
+        if int(runs[0][1]) != len(found):
+            print('WARNING setuptools found {} packages, pyprojectify {}'.format(runs[0][1], len(found)))
+
+        print('{:<28}{:>10}'.format('finder', 'ms'))
+        print('{:<28}{:>10.1f}'.format('pyprojectify', static * 1000))
+        print('{:<28}{:>10.1f}'.format('setuptools (with import)', setuptools_time * 1000))
+        print('{} packages, {:.1f}x faster'.format(len(found), setuptools_time / static))
+
+
+if __name__ == '__main__':
+    main()
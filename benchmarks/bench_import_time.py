@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""Benchmark the import time of pyprojectify and the cold start of its console script.
+
+Usage::
+
+    PYTHONPATH=. python benchmarks/bench_import_time.py --repeat 10 --budget-ms 50
+
+The cold start of each command is the best wall clock time over --repeat runs, reported
+next to the startup time of a bare interpreter. The slowest imports are taken from
+python -X importtime. With --budget-ms, the script exits with status 1 when the
+overhead of pyprojectify --version over a bare interpreter exceeds the budget.
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+# Typing related imports
+from typing import List, Tuple
+
+COMMANDS_: Tuple[Tuple[str, List[str]], ...] = (
+    ('python -c pass', ['-c', 'pass']),
+    ('import pyprojectify', ['-c', 'import pyprojectify']),
+    ('import pyprojectify.pyprojectify', ['-c', 'import pyprojectify.pyprojectify']),
+    ('pyprojectify --version', ['-c', 'from pyprojectify.__main__ import main; main(["--version"])']),
+    ('pyprojectify --help', ['-c', 'import sys; from pyprojectify.__main__ import main; sys.exit(main(["--help"]))']),
+)
+
+
+def wall_time(args: List[str], repeat: int) -> float:
+    """Return the best wall clock time in milliseconds of running the interpreter with args."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, stdout=subprocess.DEVNULL, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def slowest_imports(statement: str, top: int) -> List[Tuple[int, str]]:
+    """Return the cumulative import time in microseconds of the slowest modules imported by statement."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    timings = {}
+    print('{:<36} {:>10}'.format('command', 'best ms'))
+    for label, command in COMMANDS_:
+        timings[label] = wall_time(command, args.repeat)
+        print('{:<36} {:>10.1f}'.format(label, timings[label]))
+
+    print('\nslowest imports of pyprojectify --help')
+    for cumulative, name in slowest_imports('import pyprojectify.cli', args.top):
+        print('{:>10.1f} ms  {}'.format(cumulative / 1000, name))
+
+    overhead = timings['pyprojectify --version'] - timings['python -c pass']
+    if args.budget_ms is not None and overhead > args.budget_ms:
+        print('\npyprojectify --version costs {:.1f} ms over the interpreter startup, budget is {:.1f} ms'.format(
+            overhead, args.budget_ms))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
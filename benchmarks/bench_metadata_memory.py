@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""Benchmark the memory held per project by the metadata IR against the pyproject mappings.
+
+Usage::
+
+    PYTHONPATH=. python benchmarks/bench_metadata_memory.py --projects 100000
+
+Projects are synthetic setup() keyword arguments drawn from pools of classifiers, licenses
+and requirements, with every string a fresh object as when it is parsed from a setup.py.
+"""
+
+import argparse
+import gc
+import random
+import tracemalloc
+
+# Typing related imports
+from typing import Any, Callable, Dict, List
+
+from pyprojectify.metadata import ProjectMetadata
+from pyprojectify.pyprojectify import PyProject
+
+CLASSIFIERS_ = ['Development Status :: {} - Beta'.format(i) for i in range(1, 7)] + [
+    'Programming Language :: Python :: 3.{}'.format(i) for i in range(6, 13)] + [
+    'License :: OSI Approved :: MIT License', 'Intended Audience :: Developers', 'Natural Language :: English']
+LICENSES_ = ['MIT', 'MIT license', 'BSD', 'Apache 2.0', 'GPLv3']
+REQUIREMENTS_ = ['click>=7', 'requests>=2.20', 'toml==0.10.2', 'attrs', 'six', 'numpy>=1.19', 'pyyaml',
+                 'typing-extensions; python_version<"3.8"', 'jinja2>=2.11,<4']
+
+
+def fresh(text: str) -> str:
+    """Return a copy of text that is a distinct object, as strings read from files are."""
+    return (text + '.')[:-1]
+
+
+def setup_kwargs(i: int, rng: random.Random) -> Dict[str, Any]:
+    return {
+        'name': 'project{}'.format(i), 'version': '1.{}.0'.format(i % 50),
+        'author': fresh('Team {}'.format(i % 20)), 'author_email': fresh('team{}@example.com'.format(i % 20)),
+        'url': 'https://example.com/project{}'.format(i), 'license': fresh(rng.choice(LICENSES_)),
+        'description': 'Project number {} of the monorepo.'.format(i),
+        'classifiers': [fresh(c) for c in rng.sample(CLASSIFIERS_, 8)],
+        'python_requires': fresh('>=3.6'),
+        'install_requires': [fresh(r) for r in rng.sample(REQUIREMENTS_, 4)],
+        'extras_require': {fresh('test'): [fresh('pytest>=3')]},
+        'entry_points': {'console_scripts': ['project{0}=project{0}.cli:main'.format(i)]},
+        'packages': ['project{}'.format(i), 'project{}.sub'.format(i)],
+    }
+
+
+def measure(build: Callable[[Dict[str, Any]], Any], projects: int) -> float:
+    """Return the bytes held per project by what build returns, once its inputs are released."""
+    rng = random.Random(0)
+    inputs = [setup_kwargs(i, rng) for i in range(projects)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held: List[Any] = [build(kwargs) for kwargs in inputs]
+    del inputs
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del held
+    return size / projects
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--projects', type=int, default=100000)
+    args = parser.parse_args()
+
+    ir = measure(ProjectMetadata.from_setup, args.projects)
+    project = PyProject()
+    mapping = measure(lambda kwargs: project._emit(ProjectMetadata.from_setup(kwargs), None, '<benchmark>'),
+                      args.projects)
+    print('{:<28}{:>14}'.format('representation', 'bytes/project'))
+    print('{:<28}{:>14.0f}'.format('ProjectMetadata', ir))
+    print('{:<28}{:>14.0f}'.format('pyproject mapping', mapping))
+    print('{} projects, {:.1f}x smaller'.format(args.projects, mapping / ir))
+
+
+if __name__ == '__main__':
+    main()
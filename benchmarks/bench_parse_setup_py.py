@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+
+"""Benchmark the parse time of large generated setup.py files.
+
+Usage::
+
+    PYTHONPATH=. python benchmarks/bench_parse_setup_py.py --sizes 100 1000 10000 --repeat 5
+"""
+
+import argparse
+import logging
+import tempfile
+import timeit
+from pathlib import Path
+
+from corpus import generate_setup_py
+from pyprojectify.pyprojectify import PyProject
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print('{:>8} {:>12} {:>14}'.format('size', 'bytes', 'ms per file'))
+        for size in args.sizes:
+            setup_py = Path(tmp) / 'setup_{}.py'.format(size)
+            setup_py.write_text(generate_setup_py(size))
+            project = PyProject()
+            timings = timeit.repeat(lambda: project._parse_setup_py(setup_py), number=1, repeat=args.repeat)
+            print('{:>8} {:>12} {:>14.3f}'.format(size, setup_py.stat().st_size, min(timings) * 1000))
+
+
+if __name__ == '__main__':
+    main()
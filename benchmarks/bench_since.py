@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+"""Benchmark migrating the projects changed since a revision against scanning a whole monorepo.
+
+Usage::
+
+    PYTHONPATH=. python benchmarks/bench_since.py --packages 3000 --changed 2
+
+Only discovery is timed for the full scan, the run with --since includes the migrations.
+"""
+
+import argparse
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from pyprojectify.batch import migrate_many
+from pyprojectify.discovery import discover_projects
+
+SETUP_PY_ = "from setuptools import setup\nsetup(name='pkg{0}', version='1.0', packages=['pkg{0}'])\n"
+
+
+def git(repo: Path, *args: str) -> None:
+    subprocess.run(['git', '-c', 'user.name=bench', '-c', 'user.email=bench@example.com', *args], cwd=str(repo),
+                   check=True, stdout=subprocess.DEVNULL)
+
+
+def generate_repo(root: Path, packages: int, changed: int) -> None:
+    """Commit packages projects, then change the setup.py of changed of them on a branch."""
+    for i in range(packages):
+        project = root / 'packages' / 'pkg{}'.format(i)
+        (project / 'pkg{}'.format(i)).mkdir(parents=True)
+        (project / 'pkg{}'.format(i) / '__init__.py').touch()
+        (project / 'setup.py').write_text(SETUP_PY_.format(i))
+    git(root, 'init', '-q', '-b', 'main')
+    git(root, 'add', '.')
+    git(root, 'commit', '-q', '-m', 'initial')
+    git(root, 'checkout', '-q', '-b', 'feature')
+    for i in range(0, packages, max(packages // changed, 1))[:changed]:
+        setup_py = root / 'packages' / 'pkg{}'.format(i) / 'setup.py'
+        setup_py.write_text(setup_py.read_text().replace("'1.0'", "'1.1'"))
+    git(root, 'commit', '-q', '-am', 'bump')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--packages', type=int, default=3000)
+    parser.add_argument('--changed', type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        generate_repo(root, args.packages, args.changed)
+
+        start = time.perf_counter()
+        scanned = sum(1 for _ in discover_projects([root]))
+        scan = time.perf_counter() - start
+
+        start = time.perf_counter()
+        migrated = sum(1 for _ in migrate_many([root], jobs=1, since='main'))
+        since = time.perf_counter() - start
+
+        print('{:<32}{:>10}{:>10}'.format('run', 'projects', 'ms'))
+        print('{:<32}{:>10}{:>10.1f}'.format('full scan (discovery only)', scanned, scan * 1000))
+        print('{:<32}{:>10}{:>10.1f}'.format('--since main (with migration)', migrated, since * 1000))
+
+
+if __name__ == '__main__':
+    main()
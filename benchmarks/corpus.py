@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+"""Generator of a synthetic corpus of setuptools projects.
+
+Usage::
+
+    python benchmarks/corpus.py --count 2000 --seed 0 /tmp/corpus
+
+Projects range from tiny ones with a handful of keywords to huge generated ones with
+thousands of classifiers and package_data entries. The corpus only depends on --count
+and --seed, so that benchmark runs on the same arguments are comparable.
+"""
+
+import argparse
+import random
+from pathlib import Path
+
+# Typing related imports
+from typing import List, Optional, Tuple
+
+# (name, probability, number of generated classifiers/requirements/package_data entries)
+SIZE_CLASSES_: Tuple[Tuple[str, float, int], ...] = (
+    ('tiny', 0.6, 3),
+    ('medium', 0.3, 30),
+    ('large', 0.09, 300),
+    ('huge', 0.01, 3000),
+)
+
+TOPICS_ = ('Software Development :: Libraries', 'Utilities', 'Internet :: WWW/HTTP', 'Scientific/Engineering',
+           'System :: Networking', 'Text Processing :: Linguistic')
+LICENSES_ = ('MIT license', 'BSD', 'Apache Software License 2.0', 'GNU General Public License v3')
+
+
+def generate_setup_py(size: int, name: str = 'generated', rng: Optional[random.Random] = None) -> str:
+    """Return a setup.py with size classifiers, requirements and package_data entries."""
+    rng = rng or random.Random(0)
+    lines = ['#!/usr/bin/env python', '', '"""The setup script."""', '',
+             'import os', 'from setuptools import setup, find_packages', '',
+             "with open('README.rst') as readme_file:", '    readme = readme_file.read()', '']
+    lines.append('requirements = [')
+    lines.extend("    'dependency-{0}>={1}.{0}',".format(i, rng.randint(0, 9)) for i in range(size))
+    lines.append(']')
+    lines.append("test_requirements = ['pytest>=3', ]")
+    lines.append('classifiers = [')
+    lines.append("    'Development Status :: {} - Beta',".format(rng.randint(1, 5)))
+    lines.extend("    'Topic :: {} :: Generated {}',".format(rng.choice(TOPICS_), i) for i in range(size))
+    lines.append(']')
+    lines.append('package_data = {')
+    lines.extend("    '{0}.sub{1}': ['data/*.json', 'templates/{1}/*.html'],".format(name, i) for i in range(size))
+    lines.append('}')
+    lines.append('')
+    lines.append('setup(')
+    lines.append("    name='{}',".format(name))
+    lines.append("    version='{}.{}.{}',".format(rng.randint(0, 3), rng.randint(0, 20), rng.randint(0, 9)))
+    lines.append("    author='Generated Author {}',".format(rng.randint(0, 99)))
+    lines.append("    author_email='author@example.com',")
+    lines.append("    python_requires='>=3.{}',".format(rng.randint(6, 9)))
+    lines.append("    description='Generated project {}',".format(name))
+    lines.append("    long_description=readme,")
+    lines.append("    license='{}',".format(rng.choice(LICENSES_)))
+    lines.append("    url='https://example.com/{}',".format(name))
+    lines.append("    keywords='{}',".format(name))
+    lines.append('    classifiers=classifiers,')
+    lines.append('    install_requires=requirements,')
+    lines.append("    extras_require={'test': test_requirements, 'docs': ['sphinx']},")
+    lines.append("    entry_points={'console_scripts': ['" + name + "=" + name + ".cli:main']},")
+    lines.append("    packages=find_packages(include=['" + name + "', '" + name + ".*']),")
+    lines.append('    package_data=package_data,')
+    lines.append('    zip_safe=False,')
+    lines.append(')')
+    return '\n'.join(lines) + '\n'
+
+
+def generate_setup_cfg(rng: random.Random) -> str:
+    """Return a setup.cfg mixing tool sections with declarative metadata."""
+    return '\n'.join([
+        '[metadata]', 'license_files = LICENSE', '',
+        '[bumpversion]', 'current_version = {}.0.0'.format(rng.randint(0, 5)), 'commit = True', '',
+        '[bdist_wheel]', 'universal = 1', '',
+        '[flake8]', 'exclude = docs', '',
+        '[tool:pytest]', "collect_ignore = ['setup.py']", '',
+    ])
+
+
+def generate_manifest_in(size: int) -> str:
+    """Return a MANIFEST.in with about size rules."""
+    lines = ['# generated MANIFEST.in', 'include AUTHORS.rst', 'include README.rst', 'include LICENSE']
+    lines.extend('recursive-include data{} *.json *.csv'.format(i) for i in range(size // 3))
+    lines.extend('exclude scratch{}.txt'.format(i) for i in range(size // 3))
+    lines.append('recursive-exclude * __pycache__')
+    lines.append('recursive-exclude * *.py[co]')
+    return '\n'.join(lines) + '\n'
+
+
+def generate_corpus(root: Path, count: int, seed: int = 0) -> List[Path]:
+    """Write count projects under root and return their directories."""
+    rng = random.Random(seed)
+    thresholds = []
+    cumulative = 0.0
+    for size_class, probability, size in SIZE_CLASSES_:
+        cumulative += probability
+        thresholds.append((cumulative, size_class, size))
+
+    projects = []
+    for i in range(count):
+        draw = rng.random()
+        size_class, size = next(((c, s) for t, c, s in thresholds if draw <= t), thresholds[-1][1:])
+        name = 'pkg_{}_{}'.format(size_class, i)
+        project = root / name
+        (project / name).mkdir(parents=True, exist_ok=True)
+        (project / name / '__init__.py').write_text('"""{}"""\n'.format(name))
+        (project / 'README.rst').write_text('{0}\n{1}\n\nGenerated project.\n'.format(name, '=' * len(name)))
+        (project / 'setup.py').write_text(generate_setup_py(size, name, rng))
+        if rng.random() < 0.5:
+            (project / 'setup.cfg').write_text(generate_setup_cfg(rng))
+        if rng.random() < 0.7:
+            (project / 'MANIFEST.in').write_text(generate_manifest_in(size))
+        projects.append(project)
+    return projects
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('root', type=Path)
+    args = parser.parse_args()
+    projects = generate_corpus(args.root, args.count, args.seed)
+    print('Generated {} projects in {}'.format(len(projects), args.root))
+
+
+if __name__ == '__main__':
+    main()
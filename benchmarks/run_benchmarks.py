@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+"""Benchmark suite measuring per-stage and end to end throughput against a recorded baseline.
+
+Usage::
+
+    PYTHONPATH=. python benchmarks/run_benchmarks.py --count 500 --save-baseline
+    PYTHONPATH=. python benchmarks/run_benchmarks.py --count 500 --threshold 0.2
+
+The suite generates a synthetic corpus (see corpus.py), then measures:
+
+* the mean time of each migration stage per project, migrating in a single process,
+* the end to end time of a cold batch run, where every pyproject.toml has to be written,
+* the end to end time of a no-op batch run, where every pyproject.toml is up to date.
+
+Results are compared to the baseline file and the script exits with status 1 when a
+metric is slower than its baseline by more than --threshold (a fraction). Baselines are
+only comparable on the same machine with the same --count, --seed and --jobs.
+"""
+
+import argparse
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Typing related imports
+from typing import Any, Dict, List
+
+from corpus import generate_corpus
+from pyprojectify.batch import migrate_many
+from pyprojectify.profiling import StageProfile
+
+BASELINE_ = Path(__file__).with_name('baseline.json')
+
+
+def run_suite(root: Path, jobs: int) -> Dict[str, float]:
+    """Return the metrics of the suite on the corpus in root, all in seconds."""
+    for output in root.glob('*/pyproject.toml'):
+        output.unlink()
+
+    stage_profile = StageProfile()
+    for result in migrate_many([root], jobs=1, profile='stages'):
+        if result.profile is not None:
+            stage_profile.merge(result.profile)
+    metrics = {'stage.{}.mean'.format(stage): stats['mean']
+               for stage, stats in stage_profile.as_dict()['stages'].items()}
+
+    for output in root.glob('*/pyproject.toml'):
+        output.unlink()
+    start = time.perf_counter()
+    results = list(migrate_many([root], jobs=jobs))
+    metrics['e2e.cold'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    list(migrate_many([root], jobs=jobs))
+    metrics['e2e.noop'] = time.perf_counter() - start
+
+    errors = [result for result in results if result.status == 'error']
+    if errors:
+        print('WARNING {} of {} projects failed, first error: {}'.format(len(errors), len(results), errors[0].error))
+    return metrics
+
+
+def compare(metrics: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """Return a description of every metric slower than its baseline by more than threshold."""
+    regressions = []
+    for name, value in sorted(metrics.items()):
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        change = value / reference - 1
+        if change > threshold:
+            regressions.append('{}: {:.6f}s vs {:.6f}s baseline (+{:.0%})'.format(name, value, reference, change))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=500, help='number of generated projects')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes of the end to end runs')
+    parser.add_argument('--threshold', type=float, default=0.25, help='tolerated slowdown, 0.25 is 25%%')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_)
+    parser.add_argument('--save-baseline', action='store_true', help='record the results as the new baseline')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        generate_corpus(root, args.count, args.seed)
+        metrics = run_suite(root, args.jobs)
+
+    print('{:<28} {:>14}'.format('metric', 'seconds'))
+    for name, value in sorted(metrics.items()):
+        print('{:<28} {:>14.6f}'.format(name, value))
+    print('{:<28} {:>14.1f}'.format('e2e.cold projects/s', args.count / metrics['e2e.cold']))
+
+    if args.save_baseline:
+        record: Dict[str, Any] = {'machine': platform.platform(), 'python': platform.python_version(),
+                                  'count': args.count, 'seed': args.seed, 'jobs': args.jobs, 'metrics': metrics}
+        args.baseline.write_text(json.dumps(record, indent=2, sort_keys=True) + '\n')
+        print('Baseline saved to {}'.format(args.baseline))
+        return
+
+    if not args.baseline.exists():
+        print('No baseline at {}, run with --save-baseline to record one'.format(args.baseline))
+        return
+    baseline = json.loads(args.baseline.read_text())
+    if (baseline.get('count'), baseline.get('seed')) != (args.count, args.seed):
+        print('Baseline was recorded with --count {} --seed {}, not comparable'.format(
+            baseline.get('count'), baseline.get('seed')))
+        sys.exit(2)
+    regressions = compare(metrics, baseline['metrics'], args.threshold)
+    for regression in regressions:
+        print('REGRESSION ' + regression)
+    if regressions:
+        sys.exit(1)
+    print('No regression beyond {:.0%}'.format(args.threshold))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+"""Entry point of the pyprojectify console script.
+
+--version is answered without importing click or the migration machinery, everything else is
+handed over to pyprojectify.cli.
+"""
+import sys
+
+
+# the annotation is quoted so that typing, which costs more than the rest of --version, is not imported
+def main(argv: 'list[str] | None' = None) -> int:
+    """Console script for pyprojectify."""
+    args = sys.argv[1:] if argv is None else argv
+    if args == ['--version']:
+        from . import __version__
+        sys.stdout.write('pyprojectify, version {}\n'.format(__version__))
+        return 0
+
+    from .cli import main as cli_main
+    return cli_main.main(args=args, prog_name='pyprojectify')
+
+
+if __name__ == "__main__":
+    sys.exit(main())  # pragma: no cover
@@ -0,0 +1,172 @@
+"""Sandbox worker executing setup.py files with a stubbed setup().
+
+This file is run as a script by pyprojectify.sandbox.SandboxPool and must not import
+pyprojectify. It reads one JSON request per line on stdin and answers with one JSON line:
+
+    {"path": "/project/setup.py", "timeout": 10.0, "memory_limit": 536870912}
+    {"kwargs": {...}} or {"error": "..."}
+
+setuptools is imported once at startup. On POSIX every request runs in a process forked
+from this warm interpreter, with CPU time and address space limits; elsewhere the request
+runs in the worker itself, which then asks to be recycled.
+"""
+
+import json
+import os
+import runpy
+import selectors
+import signal
+import sys
+import time
+
+# Typing related imports
+from typing import Any, Dict, Optional
+
+# this script lives inside the pyprojectify package, whose modules must not shadow the ones of setup.py
+if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(os.path.abspath(__file__)):
+    del sys.path[0]
+
+try:
+    import setuptools
+except ImportError:  # pragma: no cover
+    setuptools = None
+try:
+    import distutils.core
+except ImportError:  # pragma: no cover
+    distutils = None  # type: ignore[assignment]
+
+
+class _SetupCalled(BaseException):
+    """Raised by the stubbed setup() to stop the execution of setup.py."""
+
+
+def _stub_setup(*args: Any, **kwargs: Any) -> None:
+    raise _SetupCalled(kwargs)
+
+
+def _jsonable(value: Any) -> Any:
+    """Convert value to JSON types, raising TypeError for anything else."""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(_jsonable(v) for v in value)
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, os.PathLike):
+        return os.fspath(value)
+    raise TypeError(type(value).__name__)
+
+
+def _execute(path: str) -> Dict[str, Any]:
+    """Run setup.py and return the JSON serializable keyword arguments given to setup()."""
+    directory = os.path.dirname(path)
+    os.chdir(directory)
+    sys.path.insert(0, directory)
+    sys.argv = [path, '--version']
+    if setuptools is not None:
+        setuptools.setup = _stub_setup
+    if distutils is not None:
+        distutils.core.setup = _stub_setup  # type: ignore[assignment]
+    try:
+        runpy.run_path(path, run_name='__main__')
+    except _SetupCalled as e:
+        kwargs = e.args[0]
+    else:
+        raise RuntimeError('setup() was not called')
+
+    result: Dict[str, Any] = {}
+    for key, value in kwargs.items():
+        try:
+            result[key] = _jsonable(value)
+        except TypeError:
+            continue  # e.g. cmdclass, ext_modules
+    return result
+
+
+def _limit_resources(timeout: float, memory_limit: Optional[int]) -> None:
+    try:
+        import resource
+    except ImportError:  # pragma: no cover
+        return
+    cpu = int(timeout) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    if memory_limit:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+def _run_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        return {'kwargs': _execute(request['path'])}
+    except BaseException as e:
+        return {'error': '{}: {}'.format(type(e).__name__, e)}
+
+
+def _run_forked(request: Dict[str, Any]) -> Dict[str, Any]:
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+        try:
+            _limit_resources(request['timeout'], request.get('memory_limit'))
+            result = _run_request(request)
+            data = json.dumps(result).encode()
+        except BaseException as e:
+            data = json.dumps({'error': repr(e)}).encode()
+        while data:
+            data = data[os.write(write_fd, data):]
+        os._exit(0)
+
+    os.close(write_fd)
+    chunks = []
+    deadline = time.monotonic() + request['timeout']
+    selector = selectors.DefaultSelector()
+    selector.register(read_fd, selectors.EVENT_READ)
+    timed_out = False
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not selector.select(remaining):
+            timed_out = True
+            break
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    selector.close()
+    os.close(read_fd)
+    if timed_out:
+        os.kill(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+
+    if timed_out:
+        return {'error': 'TimeoutError: setup.py did not finish in {}s'.format(request['timeout'])}
+    try:
+        return json.loads(b''.join(chunks).decode())  # type: ignore[no-any-return]
+    except ValueError:
+        return {'error': 'setup.py execution was killed, most likely by a resource limit'}
+
+
+def main() -> None:
+    # keep the real stdout for the protocol and silence whatever setup.py prints
+    protocol = os.fdopen(os.dup(1), 'w')
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    sys.stdout = open(os.devnull, 'w')
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        if hasattr(os, 'fork'):
+            result = _run_forked(request)
+        else:  # pragma: no cover
+            result = _run_request(request)
+            result['recycle'] = True
+        protocol.write(json.dumps(result) + '\n')
+        protocol.flush()
+        if result.get('recycle'):
+            break
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""Batch migration of many setuptools projects."""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+# Typing related imports
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from .cache import MigrationCache
+from .discovery import ProjectEntry, discover_archives, discover_projects
+from .metadata import ProjectMetadata
+from .profiling import StageProfile
+from .pyprojectify import PyProject
+from .utils import logger
+
+
+class MigrationResult(NamedTuple):
+    """Outcome of the migration of a single project."""
+
+    path: str
+    status: str
+    warnings: Tuple[str, ...] = ()
+    error: Optional[str] = None
+    cached: bool = False
+    profile: Optional[Dict[Any, Any]] = None
+    pyproject: Optional[str] = None
+    metadata: Optional[ProjectMetadata] = None
+    differences: Tuple[Any, ...] = ()
+
+
+class _WarningCollector(logging.Handler):
+    """Logging handler collecting the warnings emitted during a migration."""
+
+    def __init__(self) -> None:
+        super().__init__(level=logging.WARNING)
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.levelno == logging.WARNING:
+            self.messages.append(record.getMessage())
+
+
+def migrate_project(project: Union[str, Path, ProjectEntry], options: Optional[Dict[str, Any]] = None,
+                    cache: Optional[MigrationCache] = None, profile: Optional[str] = None) -> MigrationResult:
+    """Migrate a single project, reporting failures instead of raising them.
+
+    options are passed as keyword arguments to PyProject. When a cache is given, a project
+    whose inputs are unchanged since its last successful migration is not migrated again.
+    profile is 'stages' to time each migration stage or 'cprofile' to run the migration under
+    cProfile, the statistics are returned in the profile field of the result.
+    """
+    package_path = project.path if isinstance(project, ProjectEntry) else project
+    package_dir = Path(package_path)
+    key = None
+    if cache is not None:
+        try:
+            key = cache.key(package_dir, options)
+        except OSError as e:
+            return MigrationResult(str(package_path), 'error', (), repr(e))
+        entry = cache.get(key, package_dir)
+        if entry is not None:
+            warnings = tuple(entry['warnings'])
+            return MigrationResult(str(package_path), 'warning' if warnings else 'ok', warnings, cached=True)
+
+    if isinstance(project, ProjectEntry):
+        pyproject = PyProject.from_entry(project, **(options or {}))
+    else:
+        pyproject = PyProject(package_dir, **(options or {}))
+    _, warnings, error, stats = _run_instrumented(pyproject, pyproject.migrate, profile)
+    if error is not None:
+        return MigrationResult(str(package_path), 'error', warnings, error, profile=stats)
+    if cache is not None and key is not None:
+        cache.put(key, package_dir, warnings)
+    return MigrationResult(str(package_path), 'warning' if warnings else 'ok', warnings, profile=stats)
+
+
+def convert_project(project: Union[str, Path, ProjectEntry], options: Optional[Dict[str, Any]] = None,
+                    profile: Optional[str] = None) -> MigrationResult:
+    """Read the metadata of a project without writing anything, it is returned in the metadata field."""
+    package_path = project.path if isinstance(project, ProjectEntry) else project
+    if isinstance(project, ProjectEntry):
+        pyproject = PyProject.from_entry(project, **(options or {}))
+    else:
+        pyproject = PyProject(Path(package_path), **(options or {}))
+    metadata, warnings, error, stats = _run_instrumented(pyproject, pyproject.to_metadata, profile)
+    if error is not None:
+        return MigrationResult(str(package_path), 'error', warnings, error, profile=stats)
+    return MigrationResult(str(package_path), 'warning' if warnings else 'ok', warnings, profile=stats,
+                           metadata=metadata)
+
+
+def verify_project(project: Union[str, Path, ProjectEntry], options: Optional[Dict[str, Any]] = None,
+                   profile: Optional[str] = None) -> MigrationResult:
+    """Compare the core metadata of setup.py and of the generated pyproject.toml of a project.
+
+    The fields that differ are returned in the differences field, as verify.FieldDiff tuples.
+    """
+    package_path = project.path if isinstance(project, ProjectEntry) else project
+    if isinstance(project, ProjectEntry):
+        pyproject = PyProject.from_entry(project, **(options or {}))
+    else:
+        pyproject = PyProject(Path(package_path), **(options or {}))
+    differences, warnings, error, stats = _run_instrumented(pyproject, pyproject.verify, profile)
+    if error is not None:
+        return MigrationResult(str(package_path), 'error', warnings, error, profile=stats)
+    return MigrationResult(str(package_path), 'warning' if warnings else 'ok', warnings, profile=stats,
+                           differences=tuple(differences))
+
+
+def migrate_archive(archive: Union[str, Path], options: Optional[Dict[str, Any]] = None,
+                    profile: Optional[str] = None) -> MigrationResult:
+    """Convert an sdist archive in memory, the pyproject.toml is returned in the pyproject field."""
+    pyproject = PyProject(**(options or {}))
+    rendered, warnings, error, stats = _run_instrumented(pyproject, lambda: pyproject.convert_archive(archive),
+                                                         profile)
+    if error is not None:
+        return MigrationResult(str(archive), 'error', warnings, error, profile=stats)
+    return MigrationResult(str(archive), 'warning' if warnings else 'ok', warnings, profile=stats, pyproject=rendered)
+
+
+def _output_path(path: Path, roots: Iterable[Union[str, Path]]) -> Path:
+    """Return the path of the project at path relative to the parent of the root it was found under."""
+    for root in roots:
+        root = Path(root).resolve()
+        if path.resolve() == root or root in path.resolve().parents:
+            return Path(root.name) / path.resolve().relative_to(root)
+    return Path(path.name)
+
+
+def render_project(project: Union[str, Path, ProjectEntry], backends: Iterable[str], output_dir: Union[str, Path],
+                   roots: Iterable[Union[str, Path]] = (), options: Optional[Dict[str, Any]] = None,
+                   profile: Optional[str] = None) -> MigrationResult:
+    """Parse a project once and write its pyproject.toml for each backend to output_dir.
+
+    The file of a backend is OUTPUT_DIR/PROJECT/BACKEND.toml, where PROJECT is the path of the
+    project relative to the parent of the root it was found under.
+    """
+    package_path = project.path if isinstance(project, ProjectEntry) else project
+    if isinstance(project, ProjectEntry):
+        pyproject = PyProject.from_entry(project, **(options or {}))
+    else:
+        pyproject = PyProject(Path(package_path), **(options or {}))
+    rendered, warnings, error, stats = _run_instrumented(pyproject, lambda: pyproject.render(backends), profile)
+    if error is not None:
+        return MigrationResult(str(package_path), 'error', warnings, error, profile=stats)
+    target = Path(output_dir) / _output_path(Path(package_path), roots)
+    target.mkdir(parents=True, exist_ok=True)
+    for backend, text in rendered.items():
+        PyProject._save_toml(text, target / '{}.toml'.format(backend))
+    return MigrationResult(str(package_path), 'warning' if warnings else 'ok', warnings, profile=stats)
+
+
+def _run_instrumented(pyproject: PyProject, func: Callable[[], Any],
+                      profile: Optional[str]) -> Tuple[Any, Tuple[str, ...], Optional[str], Optional[Dict[Any, Any]]]:
+    """Call func, returning its value, the warnings it logged, its error if any and its profile."""
+    stage_profile = profiler = None
+    if profile == 'stages':
+        stage_profile = StageProfile()
+        stage_profile.projects = 1
+        pyproject.add_hook(stage_profile)
+    elif profile == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+
+    collector = _WarningCollector()
+    logger.addHandler(collector)
+    value = error = None
+    try:
+        if profiler is not None:
+            value = profiler.runcall(func)
+        else:
+            value = func()
+    except Exception as e:
+        error = repr(e)
+    finally:
+        logger.removeHandler(collector)
+
+    stats: Optional[Dict[Any, Any]] = None
+    if stage_profile is not None:
+        stats = stage_profile.as_dict()
+    elif profiler is not None:
+        profiler.create_stats()
+        stats = profiler.stats
+    return value, tuple(collector.messages), error, stats
+
+
+def _run_all(func: Callable[..., MigrationResult], items: List[Any], jobs: Optional[int],
+             *args: Any) -> Iterator[MigrationResult]:
+    """Call func(item, *args) for every item, in a process pool unless jobs is 1."""
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs <= 1 or len(items) <= 1:
+        for item in items:
+            yield func(item, *args)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(items))) as executor:
+        futures = {executor.submit(func, item, *args): item for item in items}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # the worker itself died, e.g. killed by the OS
+                item = futures[future]
+                yield MigrationResult(str(getattr(item, 'path', item)), 'error', (), repr(e))
+
+
+def migrate_many(roots: Iterable[Union[str, Path]], jobs: Optional[int] = None,
+                 options: Optional[Dict[str, Any]] = None, cache: Optional[MigrationCache] = None,
+                 ignore: Iterable[str] = (), profile: Optional[str] = None,
+                 since: Optional[str] = None) -> Iterator[MigrationResult]:
+    """Migrate every project found under roots, yielding results as they complete.
+
+    With jobs=1 the projects are migrated in the current process, otherwise a process pool
+    with jobs workers (defaulting to the number of cores) is used. ignore holds extra
+    gitignore-style patterns of directories to skip during discovery and profile is passed
+    to migrate_project. With since, a git revision, only the projects with files changed
+    since that revision are migrated, and the roots are not scanned. They still go through
+    the cache, whose key covers every file the migration reads.
+    """
+    if since is not None:
+        from .vcs import changed_projects
+
+        projects = list(changed_projects(roots, since, ignore))
+    else:
+        projects = list(discover_projects(roots, ignore))
+    try:
+        yield from _run_all(migrate_project, projects, jobs, options, cache, profile)
+    finally:
+        if cache is not None:
+            cache.prune()
+
+
+def migrate_archives(paths: Iterable[Union[str, Path]], jobs: Optional[int] = None,
+                     options: Optional[Dict[str, Any]] = None, profile: Optional[str] = None) -> Iterator[MigrationResult]:
+    """Convert every sdist archive given or found under paths, yielding results as they complete.
+
+    jobs and profile are used as with migrate_many. Archives are not cached.
+    """
+    archives = list(discover_archives(paths))
+    yield from _run_all(migrate_archive, archives, jobs, options, profile)
+
+
+def render_many(roots: Iterable[Union[str, Path]], backends: Iterable[str], output_dir: Union[str, Path],
+                jobs: Optional[int] = None, options: Optional[Dict[str, Any]] = None,
+                ignore: Iterable[str] = ()) -> Iterator[MigrationResult]:
+    """Render every project found under roots for each backend, yielding results as they complete.
+
+    jobs is used as with migrate_many, each project is parsed once whatever the number of backends.
+    """
+    roots = list(roots)
+    projects = list(discover_projects(roots, ignore))
+    yield from _run_all(render_project, projects, jobs, tuple(backends), str(output_dir), roots, options)
+
+
+def verify_many(roots: Iterable[Union[str, Path]], jobs: Optional[int] = None,
+                options: Optional[Dict[str, Any]] = None, ignore: Iterable[str] = ()) -> Iterator[MigrationResult]:
+    """Verify every project found under roots, yielding results as they complete.
+
+    jobs is used as with migrate_many.
+    """
+    projects = list(discover_projects(roots, ignore))
+    yield from _run_all(verify_project, projects, jobs, options)
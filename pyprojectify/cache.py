@@ -0,0 +1,179 @@
+"""On-disk cache of migration results keyed by the content of the project inputs and its file listing."""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+# Typing related imports
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from . import __version__
+from .utils import logger
+
+INPUT_FILES_: Tuple[str, ...] = ('setup.py', 'setup.cfg', 'MANIFEST.in')
+# written by a migration, left out of the files of the project
+OUTPUT_FILES_: Tuple[str, ...] = ('pyproject.toml', 'pyproject.toml.bak')
+CACHE_FORMAT_ = 2
+DEFAULT_MAX_SIZE_ = 64 * 1024 * 1024
+
+
+def default_cache_dir() -> Path:
+    """Return the per-user cache directory, honouring XDG_CACHE_HOME."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(base) / 'pyprojectify'
+
+
+class MigrationCache:
+    """Cache of migration results with a size limit and least recently used eviction.
+
+    An entry records the warnings of a successful migration together with the size and
+    modification time of the pyproject.toml it produced, so that a hit can be confirmed
+    with a single stat instead of re-reading the output.
+    """
+
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = None, max_size: int = DEFAULT_MAX_SIZE_) -> None:
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.max_size = max_size
+        return
+
+    def __repr__(self) -> str:
+        return "MigrationCache({!r})".format(str(self.cache_dir))
+
+    @staticmethod
+    def key(package_dir: Path, options: Optional[Dict[str, Any]] = None) -> str:
+        """Hash the project inputs, the tool version and the migration options.
+
+        Besides setup.py, setup.cfg and MANIFEST.in, the inputs are the files read by the attr:
+        and file: directives of setup.cfg and the names of the files of the project, which
+        find_packages(), MANIFEST.in and the readme files are resolved against.
+        """
+        digest = hashlib.sha256()
+        digest.update('{}\0{}\0{}\0'.format(CACHE_FORMAT_, __version__,
+                                            json.dumps(options or {}, sort_keys=True, default=str)).encode())
+        contents: Dict[str, Optional[bytes]] = {}
+        for name in INPUT_FILES_:
+            try:
+                with open(package_dir / name, 'rb') as f:
+                    contents[name] = f.read()
+            except FileNotFoundError:
+                contents[name] = None
+        setup_cfg = contents['setup.cfg']
+        if setup_cfg is not None and (b'attr:' in setup_cfg or b'file:' in setup_cfg):
+            for name in MigrationCache._directive_files(setup_cfg):
+                try:
+                    with open(package_dir / name, 'rb') as f:
+                        contents[name] = f.read()
+                except OSError:
+                    contents[name] = None
+        for name, content in contents.items():
+            if content is None:
+                digest.update('{}\0-\0'.format(name).encode())
+                continue
+            digest.update('{}\0{}\0'.format(name, len(content)).encode())
+            digest.update(content)
+        digest.update('\0'.join(sorted(MigrationCache._listing(package_dir))).encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _directive_files(setup_cfg: bytes) -> List[str]:
+        from configparser import ConfigParser, Error
+
+        from .setup_cfg import directive_files
+
+        config = ConfigParser()
+        config.optionxform = str  # type: ignore[assignment, method-assign]
+        try:
+            config.read_string(setup_cfg.decode('utf-8', 'replace'))
+        except Error:
+            # the migration reports it
+            return []
+        return directive_files(config)
+
+    @staticmethod
+    def _listing(package_dir: Path) -> List[str]:
+        """Return the files of the project, without the ones a migration writes."""
+        from .manifest import snapshot
+
+        return [name for name in snapshot(str(package_dir)) if name not in OUTPUT_FILES_
+                and not (name.startswith('.pyproject.toml.') and name.endswith('.tmp'))]
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / '{}.json'.format(key)
+
+    @staticmethod
+    def _output_signature(package_dir: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(str(package_dir / 'pyproject.toml'))
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def get(self, key: str, package_dir: Path) -> Optional[Dict[str, Any]]:
+        """Return the cached entry if the pyproject.toml it produced is still in place."""
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        signature = self._output_signature(package_dir)
+        if signature is None or list(signature) != entry.get('output'):
+            return None
+
+        try:
+            os.utime(str(entry_path))  # mark as recently used
+        except OSError:
+            pass
+        return entry  # type: ignore[no-any-return]
+
+    def put(self, key: str, package_dir: Path, warnings: Tuple[str, ...] = ()) -> None:
+        """Record a successful migration of package_dir."""
+        signature = self._output_signature(package_dir)
+        if signature is None:
+            return
+        entry = {'path': str(package_dir), 'output': list(signature), 'warnings': list(warnings)}
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            entry_path = self._entry_path(key)
+            tmp_path = entry_path.with_suffix('.{}.tmp'.format(os.getpid()))
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f)
+            os.replace(str(tmp_path), str(entry_path))
+        except OSError as e:
+            logger.warning("Failed to write cache entry: {}".format(e))
+        return
+
+    def prune(self) -> int:
+        """Evict least recently used entries until the cache fits in max_size, return the number evicted."""
+        try:
+            entries = [(e.stat().st_mtime_ns, e.stat().st_size, e.path) for e in os.scandir(str(self.cache_dir))
+                       if e.name.endswith('.json')]
+        except FileNotFoundError:
+            return 0
+
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        return evicted
+
+    def clear(self) -> int:
+        """Remove every entry, return the number removed."""
+        removed = 0
+        try:
+            for entry in os.scandir(str(self.cache_dir)):
+                if entry.name.endswith(('.json', '.tmp')):
+                    os.unlink(entry.path)
+                    removed += 1
+        except FileNotFoundError:
+            pass
+        return removed
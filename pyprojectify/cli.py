@@ -1,19 +1,380 @@
-"""Console script for pyprojectify."""
+"""Console script for pyprojectify.
+
+Subcommands import what they need when they run, so that --help stays fast.
+"""
 import sys
 import click
 
 # Typing related imports
-from typing import DefaultDict, Dict, List, Optional, Tuple, Union, Generator, Any, Iterator, MutableMapping
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from . import __version__
 
+if TYPE_CHECKING:
+    from .batch import MigrationResult
+    from .index import MetadataIndex
 
-@click.command()
-def main(args: Optional[str] = None) -> int:
+
+@click.group(invoke_without_command=True)
+@click.version_option(__version__, prog_name='pyprojectify')
+@click.pass_context
+def main(ctx: click.Context) -> int:
     """Console script for pyprojectify."""
-    click.echo("Replace this message by putting your code into "
-               "pyprojectify.cli.main")
-    click.echo("See click documentation at https://click.palletsprojects.com/")
+    from .utils import configure_logging
+
+    configure_logging()
+    if ctx.invoked_subcommand is None:
+        click.echo(ctx.get_help())
     return 0
 
 
+@main.command()
+@click.option('--jobs', '-j', type=int, default=None,
+              help='Number of worker processes, defaults to the number of cores.')
+@click.option('--no-cache', is_flag=True, help='Migrate every project even if its inputs are unchanged.')
+@click.option('--ignore', multiple=True, metavar='PATTERN',
+              help='Gitignore-style pattern of directories to skip, can be repeated.')
+@click.option('--exec-fallback', is_flag=True,
+              help='Execute setup.py in a sandbox when some values cannot be parsed statically.')
+@click.option('--backend', default=None, metavar='NAME',
+              help='Build backend to write pyproject.toml for: setuptools (default), poetry, flit or hatch.')
+@click.option('--merge', is_flag=True,
+              help='Update an existing pyproject.toml in place, keeping its other tables and comments.')
+@click.option('--since', metavar='REV', default=None,
+              help='Only migrate the projects with files changed in git since this revision.')
+@click.option('--profile', 'profile_path', type=click.Path(dir_okay=False), default=None,
+              help='Write a profile of the run to this file.')
+@click.option('--profile-format', type=click.Choice(['json', 'cprofile']), default='json', show_default=True,
+              help='Per-stage timings as JSON, or cProfile statistics readable with pstats.')
+@click.argument('roots', nargs=-1, type=click.Path(exists=True, file_okay=False))
+@click.pass_context
+def migrate(ctx: click.Context, jobs: Optional[int], no_cache: bool, ignore: Tuple[str, ...],
+            exec_fallback: bool, backend: Optional[str], merge: bool, since: Optional[str],
+            profile_path: Optional[str], profile_format: str, roots: Tuple[str, ...]) -> None:
+    """Migrate every setuptools project found under ROOTS."""
+    from .batch import migrate_many
+    from .cache import MigrationCache
+    from .profiling import StageProfile, merge_cprofile_stats
+    from .utils import report_errors_only
+    from .vcs import VCSError
+
+    # the warnings are echoed below the status of their project
+    report_errors_only()
+    migration_cache = None if no_cache else MigrationCache()
+    options = _options(exec_fallback, backend, merge)
+    profile = None
+    if profile_path:
+        profile = 'stages' if profile_format == 'json' else 'cprofile'
+    stage_profile = StageProfile()
+    cprofile_stats = []
+
+    counts = {'ok': 0, 'warning': 0, 'error': 0}
+    try:
+        for result in migrate_many(roots or ('.',), jobs=jobs, options=options, cache=migration_cache,
+                                   ignore=ignore, profile=profile, since=since):
+            counts[result.status] += 1
+            if result.profile is not None:
+                if profile == 'stages':
+                    stage_profile.merge(result.profile)
+                else:
+                    cprofile_stats.append(result.profile)
+            click.echo('{:<8}{}{}'.format(result.status, result.path, ' (cached)' if result.cached else ''))
+            for warning in result.warnings:
+                click.echo('        warning: {}'.format(warning))
+            if result.error:
+                click.echo('        error: {}'.format(result.error))
+    except VCSError as e:
+        raise click.ClickException(str(e))
+
+    click.echo('{ok} ok, {warning} with warnings, {error} failed'.format(**counts))
+    if profile == 'stages':
+        stage_profile.write(profile_path)  # type: ignore[arg-type]
+    elif profile == 'cprofile':
+        merge_cprofile_stats(cprofile_stats, profile_path)  # type: ignore[arg-type]
+    if counts['error']:
+        ctx.exit(1)
+
+
+def _options(exec_fallback: bool, backend: Optional[str], merge: bool = False) -> Optional[Dict[str, Any]]:
+    """Return the PyProject options of the command line, checking that the backend exists."""
+    options: Dict[str, Any] = {}
+    if exec_fallback:
+        options['execute_fallback'] = True
+    if merge:
+        options['merge'] = True
+    if backend:
+        from .emitters import get_emitter
+
+        try:
+            get_emitter(backend)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='--backend')
+        options['backend'] = backend
+    return options or None
+
+
+@main.command()
+@click.option('--jobs', '-j', type=int, default=None,
+              help='Number of worker processes, defaults to the number of cores.')
+@click.option('--output-dir', '-o', type=click.Path(file_okay=False), default=None,
+              help='Write the pyproject.toml of ARCHIVE.tar.gz to OUTPUT_DIR/ARCHIVE.toml.')
+@click.option('--jsonl', 'jsonl_path', type=click.Path(dir_okay=False, allow_dash=True), default=None,
+              help='Write one JSON object per archive to this file, - for standard output.')
+@click.option('--backend', default=None, metavar='NAME',
+              help='Build backend to write pyproject.toml for: setuptools (default), poetry, flit or hatch.')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.pass_context
+def archives(ctx: click.Context, jobs: Optional[int], output_dir: Optional[str], jsonl_path: Optional[str],
+             backend: Optional[str], paths: Tuple[str, ...]) -> None:
+    """Convert sdist archives (.tar.gz, .zip, ...) given or found under PATHS, without extracting them."""
+    import contextlib
+    import json
+    from pathlib import Path
+    from .batch import migrate_archives
+    from .pyprojectify import PyProject
+    from .sources import ARCHIVE_SUFFIXES_
+    from .utils import report_errors_only
+
+    if not (output_dir or jsonl_path):
+        raise click.UsageError('Give --output-dir, --jsonl or both.')
+    report_errors_only()
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+    # with the JSON lines on standard output, progress goes to standard error
+    progress_to_stderr = jsonl_path == '-'
+
+    counts = {'ok': 0, 'warning': 0, 'error': 0}
+    with contextlib.ExitStack() as stack:
+        jsonl = stack.enter_context(click.open_file(jsonl_path, 'w')) if jsonl_path else None
+        for result in migrate_archives(paths, jobs=jobs, options=_options(False, backend)):
+            counts[result.status] += 1
+            if jsonl is not None:
+                jsonl.write(json.dumps({'archive': result.path, 'status': result.status,
+                                        'warnings': list(result.warnings), 'error': result.error,
+                                        'pyproject': result.pyproject}) + '\n')
+            if output_dir and result.pyproject is not None:
+                name = Path(result.path).name
+                stem = next((name[:-len(suffix)] for suffix in ARCHIVE_SUFFIXES_ if name.endswith(suffix)), name)
+                PyProject._save_toml(result.pyproject, Path(output_dir) / (stem + '.toml'))
+            click.echo('{:<8}{}'.format(result.status, result.path), err=progress_to_stderr)
+            for warning in result.warnings:
+                click.echo('        warning: {}'.format(warning), err=progress_to_stderr)
+            if result.error:
+                click.echo('        error: {}'.format(result.error), err=progress_to_stderr)
+
+    click.echo('{ok} ok, {warning} with warnings, {error} failed'.format(**counts), err=progress_to_stderr)
+    if counts['error']:
+        ctx.exit(1)
+
+
+@main.command()
+@click.option('--jobs', '-j', type=int, default=None,
+              help='Number of worker processes, defaults to the number of cores.')
+@click.option('--ignore', multiple=True, metavar='PATTERN',
+              help='Gitignore-style pattern of directories to skip, can be repeated.')
+@click.option('--backend', 'backends', multiple=True, required=True, metavar='NAME',
+              help='Build backend to render for, can be repeated: setuptools, poetry, flit or hatch.')
+@click.option('--output-dir', '-o', type=click.Path(file_okay=False), required=True,
+              help='Write the pyproject.toml of PROJECT for BACKEND to OUTPUT_DIR/PROJECT/BACKEND.toml.')
+@click.argument('roots', nargs=-1, type=click.Path(exists=True, file_okay=False))
+@click.pass_context
+def render(ctx: click.Context, jobs: Optional[int], ignore: Tuple[str, ...], backends: Tuple[str, ...],
+           output_dir: str, roots: Tuple[str, ...]) -> None:
+    """Render the projects under ROOTS for several build backends, parsing each project once."""
+    from .batch import render_many
+    from .utils import report_errors_only
+
+    for backend in backends:
+        _options(False, backend)
+    report_errors_only()
+    counts = {'ok': 0, 'warning': 0, 'error': 0}
+    for result in render_many(roots or ('.',), backends, output_dir, jobs=jobs, ignore=ignore):
+        counts[result.status] += 1
+        click.echo('{:<8}{}'.format(result.status, result.path))
+        for warning in result.warnings:
+            click.echo('        warning: {}'.format(warning))
+        if result.error:
+            click.echo('        error: {}'.format(result.error))
+
+    click.echo('{ok} ok, {warning} with warnings, {error} failed'.format(**counts))
+    if counts['error']:
+        ctx.exit(1)
+
+
+@main.command()
+@click.option('--jobs', '-j', type=int, default=None,
+              help='Number of worker processes, defaults to the number of cores.')
+@click.option('--ignore', multiple=True, metavar='PATTERN',
+              help='Gitignore-style pattern of directories to skip, can be repeated.')
+@click.option('--exec-fallback', is_flag=True,
+              help='Execute setup.py in a sandbox when some values cannot be parsed statically.')
+@click.option('--backend', default=None, metavar='NAME',
+              help='Build backend to verify the pyproject.toml of: setuptools (default), flit or hatch. '
+                   'poetry writes no [project] table to verify.')
+@click.argument('roots', nargs=-1, type=click.Path(exists=True, file_okay=False))
+@click.pass_context
+def verify(ctx: click.Context, jobs: Optional[int], ignore: Tuple[str, ...], exec_fallback: bool,
+           backend: Optional[str], roots: Tuple[str, ...]) -> None:
+    """Check that the pyproject.toml of the projects under ROOTS has the core metadata of their setup.py."""
+    from .batch import verify_many
+
+    options = _options(exec_fallback, backend)
+    if backend == 'poetry':
+        raise click.BadParameter('poetry writes no [project] table to verify', param_hint='--backend')
+    counts = {'ok': 0, 'different': 0, 'error': 0}
+    for result in verify_many(roots or ('.',), jobs=jobs, options=options, ignore=ignore):
+        status = 'error' if result.error else 'different' if result.differences else 'ok'
+        counts[status] += 1
+        click.echo('{:<10}{}'.format(status, result.path))
+        for difference in result.differences:
+            click.echo('          {}: {!r} != {!r}'.format(*difference))
+        if result.error:
+            click.echo('          error: {}'.format(result.error))
+
+    click.echo('{ok} equivalent, {different} different, {error} failed'.format(**counts))
+    if counts['different'] or counts['error']:
+        ctx.exit(1)
+
+
+@main.command()
+@click.option('--ignore', multiple=True, metavar='PATTERN',
+              help='Gitignore-style pattern of directories to skip, can be repeated.')
+@click.option('--exec-fallback', is_flag=True,
+              help='Execute setup.py in a sandbox when some values cannot be parsed statically.')
+@click.option('--debounce', type=float, default=0.5, show_default=True,
+              help='Seconds to wait after the last change of a project before migrating it.')
+@click.option('--backend', default=None, metavar='NAME',
+              help='Build backend to write pyproject.toml for: setuptools (default), poetry, flit or hatch.')
+@click.option('--merge', is_flag=True,
+              help='Update an existing pyproject.toml in place, keeping its other tables and comments.')
+@click.option('--polling', is_flag=True, help='Poll modification times instead of using watchdog.')
+@click.option('--interval', type=float, default=1.0, show_default=True, help='Seconds between two polls.')
+@click.argument('roots', nargs=-1, type=click.Path(exists=True, file_okay=False))
+def watch(ignore: Tuple[str, ...], exec_fallback: bool, debounce: float, backend: Optional[str], merge: bool,
+          polling: bool, interval: float, roots: Tuple[str, ...]) -> None:
+    """Migrate the projects under ROOTS again whenever their setup.py, setup.cfg or MANIFEST.in change."""
+    from .utils import report_errors_only
+    from .watch import ProjectWatcher
+
+    options = _options(exec_fallback, backend, merge)
+    report_errors_only()
+    watcher = ProjectWatcher(roots or ('.',), ignore=ignore, options=options, debounce=debounce,
+                             interval=interval, polling=polling)
+    click.echo('Watching {} projects, press Ctrl+C to stop'.format(len(watcher.projects)))
+
+    def report(result: 'MigrationResult') -> None:
+        click.echo('{:<8}{}'.format(result.status, result.path))
+        for warning in result.warnings:
+            click.echo('        warning: {}'.format(warning))
+        if result.error:
+            click.echo('        error: {}'.format(result.error))
+
+    try:
+        watcher.run(report)
+    except KeyboardInterrupt:
+        pass
+
+
+@main.command('index')
+@click.option('--index', 'index_path', type=click.Path(dir_okay=False), default=None,
+              help='Path of the index, defaults to index.sqlite3 in the cache directory.')
+@click.option('--jobs', '-j', type=int, default=None,
+              help='Number of worker processes, defaults to the number of cores.')
+@click.option('--ignore', multiple=True, metavar='PATTERN',
+              help='Gitignore-style pattern of directories to skip, can be repeated.')
+@click.argument('roots', nargs=-1, type=click.Path(exists=True, file_okay=False))
+def index_projects(index_path: Optional[str], jobs: Optional[int], ignore: Tuple[str, ...],
+                   roots: Tuple[str, ...]) -> None:
+    """Record the metadata of the projects under ROOTS in the index queried by pyprojectify query."""
+    from .index import MetadataIndex
+
+    with MetadataIndex(index_path) as metadata_index:
+        update = metadata_index.update(roots or ('.',), jobs=jobs, ignore=ignore)
+    click.echo('{} indexed, {} unchanged, {} removed, {} failed'.format(*update))
+
+
+@main.group()
+@click.option('--index', 'index_path', type=click.Path(dir_okay=False), default=None,
+              help='Path of the index, defaults to index.sqlite3 in the cache directory.')
+@click.pass_context
+def query(ctx: click.Context, index_path: Optional[str]) -> None:
+    """Query the index of projects built by pyprojectify index."""
+    from pathlib import Path
+    from .index import MetadataIndex, default_index_path
+
+    path = Path(index_path) if index_path else default_index_path()
+    if not path.is_file():
+        raise click.ClickException('No index at {}, run pyprojectify index first.'.format(path))
+    ctx.obj = ctx.with_resource(MetadataIndex(path))
+
+
+@query.command()
+@click.argument('requirement')
+@click.pass_obj
+def depends(metadata_index: 'MetadataIndex', requirement: str) -> None:
+    """List the projects depending on REQUIREMENT, e.g. 'requests<2.28', with a version it allows."""
+    for dependency in metadata_index.depends(requirement):
+        click.echo('{}\t{}{}{}{}'.format(dependency.path, dependency.name, dependency.specifier,
+                                         ' [{}]'.format(dependency.extra) if dependency.extra else '',
+                                         '; {}'.format(dependency.marker) if dependency.marker else ''))
+
+
+@query.command()
+@click.argument('field', type=click.Choice(['name', 'version', 'requires_python', 'license', 'description']))
+@click.pass_obj
+def missing(metadata_index: 'MetadataIndex', field: str) -> None:
+    """List the projects without a value for FIELD."""
+    for path in metadata_index.missing(field):
+        click.echo(path)
+
+
+@query.command('entry-points')
+@click.argument('name', required=False)
+@click.pass_obj
+def entry_points(metadata_index: 'MetadataIndex', name: Optional[str]) -> None:
+    """List the entry points named NAME, or all of them."""
+    for entry_point in metadata_index.entry_points(name):
+        click.echo('{}\t{}\t{} = {}'.format(*entry_point))
+
+
+@query.command()
+@click.argument('statement')
+@click.pass_obj
+def sql(metadata_index: 'MetadataIndex', statement: str) -> None:
+    """Run a read-only SQL STATEMENT on the projects, dependencies and entry_points tables."""
+    import sqlite3
+
+    try:
+        rows = metadata_index.execute(statement)
+    except sqlite3.Error as e:
+        raise click.ClickException(str(e))
+    for row in rows:
+        click.echo('\t'.join('' if value is None else str(value) for value in row))
+
+
+@main.command()
+def serve() -> None:
+    """Answer JSON-RPC conversion requests, one per line on stdin, until stdin is closed."""
+    from .server import serve as serve_forever
+
+    # the current streams, the defaults of serve() were bound when it was imported
+    serve_forever(sys.stdin, sys.stdout)
+
+
+@main.group()
+def cache() -> None:
+    """Manage the cache of migration results."""
+
+
+@cache.command()
+def clear() -> None:
+    """Remove every cached migration result."""
+    from .cache import MigrationCache
+
+    migration_cache = MigrationCache()
+    removed = migration_cache.clear()
+    click.echo('Removed {} entries from {}'.format(removed, migration_cache.cache_dir))
+
+
 if __name__ == "__main__":
     sys.exit(main())  # pragma: no cover
@@ -0,0 +1,202 @@
+"""Discovery of setuptools projects with a single directory listing per directory."""
+
+import os
+import re
+from pathlib import Path
+
+# Typing related imports
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Pattern, Set, Tuple, Union
+
+DEFAULT_IGNORES_: Tuple[str, ...] = ('.git/', '.hg/', '.svn/', '.tox/', '.nox/', '.venv/', 'venv/', 'node_modules/',
+                                     'build/', 'dist/', '__pycache__/', '*.egg-info/', '.eggs/', '.mypy_cache/',
+                                     '.pytest_cache/')
+
+
+class ProjectEntry(NamedTuple):
+    """A project directory and the presence of the files pyprojectify reads."""
+
+    path: Path
+    has_setup_py: bool
+    has_setup_cfg: bool
+    has_manifest_in: bool
+    has_pyproject: bool
+
+
+class _Rule(NamedTuple):
+    regex: Pattern[str]
+    negated: bool
+    dir_only: bool
+    anchored: bool
+
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore glob into a regular expression."""
+    i, n = 0, len(pattern)
+    parts: List[str] = []
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+            continue
+        if c == '*':
+            parts.append('[^/]*')
+        elif c == '?':
+            parts.append('[^/]')
+        elif c == '[':
+            j = pattern.find(']', i + 1)
+            if j == -1:
+                parts.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                parts.append('[{}]'.format(body.replace('\\', '\\\\')))
+                i = j
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return ''.join(parts)
+
+
+class IgnoreRules:
+    """Compiled gitignore-style patterns, matched against paths relative to the walked root.
+
+    Patterns without a slash match a name at any depth, patterns containing a slash are anchored
+    to the root, a trailing slash restricts a pattern to directories and a leading "!" re-includes
+    what a previous pattern excluded.
+    """
+
+    def __init__(self, patterns: Iterable[str] = ()) -> None:
+        self._rules: List[_Rule] = []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            negated = pattern.startswith('!')
+            if negated:
+                pattern = pattern[1:]
+            dir_only = pattern.endswith('/')
+            pattern = pattern.rstrip('/')
+            anchored = '/' in pattern
+            regex = re.compile('{}$'.format(_translate(pattern.lstrip('/'))))
+            self._rules.append(_Rule(regex, negated, dir_only, anchored))
+        return
+
+    def __bool__(self) -> bool:
+        return bool(self._rules)
+
+    def ignored(self, rel_path: str, name: str, is_dir: bool) -> bool:
+        """Return True if the path is excluded, the last matching rule wins."""
+        result = False
+        for rule in self._rules:
+            if rule.negated != result or (rule.dir_only and not is_dir):
+                continue
+            if rule.regex.match(rel_path if rule.anchored else name):
+                result = not rule.negated
+        return result
+
+
+def _declares_metadata(setup_cfg: str) -> bool:
+    """Check if a setup.cfg has a [metadata] section, i.e. describes a project without setup.py."""
+    try:
+        with open(setup_cfg, 'r') as f:
+            return any(line.strip() == '[metadata]' for line in f)
+    except OSError:
+        return False
+
+
+def _entry(dirpath: str, files: Set[str]) -> Optional[ProjectEntry]:
+    if 'setup.py' in files:
+        return ProjectEntry(Path(dirpath), True, 'setup.cfg' in files, 'MANIFEST.in' in files,
+                            'pyproject.toml' in files)
+    if 'setup.cfg' in files and _declares_metadata(os.path.join(dirpath, 'setup.cfg')):
+        return ProjectEntry(Path(dirpath), False, True, 'MANIFEST.in' in files, 'pyproject.toml' in files)
+    return None
+
+
+def project_entry(path: Union[str, Path]) -> Optional[ProjectEntry]:
+    """Return the entry of the directory path if it holds a project, listing it once."""
+    dirpath = os.fspath(path)
+    try:
+        with os.scandir(dirpath) as it:
+            files = {entry.name for entry in it}
+    except OSError:
+        return None
+    return _entry(dirpath, files)
+
+
+def discover_projects(roots: Iterable[Union[str, Path]], ignore: Iterable[str] = (),
+                      default_ignores: bool = True) -> Iterator[ProjectEntry]:
+    """Yield every project containing a setup.py under roots, in a deterministic order.
+
+    Directories with a setup.cfg declaring [metadata] but no setup.py are projects too.
+
+    Each directory is listed exactly once with os.scandir, which also provides the presence of
+    setup.py, setup.cfg, MANIFEST.in and pyproject.toml without any further stat. Ignored
+    directories and virtual environments (directories holding a pyvenv.cfg) are not descended into.
+    """
+    rules = IgnoreRules(tuple(DEFAULT_IGNORES_ if default_ignores else ()) + tuple(ignore))
+    for root in roots:
+        stack: List[Tuple[str, str]] = [(os.fspath(root), '')]
+        while stack:
+            dirpath, rel_dir = stack.pop()
+            files = set()
+            subdirs = []
+            try:
+                with os.scandir(dirpath) as it:
+                    for entry in it:
+                        try:
+                            is_dir = entry.is_dir(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if not is_dir:
+                            files.add(entry.name)
+                            continue
+                        rel_path = rel_dir + entry.name
+                        if rules and rules.ignored(rel_path, entry.name, True):
+                            continue
+                        subdirs.append((entry.path, rel_path + '/'))
+            except OSError:
+                continue
+
+            if 'pyvenv.cfg' in files:
+                continue
+            project = _entry(dirpath, files)
+            if project is not None:
+                yield project
+            stack.extend(sorted(subdirs, reverse=True))
+
+
+def discover_archives(paths: Iterable[Union[str, Path]]) -> Iterator[Path]:
+    """Yield the sdist archives given in paths, or found under the directories of paths, sorted."""
+    from .sources import is_archive
+
+    for path in paths:
+        if not os.path.isdir(path):
+            yield Path(path)
+            continue
+        stack = [os.fspath(path)]
+        while stack:
+            dirpath = stack.pop()
+            archives = []
+            subdirs = []
+            try:
+                with os.scandir(dirpath) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir():
+                                subdirs.append(entry.path)
+                            elif is_archive(entry.name):
+                                archives.append(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+            for archive in sorted(archives):
+                yield Path(archive)
+            stack.extend(sorted(subdirs, reverse=True))
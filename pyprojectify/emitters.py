@@ -0,0 +1,335 @@
+"""Emitters building the pyproject.toml mapping of a project for a build backend.
+
+An emitter is a function from the ProjectMetadata of a project to a mapping, registered
+under the name of its backend with register(). Other packages can add emitters through the
+pyprojectify.emitters entry point group. As emitters only read the metadata, one parse of
+a project can be rendered for any number of backends.
+"""
+
+import re
+from collections import OrderedDict
+
+# Typing related imports
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .metadata import ProjectMetadata
+from .requirements import Requirement, dependency_value
+from .utils import logger
+
+Emitter = Callable[[ProjectMetadata], Dict[str, Any]]
+
+DEFAULT_BACKEND_ = 'setuptools'
+ENTRY_POINT_GROUP_ = 'pyprojectify.emitters'
+# entry point groups with a table of their own in PEP 621
+SCRIPT_GROUPS_: Dict[str, str] = {'console_scripts': 'scripts', 'gui_scripts': 'gui-scripts'}
+
+_EMITTERS: Dict[str, Emitter] = {}
+_plugins_loaded = False
+
+
+def register(name: str) -> Callable[[Emitter], Emitter]:
+    """Register the decorated function as the emitter of the backend name."""
+    def decorator(emitter: Emitter) -> Emitter:
+        _EMITTERS[name] = emitter
+        return emitter
+    return decorator
+
+
+def _load_plugins() -> None:
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:  # Python < 3.8
+        return
+    discovered: Any = entry_points()
+    # a mapping of groups to entry points before Python 3.10
+    selected = (discovered.select(group=ENTRY_POINT_GROUP_) if hasattr(discovered, 'select')
+                else discovered.get(ENTRY_POINT_GROUP_, ()))
+    for entry_point in selected:
+        try:
+            _EMITTERS.setdefault(entry_point.name, entry_point.load())
+        except Exception as e:
+            logger.warning("Failed to load emitter {}: {!r}".format(entry_point.name, e))
+
+
+def backends() -> List[str]:
+    """Return the names of the registered backends, plugins included."""
+    _load_plugins()
+    return sorted(_EMITTERS)
+
+
+def get_emitter(backend: str) -> Emitter:
+    """Return the emitter of backend, raising ValueError if there is none."""
+    if backend not in _EMITTERS:
+        _load_plugins()
+    try:
+        return _EMITTERS[backend]
+    except KeyError:
+        raise ValueError("Unknown backend {!r}, expected one of {}".format(backend, ', '.join(backends()))) from None
+
+
+def emit(metadata: ProjectMetadata, backend: str = DEFAULT_BACKEND_) -> Dict[str, Any]:
+    """Return the pyproject.toml mapping of a project for backend."""
+    return get_emitter(backend)(metadata)
+
+
+def _build_system(requires: Iterable[str], backend: str) -> Dict[str, Any]:
+    return OrderedDict([('requires', list(requires)), ('build-backend', backend)])
+
+
+def _people(names: Optional[str], emails: Optional[str]) -> List[Dict[str, str]]:
+    """Return the PEP 621 authors or maintainers table of setup() author and author_email."""
+    person = OrderedDict((key, value) for key, value in (('name', names), ('email', emails)) if value)
+    return [person] if person else []
+
+
+def _keywords(keywords: Any) -> List[str]:
+    if isinstance(keywords, str):
+        return [keyword for keyword in re.split(r'[,\s]+', keywords) if keyword]
+    return list(keywords or ())
+
+
+def _single_readme(metadata: ProjectMetadata, backend: str) -> Optional[str]:
+    """Return the readme file of backends reading a single one, reporting the others left out."""
+    if metadata.readme is None:
+        return None
+    if len(metadata.readme.files) > 1:
+        logger.warning("{} reads a single readme file, {} left out".format(
+            backend, ', '.join(metadata.readme.files[1:])))
+    return metadata.readme.files[0]
+
+
+def _urls(metadata: ProjectMetadata) -> Dict[str, str]:
+    """Return url as the Homepage and project_urls, url taking precedence as with setuptools."""
+    urls: Dict[str, str] = OrderedDict()
+    if metadata.url:
+        urls['Homepage'] = metadata.url
+    for label, url in metadata.project_urls:
+        urls.setdefault(label, url)
+    return urls
+
+
+def project_table(metadata: ProjectMetadata, readme: Optional[str] = None) -> Dict[str, Any]:
+    """Return the PEP 621 [project] table of a project.
+
+    readme is the file to reference when the backend reads a single one, otherwise readme
+    files are referenced as they are, several of them making the readme dynamic.
+    """
+    project: Dict[str, Any] = OrderedDict()
+    dynamic = []
+    if metadata.name:
+        project['name'] = metadata.name
+    if metadata.version:
+        project['version'] = metadata.version
+    else:
+        dynamic.append('version')
+    if metadata.description:
+        project['description'] = metadata.description
+
+    if metadata.readme is not None:
+        files = (readme,) if readme else metadata.readme.files
+        if len(files) == 1:
+            project['readme'] = OrderedDict([('file', files[0]), ('content-type', metadata.readme.content_type)])
+        else:
+            dynamic.append('readme')
+    elif metadata.long_description:
+        project['readme'] = OrderedDict([('text', metadata.long_description),
+                                         ('content-type', metadata.long_description_content_type or 'text/x-rst')])
+
+    if metadata.python_requires:
+        project['requires-python'] = metadata.python_requires
+    if metadata.license:
+        project['license'] = {'text': metadata.license_expression or metadata.license}
+    for key, name, email in (('authors', metadata.author, metadata.author_email),
+                             ('maintainers', metadata.maintainer, metadata.maintainer_email)):
+        people = _people(name, email)
+        if people:
+            project[key] = people
+    if metadata.keywords:
+        project['keywords'] = _keywords(metadata.keywords)
+    if metadata.classifiers:
+        project['classifiers'] = list(metadata.classifiers)
+    urls = _urls(metadata)
+    if urls:
+        project['urls'] = urls
+
+    if metadata.requirements:
+        project['dependencies'] = [str(requirement) for requirement in metadata.requirements]
+    if metadata.optional_requirements:
+        project['optional-dependencies'] = OrderedDict(
+            (extra, [str(requirement) for requirement in requirements])
+            for extra, requirements in metadata.optional_requirements)
+
+    entry_points: Dict[str, Dict[str, str]] = OrderedDict()
+    for entry_point in metadata.entry_points:
+        table = SCRIPT_GROUPS_.get(entry_point.group)
+        if table is not None:
+            project.setdefault(table, OrderedDict())[entry_point.name] = entry_point.value
+        else:
+            entry_points.setdefault(entry_point.group, OrderedDict())[entry_point.name] = entry_point.value
+    if entry_points:
+        project['entry-points'] = entry_points
+    if dynamic:
+        project['dynamic'] = dynamic
+    return project
+
+
+def _package_path(metadata: ProjectMetadata, package: str) -> str:
+    """Return the directory of a package, following package_dir."""
+    package_dir = dict(metadata.package_dir)
+    parts = package.split('.')
+    for i in range(len(parts), -1, -1):
+        prefix = '.'.join(parts[:i])
+        if prefix in package_dir:
+            base = package_dir[prefix].strip('/')
+            return '/'.join(([base] if base and base != '.' else []) + parts[i:])
+    return '/'.join(parts)
+
+
+@register('setuptools')
+def _setuptools(metadata: ProjectMetadata) -> Dict[str, Any]:
+    """PEP 621 metadata built by setuptools, which keeps reading MANIFEST.in for the sdist."""
+    pyproject: Dict[str, Any] = OrderedDict()
+    pyproject['build-system'] = _build_system(('setuptools>=61.0', 'wheel') + metadata.setup_requires,
+                                              'setuptools.build_meta')
+    pyproject['project'] = project_table(metadata)
+
+    tool: Dict[str, Any] = OrderedDict()
+    if metadata.packages is not None:
+        tool['packages'] = list(metadata.packages)
+    if metadata.package_dir:
+        tool['package-dir'] = OrderedDict(metadata.package_dir)
+    if metadata.package_data:
+        tool['package-data'] = OrderedDict((package, list(patterns)) for package, patterns in metadata.package_data)
+    if metadata.readme is not None and len(metadata.readme.files) > 1:
+        # PEP 621 readme is a single file, setuptools concatenates several ones as dynamic metadata
+        tool['dynamic'] = {'readme': OrderedDict([('file', list(metadata.readme.files)),
+                                                  ('content-type', metadata.readme.content_type)])}
+    if tool:
+        pyproject['tool'] = {'setuptools': tool}
+    return pyproject
+
+
+def _poetry_dependency(requirement: Requirement, optional: bool = False) -> Any:
+    value = dependency_value(requirement)
+    if optional:
+        value = dict(value, optional=True) if isinstance(value, dict) else {'version': value, 'optional': True}
+    return value
+
+
+@register('poetry')
+def _poetry(metadata: ProjectMetadata) -> Dict[str, Any]:
+    """[tool.poetry] tables, as in the pyproject.toml of pyprojectify itself."""
+    pyproject: Dict[str, Any] = OrderedDict()
+    pyproject['build-system'] = _build_system(('poetry-core>=1.0.0',), 'poetry.core.masonry.api')
+
+    package: Dict[str, Any] = OrderedDict()
+    package['name'] = metadata.name or ''
+    package['version'] = metadata.version or '0.0.0'
+    package['description'] = metadata.description or ''
+    package['authors'] = ['{} <{}>'.format(metadata.author, metadata.author_email) if metadata.author_email
+                          else metadata.author] if metadata.author else []
+    if metadata.maintainer:
+        package['maintainers'] = ['{} <{}>'.format(metadata.maintainer, metadata.maintainer_email)
+                                  if metadata.maintainer_email else metadata.maintainer]
+    if metadata.license:
+        package['license'] = metadata.license_expression or metadata.license
+    if metadata.readme is not None:
+        files = metadata.readme.files
+        package['readme'] = files[0] if len(files) == 1 else list(files)
+    if metadata.url:
+        package['homepage'] = metadata.url
+    if metadata.project_urls:
+        package['urls'] = OrderedDict(metadata.project_urls)
+    if metadata.keywords:
+        package['keywords'] = _keywords(metadata.keywords)
+    if metadata.classifiers:
+        package['classifiers'] = list(metadata.classifiers)
+    if metadata.packages:
+        package['packages'] = []
+        for name in metadata.top_level_packages():
+            path = _package_path(metadata, name)
+            entry = OrderedDict([('include', name)])
+            if path != name:
+                entry['from'] = path[:-len(name) - 1] if path.endswith('/' + name) else path
+            package['packages'].append(entry)
+    if metadata.manifest is not None:
+        if metadata.manifest.include:
+            package['include'] = list(metadata.manifest.include)
+        if metadata.manifest.exclude:
+            package['exclude'] = list(metadata.manifest.exclude)
+
+    dependencies: Dict[str, Any] = OrderedDict()
+    dependencies['python'] = metadata.python_requires or '*'
+    for requirement in metadata.requirements:
+        dependencies[requirement.name] = _poetry_dependency(requirement)
+    extras: Dict[str, List[str]] = OrderedDict()
+    for extra, requirements in metadata.optional_requirements:
+        for requirement in requirements:
+            # extras select optional dependencies of the main table
+            dependencies.setdefault(requirement.name, _poetry_dependency(requirement, optional=True))
+            extras.setdefault(extra, []).append(requirement.name)
+    package['dependencies'] = dependencies
+    if extras:
+        package['extras'] = extras
+
+    scripts = OrderedDict((entry_point.name, entry_point.value) for entry_point in metadata.scripts())
+    if scripts:
+        package['scripts'] = scripts
+    plugins: Dict[str, Dict[str, str]] = OrderedDict()
+    for entry_point in metadata.entry_points:
+        if entry_point.group != 'console_scripts':
+            plugins.setdefault(entry_point.group, OrderedDict())[entry_point.name] = entry_point.value
+    if plugins:
+        package['plugins'] = plugins
+    pyproject['tool'] = {'poetry': package}
+    return pyproject
+
+
+def _sdist_files(metadata: ProjectMetadata) -> List[Tuple[str, List[str]]]:
+    if metadata.manifest is None:
+        return []
+    return [(key, list(files)) for key, files in (('include', metadata.manifest.include),
+                                                  ('exclude', metadata.manifest.exclude)) if files]
+
+
+@register('flit')
+def _flit(metadata: ProjectMetadata) -> Dict[str, Any]:
+    """PEP 621 metadata built by flit_core, for projects made of one top-level package or module."""
+    pyproject: Dict[str, Any] = OrderedDict()
+    pyproject['build-system'] = _build_system(('flit_core>=3.4,<4',), 'flit_core.buildapi')
+    pyproject['project'] = project_table(metadata, _single_readme(metadata, 'flit'))
+
+    tool: Dict[str, Any] = OrderedDict()
+    top_level = metadata.top_level_packages()
+    if len(top_level) > 1:
+        logger.warning("flit builds a single top-level package, {} left out".format(', '.join(top_level[1:])))
+    if top_level and top_level[0] != (metadata.name or '').replace('-', '_'):
+        tool['module'] = {'name': top_level[0]}
+    sdist = _sdist_files(metadata)
+    if sdist:
+        tool['sdist'] = OrderedDict(sdist)
+    if tool:
+        pyproject['tool'] = {'flit': tool}
+    return pyproject
+
+
+@register('hatch')
+def _hatch(metadata: ProjectMetadata) -> Dict[str, Any]:
+    """PEP 621 metadata built by hatchling."""
+    pyproject: Dict[str, Any] = OrderedDict()
+    pyproject['build-system'] = _build_system(('hatchling',), 'hatchling.build')
+    pyproject['project'] = project_table(metadata, _single_readme(metadata, 'hatch'))
+
+    targets: Dict[str, Any] = OrderedDict()
+    if metadata.packages:
+        targets['wheel'] = {'packages': [_package_path(metadata, name) for name in metadata.top_level_packages()]}
+    sdist = _sdist_files(metadata)
+    if sdist:
+        targets['sdist'] = OrderedDict(sdist)
+    if targets:
+        pyproject['tool'] = {'hatch': {'build': {'targets': targets}}}
+    return pyproject
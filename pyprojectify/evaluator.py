@@ -0,0 +1,394 @@
+"""Static partial evaluation of setup.py expressions."""
+
+import ast
+import posixpath
+from bisect import bisect_left
+from pathlib import PurePosixPath
+
+# Typing related imports
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .packages import FindPackages
+
+STR_METHODS_: Tuple[str, ...] = ('format', 'join', 'strip', 'lstrip', 'rstrip', 'split', 'rsplit', 'splitlines',
+                                 'lower', 'upper', 'replace', 'title', 'capitalize')
+
+MAX_REPEAT_ = 1000000
+
+
+class _Unresolved:
+    """Sentinel for values that cannot be computed statically."""
+
+    _instance: Optional['_Unresolved'] = None
+
+    def __new__(cls) -> '_Unresolved':
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __repr__(self) -> str:
+        return 'UNRESOLVED'
+
+    def __bool__(self) -> bool:
+        return False
+
+
+UNRESOLVED = _Unresolved()
+
+
+class FileContent:
+    """Content of files read by setup.py, represented by their paths instead of being read.
+
+    Concatenating two of them, or one with a blank separator, gives the content of both
+    files, so that readme + '\\n\\n' + history stays a reference to two files.
+    """
+
+    __slots__ = ('paths',)
+
+    def __init__(self, paths: Tuple[str, ...]) -> None:
+        self.paths = tuple(posixpath.normpath(path) for path in paths)
+
+    def __repr__(self) -> str:
+        return 'FileContent({!r})'.format(self.paths)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, FileContent) and other.paths == self.paths
+
+    def __hash__(self) -> int:
+        return hash(self.paths)
+
+    def __add__(self, other: Any) -> 'FileContent':
+        if isinstance(other, FileContent):
+            return FileContent(self.paths + other.paths)
+        if isinstance(other, str) and not other.strip():
+            return self
+        return NotImplemented
+
+    def __radd__(self, other: Any) -> 'FileContent':
+        if isinstance(other, str) and not other.strip():
+            return self
+        return NotImplemented
+
+
+class _OpenedFile:
+    """File object returned by open(path), whose read() gives a FileContent."""
+
+    __slots__ = ('path',)
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+
+def _open(args: List[Any], kwargs: Dict[str, Any]) -> _OpenedFile:
+    mode = args[1] if len(args) > 1 else kwargs.get('mode', 'r')
+    if not isinstance(mode, str) or set(mode) - set('rt'):
+        raise ValueError(mode)
+    return _OpenedFile(str(args[0]))
+
+
+class SymbolTable:
+    """Versioned symbol table of a module or of a function scope.
+
+    Every binding of a name gets an increasing sequence number, so that a name read by an
+    expression resolves to the last binding made before that expression, and a reassignment
+    like requirements = requirements + extra refers to the previous binding instead of itself.
+    A function scope shares the numbering of its parent and falls back to it for the names it
+    has not bound yet. A binding to None, such as a function parameter, is unresolved.
+    """
+
+    def __init__(self, parent: Optional['SymbolTable'] = None) -> None:
+        self.parent = parent
+        self._seq = 0
+        self._seqs: Dict[str, List[int]] = {}
+        self._nodes: Dict[str, List[Optional[ast.expr]]] = {}
+
+    @property
+    def seq(self) -> int:
+        return self.parent.seq if self.parent is not None else self._seq
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._seqs or (self.parent is not None and name in self.parent)
+
+    def scope(self) -> 'SymbolTable':
+        """Return a new function scope nested in this table."""
+        return SymbolTable(self)
+
+    def _next_seq(self) -> int:
+        if self.parent is not None:
+            return self.parent._next_seq()
+        self._seq += 1
+        return self._seq
+
+    def bind(self, name: str, node: Optional[ast.expr]) -> int:
+        """Bind name to the expression node, return the sequence number of the binding."""
+        seq = self._next_seq()
+        self._seqs.setdefault(name, []).append(seq)
+        self._nodes.setdefault(name, []).append(node)
+        return seq
+
+    def lookup(self, name: str, before: int) -> Optional[Tuple[int, Optional[ast.expr]]]:
+        """Return the last binding of name made before the sequence number before."""
+        seqs = self._seqs.get(name, [])
+        i = bisect_left(seqs, before)
+        if i == 0:
+            return self.parent.lookup(name, before) if self.parent is not None else None
+        return seqs[i - 1], self._nodes[name][i - 1]
+
+
+class Evaluator:
+    """Constant folding evaluator over a SymbolTable.
+
+    Supports literals, containers with starred and ** unpacking, string and sequence
+    arithmetic, f-strings, str.format and the common str methods, os.path functions, dict(),
+    list(), tuple(), sorted() and subscripts. Each binding is evaluated at most once, so a
+    large list referenced from several keywords is only computed once. Anything else
+    evaluates to UNRESOLVED.
+
+    Files read with open(path).read() or Path(path).read_text() evaluate to a FileContent,
+    without being opened. Paths are relative to the directory of setup.py, which __file__
+    and os.path.abspath() keep relative. find_packages() and find_namespace_packages()
+    evaluate to a FindPackages, to be resolved against the project directory.
+    """
+
+    def __init__(self, symbols: SymbolTable) -> None:
+        self.symbols = symbols
+        self._memo: Dict[Tuple[str, int], Any] = {}
+        self._in_progress: Set[Tuple[str, int]] = set()
+        self._calls: Dict[str, Callable[[List[Any], Dict[str, Any]], Any]] = {
+            'dict': lambda args, kwargs: dict(*args, **kwargs),
+            'list': lambda args, kwargs: list(*args),
+            'tuple': lambda args, kwargs: tuple(*args),
+            'sorted': lambda args, kwargs: sorted(*args, **kwargs),
+            'str': lambda args, kwargs: str(*args),
+            'os.path.join': lambda args, kwargs: posixpath.join(*args),
+            'path.join': lambda args, kwargs: posixpath.join(*args),
+            'os.path.dirname': lambda args, kwargs: posixpath.dirname(*args),
+            'os.path.abspath': lambda args, kwargs: str(*args),
+            'os.path.realpath': lambda args, kwargs: str(*args),
+            'open': _open,
+            'io.open': _open,
+            'codecs.open': _open,
+            'Path': lambda args, kwargs: PurePosixPath(*args),
+            'pathlib.Path': lambda args, kwargs: PurePosixPath(*args),
+            'find_packages': FindPackages.from_call,
+            'setuptools.find_packages': FindPackages.from_call,
+            'find_namespace_packages': lambda args, kwargs: FindPackages.from_call(args, kwargs, namespace=True),
+            'setuptools.find_namespace_packages': lambda args, kwargs: FindPackages.from_call(args, kwargs, namespace=True),
+        }
+
+    def evaluate(self, node: Optional[ast.expr], at: int) -> Any:
+        """Evaluate node as seen from the position at in the symbol table."""
+        if node is None:
+            return UNRESOLVED
+        method = getattr(self, '_eval_' + type(node).__name__, None)
+        if method is None:
+            return UNRESOLVED
+        try:
+            return method(node, at)
+        except Exception:
+            return UNRESOLVED
+
+    def resolve(self, name: str, at: int) -> Any:
+        """Return the memoized value of the binding of name visible at position at."""
+        binding = self.symbols.lookup(name, at)
+        if binding is None:
+            return UNRESOLVED
+        key = (name, binding[0])
+        if key in self._memo:
+            return self._memo[key]
+        if key in self._in_progress:
+            return UNRESOLVED
+        self._in_progress.add(key)
+        try:
+            value = self.evaluate(binding[1], binding[0])
+        finally:
+            self._in_progress.discard(key)
+        self._memo[key] = value
+        return value
+
+    def _eval_all(self, nodes: List[ast.expr], at: int) -> List[Any]:
+        values = []
+        for node in nodes:
+            if isinstance(node, ast.Starred):
+                value = self.evaluate(node.value, at)
+                if value is UNRESOLVED:
+                    raise ValueError
+                values.extend(value)
+                continue
+            value = self.evaluate(node, at)
+            if value is UNRESOLVED:
+                raise ValueError
+            values.append(value)
+        return values
+
+    def _eval_Constant(self, node: ast.Constant, at: int) -> Any:
+        return node.value
+
+    def _eval_Str(self, node: ast.Str, at: int) -> Any:
+        return node.s
+
+    def _eval_Num(self, node: ast.Num, at: int) -> Any:
+        return node.n
+
+    def _eval_NameConstant(self, node: ast.NameConstant, at: int) -> Any:
+        return node.value
+
+    def _eval_Name(self, node: ast.Name, at: int) -> Any:
+        if node.id == '__file__' and node.id not in self.symbols:
+            return 'setup.py'
+        return self.resolve(node.id, at)
+
+    def _eval_Attribute(self, node: ast.Attribute, at: int) -> Any:
+        value = self.evaluate(node.value, at)
+        if isinstance(value, PurePosixPath) and node.attr in ('parent', 'name', 'stem', 'suffix'):
+            return getattr(value, node.attr)
+        return UNRESOLVED
+
+    def _eval_List(self, node: ast.List, at: int) -> Any:
+        return self._eval_all(node.elts, at)
+
+    def _eval_Tuple(self, node: ast.Tuple, at: int) -> Any:
+        return tuple(self._eval_all(node.elts, at))
+
+    def _eval_Set(self, node: ast.Set, at: int) -> Any:
+        return set(self._eval_all(node.elts, at))
+
+    def _eval_Dict(self, node: ast.Dict, at: int) -> Any:
+        result = {}
+        for key, value in zip(node.keys, node.values):
+            if key is None:
+                mapping = self.evaluate(value, at)
+                if not isinstance(mapping, dict):
+                    raise ValueError
+                result.update(mapping)
+                continue
+            k, v = self.evaluate(key, at), self.evaluate(value, at)
+            if k is UNRESOLVED or v is UNRESOLVED:
+                raise ValueError
+            result[k] = v
+        return result
+
+    def _eval_BinOp(self, node: ast.BinOp, at: int) -> Any:
+        left, right = self.evaluate(node.left, at), self.evaluate(node.right, at)
+        if left is UNRESOLVED or right is UNRESOLVED:
+            return UNRESOLVED
+        if isinstance(node.op, ast.Add):
+            return left + right
+        if isinstance(node.op, ast.Mult) and isinstance(right, int):
+            if len(left) * right > MAX_REPEAT_:
+                return UNRESOLVED
+            return left * right
+        if isinstance(node.op, ast.Mod) and isinstance(left, str):
+            return left % right
+        if isinstance(node.op, ast.BitOr) and isinstance(left, dict):
+            return {**left, **right}
+        if isinstance(node.op, ast.Div) and isinstance(left, PurePosixPath):
+            return left / right
+        return UNRESOLVED
+
+    def _eval_UnaryOp(self, node: ast.UnaryOp, at: int) -> Any:
+        operand = self.evaluate(node.operand, at)
+        if operand is UNRESOLVED:
+            return UNRESOLVED
+        if isinstance(node.op, ast.USub):
+            return -operand
+        if isinstance(node.op, ast.UAdd):
+            return +operand
+        if isinstance(node.op, ast.Not):
+            return not operand
+        return UNRESOLVED
+
+    def _eval_JoinedStr(self, node: ast.JoinedStr, at: int) -> Any:
+        parts = []
+        for value in node.values:
+            part = self.evaluate(value, at)
+            if part is UNRESOLVED:
+                return UNRESOLVED
+            parts.append(part)
+        return ''.join(parts)
+
+    def _eval_FormattedValue(self, node: ast.FormattedValue, at: int) -> Any:
+        value = self.evaluate(node.value, at)
+        if value is UNRESOLVED:
+            return UNRESOLVED
+        if node.conversion == ord('r'):
+            value = repr(value)
+        elif node.conversion == ord('s'):
+            value = str(value)
+        elif node.conversion == ord('a'):
+            value = ascii(value)
+        spec = self.evaluate(node.format_spec, at) if node.format_spec is not None else ''
+        if spec is UNRESOLVED:
+            return UNRESOLVED
+        return format(value, spec)
+
+    def _eval_Subscript(self, node: ast.Subscript, at: int) -> Any:
+        value = self.evaluate(node.value, at)
+        index = node.slice.value if isinstance(node.slice, getattr(ast, 'Index', ())) else node.slice  # type: ignore[attr-defined]
+        key = self.evaluate(index, at)
+        if value is UNRESOLVED or key is UNRESOLVED:
+            return UNRESOLVED
+        return value[key]
+
+    def _eval_Slice(self, node: ast.Slice, at: int) -> Any:
+        bounds = [self.evaluate(n, at) if n is not None else None for n in (node.lower, node.upper, node.step)]
+        if UNRESOLVED in bounds:
+            return UNRESOLVED
+        return slice(*bounds)
+
+    def _eval_Call(self, node: ast.Call, at: int) -> Any:
+        func = node.func
+        if isinstance(func, ast.Attribute) and func.attr in STR_METHODS_:
+            receiver = self.evaluate(func.value, at)
+            if isinstance(receiver, str):
+                args, kwargs = self._call_arguments(node, at)
+                return getattr(receiver, func.attr)(*args, **kwargs)
+
+        # known functions first, so that io.open() is not taken for the open() method of a path
+        name = _dotted_name(func)
+        if name in self._calls:
+            if isinstance(func, ast.Name) and func.id in self.symbols:
+                return UNRESOLVED
+            args, kwargs = self._call_arguments(node, at)
+            return self._calls[name](args, kwargs)
+        if isinstance(func, ast.Attribute) and func.attr in ('read', 'read_text', 'open', 'resolve', 'absolute'):
+            return self._eval_file_method(func, at)
+        return UNRESOLVED
+
+    def _eval_file_method(self, func: ast.Attribute, at: int) -> Any:
+        receiver = self.evaluate(func.value, at)
+        if isinstance(receiver, _OpenedFile) and func.attr == 'read':
+            return FileContent((receiver.path,))
+        if isinstance(receiver, PurePosixPath):
+            if func.attr == 'read_text':
+                return FileContent((str(receiver),))
+            if func.attr == 'open':
+                return _OpenedFile(str(receiver))
+            if func.attr in ('resolve', 'absolute'):
+                return receiver
+        return UNRESOLVED
+
+    def _call_arguments(self, node: ast.Call, at: int) -> Tuple[List[Any], Dict[str, Any]]:
+        args = self._eval_all(node.args, at)
+        kwargs: Dict[str, Any] = {}
+        for keyword in node.keywords:
+            value = self.evaluate(keyword.value, at)
+            if value is UNRESOLVED:
+                raise ValueError
+            if keyword.arg is None:
+                kwargs.update(value)
+            else:
+                kwargs[keyword.arg] = value
+        return args, kwargs
+
+
+def _dotted_name(node: ast.expr) -> Optional[str]:
+    """Return the dotted name of a Name or Attribute chain, e.g. distutils.core."""
+    parts: List[str] = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return '.'.join(reversed(parts))
@@ -0,0 +1,212 @@
+"""Persistent SQLite index of the metadata, dependencies and entry points of projects.
+
+Each project is recorded with the hash of its inputs, as computed for the migration cache,
+so an update only converts the projects whose setup.py, setup.cfg or MANIFEST.in changed.
+Queries read the index alone and never parse a project.
+"""
+
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+# Typing related imports
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from .cache import MigrationCache, default_cache_dir
+from .requirements import Requirement, normalize_name, parse_requirement, specifiers_overlap
+
+if TYPE_CHECKING:
+    from .metadata import ProjectMetadata
+
+SCHEMA_VERSION_ = 1
+# project fields with a column of their own, that missing() can look for
+INDEXED_FIELDS_: Tuple[str, ...] = ('name', 'version', 'requires_python', 'license', 'description')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS projects (
+    path TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    name TEXT,
+    version TEXT,
+    requires_python TEXT,
+    license TEXT,
+    description TEXT,
+    metadata TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS dependencies (
+    path TEXT NOT NULL,
+    extra TEXT NOT NULL,
+    name TEXT NOT NULL,
+    specifier TEXT NOT NULL,
+    marker TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dependencies_name ON dependencies (name);
+CREATE INDEX IF NOT EXISTS dependencies_path ON dependencies (path);
+CREATE TABLE IF NOT EXISTS entry_points (
+    path TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entry_points_name ON entry_points (name);
+CREATE INDEX IF NOT EXISTS entry_points_path ON entry_points (path);
+'''
+
+
+def default_index_path() -> Path:
+    """Return the path of the index in the per-user cache directory."""
+    return default_cache_dir() / 'index.sqlite3'
+
+
+class Dependency(NamedTuple):
+    """A requirement of an indexed project, extra is '' for the install requirements."""
+
+    path: str
+    extra: str
+    name: str
+    specifier: str
+    marker: str
+
+
+class EntryPoint(NamedTuple):
+    path: str
+    group: str
+    name: str
+    value: str
+
+
+class IndexUpdate(NamedTuple):
+    """Counts of the projects converted, unchanged since the last update, removed and failed."""
+
+    indexed: int
+    unchanged: int
+    removed: int
+    failed: int
+
+
+def _requirement_row(path: str, extra: str, requirement: Requirement) -> Tuple[str, str, str, str, str]:
+    return path, extra, normalize_name(requirement.name), requirement.specifier, requirement.marker or ''
+
+
+class MetadataIndex:
+    """SQLite index of projects, created at path on first use."""
+
+    def __init__(self, path: Optional[Union[str, Path]] = None) -> None:
+        self.path = Path(path) if path else default_index_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path))
+        if self._connection.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION_:
+            with self._connection:
+                for table in ('projects', 'dependencies', 'entry_points'):
+                    self._connection.execute('DROP TABLE IF EXISTS {}'.format(table))
+                self._connection.executescript(_SCHEMA)
+                self._connection.execute('PRAGMA user_version = {}'.format(SCHEMA_VERSION_))
+
+    def __repr__(self) -> str:
+        return "MetadataIndex({!r})".format(str(self.path))
+
+    def __enter__(self) -> 'MetadataIndex':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def update(self, roots: Iterable[Union[str, Path]], jobs: Optional[int] = None,
+               options: Optional[Dict[str, Any]] = None, ignore: Iterable[str] = ()) -> IndexUpdate:
+        """Index the projects found under roots whose inputs changed, and forget the ones gone.
+
+        Projects are converted in memory, in a process pool as with migrate_many, nothing is
+        written to the projects.
+        """
+        from .batch import _run_all, convert_project
+        from .discovery import discover_projects
+
+        roots = [os.path.abspath(root) for root in roots]
+        stored = {path: key for path, key in self._connection.execute('SELECT path, key FROM projects')
+                  if any(path == root or path.startswith(os.path.join(root, '')) for root in roots)}
+        keys = {}
+        changed = []
+        for entry in discover_projects(roots, ignore):
+            path = str(entry.path)
+            try:
+                keys[path] = MigrationCache.key(entry.path, options)
+            except OSError:
+                continue
+            if stored.get(path) != keys[path]:
+                changed.append(entry)
+        removed = [path for path in stored if path not in keys]
+
+        failed = 0
+        with self._connection:
+            for path in removed:
+                self._delete(path)
+            for result in _run_all(convert_project, changed, jobs, options):
+                failed += result.status == 'error'
+                self._record(result.path, keys[result.path], result.metadata, result.error)
+        return IndexUpdate(len(changed), len(keys) - len(changed), len(removed), failed)
+
+    def _delete(self, path: str) -> None:
+        for table in ('projects', 'dependencies', 'entry_points'):
+            self._connection.execute('DELETE FROM {} WHERE path = ?'.format(table), (path,))
+
+    def _record(self, path: str, key: str, metadata: Optional['ProjectMetadata'], error: Optional[str]) -> None:
+        """Replace the rows of a project with its metadata."""
+        self._delete(path)
+        if metadata is None:
+            self._connection.execute('INSERT INTO projects (path, key, error) VALUES (?, ?, ?)', (path, key, error))
+            return
+
+        fields = ('name', 'version', 'author', 'author_email', 'maintainer', 'maintainer_email', 'url', 'license',
+                  'description', 'keywords', 'classifiers')
+        core = {field: getattr(metadata, field) for field in fields}
+        self._connection.execute(
+            'INSERT INTO projects (path, key, name, version, requires_python, license, description, metadata) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (path, key, metadata.name or None, metadata.version or None, metadata.python_requires,
+             metadata.license or None, metadata.description or None, json.dumps(core)))
+        self._connection.executemany(
+            'INSERT INTO dependencies VALUES (?, ?, ?, ?, ?)',
+            [_requirement_row(path, '', requirement) for requirement in metadata.requirements]
+            + [_requirement_row(path, extra, requirement)
+               for extra, requirements in metadata.optional_requirements for requirement in requirements])
+        self._connection.executemany(
+            'INSERT INTO entry_points VALUES (?, ?, ?, ?)',
+            [(path, entry_point.group, entry_point.name, entry_point.value) for entry_point in metadata.entry_points])
+
+    def depends(self, requirement: str) -> List[Dependency]:
+        """Return the requirements on a project which allow a version its specifier allows, if any.
+
+        depends('requests<2.28') finds requests>=2.20 and requests, but not requests>=2.28.
+        """
+        wanted = parse_requirement(requirement)
+        rows = self._connection.execute('SELECT path, extra, name, specifier, marker FROM dependencies '
+                                        'WHERE name = ? ORDER BY path, extra', (normalize_name(wanted.name),))
+        return [Dependency(*row) for row in rows if specifiers_overlap(row[3], wanted.specifier)]
+
+    def missing(self, field: str) -> List[str]:
+        """Return the paths of the projects without a value for field, one of INDEXED_FIELDS_."""
+        if field not in INDEXED_FIELDS_:
+            raise ValueError("Unknown field {!r}, expected one of {}".format(field, ', '.join(INDEXED_FIELDS_)))
+        rows = self._connection.execute('SELECT path FROM projects WHERE error IS NULL AND {} IS NULL '
+                                        'ORDER BY path'.format(field))
+        return [path for path, in rows]
+
+    def entry_points(self, name: Optional[str] = None) -> List[EntryPoint]:
+        """Return the entry points named name, or all of them."""
+        sql = 'SELECT path, grp, name, value FROM entry_points'
+        rows = self._connection.execute(sql + (' WHERE name = ?' if name else '') + ' ORDER BY path, name',
+                                        (name,) if name else ())
+        return [EntryPoint(*row) for row in rows]
+
+    def execute(self, sql: str, parameters: Iterable[Any] = ()) -> List[Tuple[Any, ...]]:
+        """Run a read-only SQL query against the projects, dependencies and entry_points tables."""
+        self._connection.execute('PRAGMA query_only = ON')
+        try:
+            return self._connection.execute(sql, tuple(parameters)).fetchall()
+        finally:
+            self._connection.execute('PRAGMA query_only = OFF')
@@ -0,0 +1,202 @@
+"""MANIFEST.in commands compiled into a single matcher over a snapshot of the project files."""
+
+import os
+import re
+
+# Typing related imports
+from typing import Callable, Dict, Iterable, List, Match, NamedTuple, Optional, Pattern, Sequence, Tuple
+
+from .utils import logger
+
+# MANIFEST.in commands: (whether they include files, whether their first argument is a directory)
+COMMANDS_: Dict[str, Tuple[bool, bool]] = {
+    'include': (True, False), 'exclude': (False, False),
+    'recursive-include': (True, True), 'recursive-exclude': (False, True),
+    'global-include': (True, False), 'global-exclude': (False, False),
+    'graft': (True, False), 'prune': (False, False),
+}
+PRUNED_DIRS_: Tuple[str, ...] = ('.git', '.hg', '.svn', '.bzr', '_darcs', 'CVS', 'RCS', 'build')
+
+
+class ManifestRule(NamedTuple):
+    """A MANIFEST.in command with its patterns translated to one regular expression.
+
+    prefix is the literal directory all its patterns start with, '' when any file may match.
+    """
+
+    command: str
+    include: bool
+    regex: str
+    prefix: str = ''
+
+
+class Manifest(NamedTuple):
+    """Resolved MANIFEST.in: the files it includes, and the files left out by an exclude command."""
+
+    include: Sequence[str]
+    exclude: Sequence[str]
+
+
+def _chunks(glob: str) -> List[str]:
+    return [chunk for chunk in glob.replace(os.sep, '/').split('/') if chunk and chunk != '.']
+
+
+def _literal_prefix(glob: str) -> str:
+    """Return the leading directories of glob without any wildcard, e.g. docs/ for docs/**/*.rst."""
+    normalized = '/'.join(_chunks(glob))
+    wildcard = min((i for i in (normalized.find(c) for c in '*?[') if i != -1), default=len(normalized))
+    return normalized[:normalized.rfind('/', 0, wildcard) + 1]
+
+
+def translate_pattern(glob: str) -> str:
+    """Translate a glob into a regular expression, as setuptools does for MANIFEST.in.
+
+    * and ? do not match /, and a ** path component matches any number of directories.
+    """
+    chunks = _chunks(glob)
+    regex = ''
+    for i, chunk in enumerate(chunks):
+        last = i == len(chunks) - 1
+        if chunk == '**':
+            regex += '.*' if last else '(?:[^/]+/)*'
+            continue
+        j = 0
+        while j < len(chunk):
+            char = chunk[j]
+            if char == '*':
+                regex += '[^/]*'
+            elif char == '?':
+                regex += '[^/]'
+            elif char == '[':
+                end = chunk.find(']', j + 2 if chunk[j + 1:j + 2] in ('!', ']') else j + 1)
+                if end == -1:
+                    regex += re.escape(char)
+                else:
+                    inner = chunk[j + 1:end]
+                    if inner.startswith('!'):
+                        inner = '^' + inner[1:]
+                    regex += '[{}]'.format(inner.replace('\\', '\\\\'))
+                    j = end
+            else:
+                regex += re.escape(char)
+            j += 1
+        if not last:
+            regex += '/'
+    return regex + r'\Z'
+
+
+def _rule(command: str, args: List[str]) -> Optional[ManifestRule]:
+    include, recursive = COMMANDS_[command]
+    if command in ('graft', 'prune'):
+        if len(args) != 1:
+            return None
+        patterns = [args[0].rstrip('/') + '/**']
+    elif recursive:
+        if len(args) < 2:
+            return None
+        patterns = [args[0].rstrip('/') + '/**/' + pattern for pattern in args[1:]]
+    else:
+        if not args:
+            return None
+        patterns = ['**/' + pattern if command.startswith('global-') else pattern for pattern in args]
+    prefix = os.path.commonprefix([_literal_prefix(pattern) for pattern in patterns])
+    return ManifestRule(command, include, '|'.join(translate_pattern(pattern) for pattern in patterns),
+                        prefix[:prefix.rfind('/') + 1])
+
+
+def parse_manifest(lines: Iterable[str]) -> List[ManifestRule]:
+    """Parse MANIFEST.in lines, with comments and backslash continuations, into rules.
+
+    Unknown commands and commands with missing arguments are reported and skipped.
+    """
+    rules = []
+    pending = ''
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if line.endswith('\\'):
+            pending += line[:-1] + ' '
+            continue
+        line, pending = pending + line, ''
+        if not line:
+            continue
+        words = line.split()
+        command, args = words[0], words[1:]
+        rule = _rule(command, args) if command in COMMANDS_ else None
+        if rule is None:
+            logger.warning("Invalid MANIFEST.in line: {}".format(line))
+            continue
+        rules.append(rule)
+    return rules
+
+
+def compile_rules(rules: List[ManifestRule], indices: Iterable[int]) -> Pattern[str]:
+    """Compile rules into one regular expression whose matching group is the last rule matching a path.
+
+    Alternatives are tried in order, so listing the rules backwards makes the first
+    alternative that matches the last rule applying to the path, which decides its fate.
+    """
+    alternatives = ['(?P<r{}>{})'.format(i, rules[i].regex) for i in sorted(indices, reverse=True)]
+    return re.compile('(?:{})'.format('|'.join(alternatives)), re.DOTALL)
+
+
+def resolve_manifest(rules: List[ManifestRule], files: Iterable[str]) -> Manifest:
+    """Apply rules to files, relative posix paths of the project, in a single pass.
+
+    The files of a directory are matched against one regular expression made of the rules
+    whose literal prefix contains that directory only, so that hundreds of rules scoped to
+    different directories do not cost hundreds of failed matches per file. Regular
+    expressions are shared by the directories that select the same rules.
+    """
+    include: List[str] = []
+    exclude: List[str] = []
+    if not rules:
+        return Manifest(include, exclude)
+
+    matchers: Dict[Tuple[int, ...], Callable[[str], Optional[Match[str]]]] = {}
+    directory_matchers: Dict[str, Callable[[str], Optional[Match[str]]]] = {}
+    for path in files:
+        directory = path[:path.rfind('/') + 1]
+        match = directory_matchers.get(directory)
+        if match is None:
+            selected = tuple(i for i, rule in enumerate(rules) if directory.startswith(rule.prefix))
+            match = matchers.get(selected)
+            if match is None:
+                match = matchers[selected] = compile_rules(rules, selected).match if selected else _no_match
+            directory_matchers[directory] = match
+        m = match(path)
+        if m is None:
+            continue
+        if rules[int(m.lastgroup[1:])].include:  # type: ignore[index]
+            include.append(path)
+        else:
+            exclude.append(path)
+    return Manifest(sorted(include), sorted(exclude))
+
+
+def _no_match(path: str) -> None:
+    return None
+
+
+def snapshot(root: str) -> List[str]:
+    """List the files under root as relative posix paths, with one os.scandir per directory.
+
+    Version control directories and build/ are left out, as setuptools prunes them from sdists.
+    """
+    files = []
+    stack = [(root, '')]
+    while stack:
+        path, prefix = stack.pop()
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not (entry.name in PRUNED_DIRS_ or entry.name.endswith('.egg-info')):
+                                stack.append((entry.path, prefix + entry.name + '/'))
+                        else:
+                            files.append(prefix + entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return files
@@ -0,0 +1,344 @@
+"""Format-preserving merge of a generated pyproject.toml mapping into an existing document.
+
+The existing document is split into statements, table headers and key/value pairs, which
+may span lines, keeping comments and blank lines as they are. The tables the emitter
+generated, among [build-system], [project] and the [tool] table of the backend, are compared
+key by key with the generated mapping: the statements of a key whose value is unchanged are
+left untouched, only changed, new and removed keys are rewritten, so that the document
+changes by as few lines as the metadata did. Everything else is kept byte for byte.
+"""
+
+import json
+import re
+
+# Typing related imports
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# tables an emitter may generate, owned when it does: their keys missing from the generated mapping are removed
+OWNED_TABLES_: Tuple[Tuple[str, ...], ...] = (('build-system',), ('project',))
+
+_BARE_KEY_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class MergeError(ValueError):
+    """Raised when a document cannot be merged without rewriting it."""
+
+
+class _Statement(NamedTuple):
+    """Lines start to end of a statement, kind is 'table', 'array', 'entry' or 'trivia'."""
+
+    start: int
+    end: int
+    kind: str
+    path: Tuple[str, ...]
+
+
+def _key_path(text: str, pos: int, stop: str) -> Tuple[Tuple[str, ...], int]:
+    """Parse the dotted key of text starting at pos, return it and the position of stop after it."""
+    path = []
+    while True:
+        while pos < len(text) and text[pos] in ' \t':
+            pos += 1
+        if pos < len(text) and text[pos] in '"\'':
+            quote = text[pos]
+            end = pos + 1
+            while end < len(text) and text[end] != quote:
+                end += 2 if quote == '"' and text[end] == '\\' else 1
+            raw = text[pos:end + 1]
+            path.append(json.loads(raw) if quote == '"' else raw[1:-1])
+            pos = end + 1
+        else:
+            match = re.match(r'[A-Za-z0-9_-]+', text[pos:])
+            if match is None:
+                raise MergeError("Invalid key: {!r}".format(text.strip()))
+            path.append(match.group())
+            pos += match.end()
+        while pos < len(text) and text[pos] in ' \t':
+            pos += 1
+        if text.startswith('.', pos):
+            pos += 1
+            continue
+        if not text.startswith(stop, pos):
+            raise MergeError("Invalid key: {!r}".format(text.strip()))
+        return tuple(path), pos
+
+
+def _value_end(lines: List[str], start: int, pos: int) -> int:
+    """Return the line after the value starting at pos of lines[start], which may span lines."""
+    depth = 0
+    state = None
+    index = start
+    while index < len(lines):
+        line = lines[index]
+        k = pos
+        while k < len(line):
+            if state is None:
+                if line.startswith(('"""', "'''"), k):
+                    state = line[k:k + 3]
+                    k += 3
+                    continue
+                char = line[k]
+                if char in '"\'':
+                    state = char
+                elif char in '[{':
+                    depth += 1
+                elif char in ']}':
+                    depth -= 1
+                elif char == '#':
+                    break
+            elif state in ('"', '"""') and line[k] == '\\':
+                k += 2
+                continue
+            elif line.startswith(state, k):
+                k += len(state)
+                state = None
+                continue
+            k += 1
+        index += 1
+        pos = 0
+        if state in ('"', "'"):
+            # single line strings end with their line
+            state = None
+        if state is None and depth <= 0:
+            break
+    return index
+
+
+def _statements(lines: List[str]) -> List[_Statement]:
+    statements = []
+    index = 0
+    while index < len(lines):
+        stripped = lines[index].strip()
+        if not stripped or stripped.startswith('#'):
+            statements.append(_Statement(index, index + 1, 'trivia', ()))
+            index += 1
+        elif stripped.startswith('['):
+            array = stripped.startswith('[[')
+            offset = lines[index].index('[') + (2 if array else 1)
+            path, _ = _key_path(lines[index], offset, ']]' if array else ']')
+            statements.append(_Statement(index, index + 1, 'array' if array else 'table', path))
+            index += 1
+        else:
+            path, pos = _key_path(lines[index], 0, '=')
+            end = _value_end(lines, index, pos + 1)
+            statements.append(_Statement(index, end, 'entry', path))
+            index = end
+    return statements
+
+
+def _key(key: str) -> str:
+    return key if _BARE_KEY_RE.match(key) else json.dumps(key, ensure_ascii=False)
+
+
+def _inline(value: Any) -> str:
+    """Return value as an inline TOML value."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, dict):
+        return '{{{}}}'.format(', '.join('{} = {}'.format(_key(key), _inline(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return '[{}]'.format(', '.join(_inline(item) for item in value))
+    import toml
+
+    return str(toml.TomlEncoder().dump_value(value))
+
+
+def _is_table(value: Any) -> bool:
+    return isinstance(value, dict) or (isinstance(value, list) and bool(value)
+                                       and all(isinstance(item, dict) for item in value))
+
+
+def _section(path: Tuple[str, ...], value: Any) -> str:
+    """Return a table, or an array of tables, with its subtables as TOML sections."""
+    if isinstance(value, list):
+        return '\n'.join(_table(path, item, '[[{}]]') for item in value)
+    return _table(path, value, '[{}]')
+
+
+def _table(path: Tuple[str, ...], table: Dict[str, Any], header: str) -> str:
+    text = header.format('.'.join(_key(key) for key in path)) + '\n'
+    text += ''.join('{} = {}\n'.format(_key(key), _inline(value)) for key, value in table.items()
+                    if not _is_table(value))
+    for key, value in table.items():
+        if _is_table(value):
+            text += '\n' + _section(path + (key,), value)
+    return text
+
+
+def _get(document: Dict[str, Any], path: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+    node: Any = document
+    for key in path:
+        node = node.get(key) if isinstance(node, dict) else None
+    return node if isinstance(node, dict) else None
+
+
+class _Unit(NamedTuple):
+    """Lines start to end defining a key of a table, as an entry written with prefix or as a section."""
+
+    start: int
+    end: int
+    section: bool
+    prefix: Tuple[str, ...]
+
+
+def merge_pyproject(existing: str, pyproject: Dict[str, Any]) -> str:
+    """Return the existing pyproject.toml with the tables of the generated mapping updated.
+
+    The tables of OWNED_TABLES_ the mapping holds end up equal to the generated ones, the
+    others are left as they are, while the keys of the [tool] tables of the mapping are
+    updated and added without removing others. Raises MergeError if the document cannot be
+    parsed or merged.
+    """
+    import toml
+
+    try:
+        current = toml.loads(existing)
+    except Exception as e:
+        raise MergeError("Invalid pyproject.toml: {}".format(e)) from e
+    generated = toml.loads(toml.dumps(pyproject))
+    lines = existing.splitlines(keepends=True)
+    statements = _statements(lines)
+
+    tables = [(table, True) for table in OWNED_TABLES_ if _get(generated, table) is not None]
+    tables += [(('tool', name), False) for name in generated.get('tool', {})]
+    edits: List[Tuple[int, int, str]] = []
+    previous_end = None
+    for table, owned in tables:
+        new_table = _get(generated, table)
+        old_table = _get(current, table)
+        units: Dict[str, List[_Unit]] = {}
+        header_end = None  # the line after the last entry of the [table] section itself
+        table_end = None  # the line after the last statement defining the table
+        header: Tuple[str, ...] = ()
+        owner: Optional[str] = None
+        for statement in statements:
+            if statement.kind == 'trivia':
+                continue
+            if statement.kind in ('table', 'array'):
+                header = statement.path
+                owner = None
+                if header[:len(table)] == table and len(header) > len(table):
+                    owner = header[len(table)]
+                    units.setdefault(owner, []).append(_Unit(statement.start, statement.end, True, ()))
+                    table_end = statement.end
+                elif header == table:
+                    header_end = table_end = statement.end
+                continue
+            if owner is not None:
+                # an entry of a section defining a key of the table, the section is its unit
+                last = units[owner][-1]
+                units[owner][-1] = last._replace(end=statement.end)
+                table_end = statement.end
+                continue
+            path = header + statement.path
+            if path[:len(table)] == table and len(path) > len(table):
+                relative = len(table) - len(header)
+                units.setdefault(path[len(table)], []).append(
+                    _Unit(statement.start, statement.end, False, statement.path[:relative]))
+                table_end = statement.end
+                if header == table:
+                    header_end = statement.end
+
+        if new_table is None:
+            continue
+        if old_table is None or not units and header_end is None:
+            text = _section(table, new_table)
+            if previous_end is not None:
+                edits.append((previous_end, previous_end, '\n' + text))
+            else:
+                first = next((statement.start for statement in statements if statement.kind != 'trivia'), None)
+                edits.append((first, first, text + '\n') if first is not None else (len(lines), len(lines), text))
+            continue
+
+        entries = []
+        sections = []
+        for key in list(old_table) + [key for key in new_table if key not in old_table]:
+            if key in old_table and key in new_table and old_table[key] == new_table[key]:
+                continue
+            spans = units.get(key, [])
+            if key not in new_table:
+                if owned:
+                    edits.extend((unit.start, unit.end, '') for unit in spans)
+                continue
+            value = new_table[key]
+            if spans and (_is_table(value) or not spans[0].section):
+                # rewrite the key where it is, as a section or as an entry as it was written
+                unit = spans[0]
+                text = (_section(table + (key,), value) if unit.section else
+                        '{} = {}\n'.format('.'.join(_key(part) for part in unit.prefix + (key,)), _inline(value)))
+                edits.append((unit.start, unit.end, text))
+                edits.extend((unit.start, unit.end, '') for unit in spans[1:])
+                continue
+            edits.extend((unit.start, unit.end, '') for unit in spans)
+            if _is_table(value):
+                sections.append(_section(table + (key,), value))
+            else:
+                entries.append('{} = {}\n'.format(_key(key), _inline(value)))
+        if entries:
+            if header_end is not None:
+                edits.append((header_end, header_end, ''.join(entries)))
+            else:
+                first_unit = min(unit.start for spans in units.values() for unit in spans)
+                edits.append((first_unit, first_unit,
+                              '[{}]\n'.format('.'.join(_key(part) for part in table)) + ''.join(entries) + '\n'))
+        end = table_end if table_end is not None else len(lines)
+        for text in sections:
+            edits.append((end, end, '\n' + text))
+        previous_end = end
+
+    if not edits:
+        return existing
+    merged = _apply(lines, edits)
+    _check(merged, current, generated, tables)
+    return merged
+
+
+def _apply(lines: List[str], edits: List[Tuple[int, int, str]]) -> str:
+    newline = '\r\n' if lines and lines[0].endswith('\r\n') else '\n'
+    if lines and not lines[-1].endswith('\n'):
+        lines = lines[:-1] + [lines[-1] + newline]
+    output = []
+    position = 0
+    # sorted is stable: insertions at a line stay in order, before a change starting there
+    for start, end, text in sorted(edits, key=lambda edit: (edit[0], edit[1])):
+        if start < position:
+            raise MergeError("Overlapping changes at line {}".format(start + 1))
+        output.extend(lines[position:start])
+        output.append(text.replace('\n', newline))
+        position = max(position, end)
+    output.extend(lines[position:])
+    return ''.join(output)
+
+
+def _check(merged: str, current: Dict[str, Any], generated: Dict[str, Any],
+           tables: List[Tuple[Tuple[str, ...], bool]]) -> None:
+    """Raise MergeError unless merged holds the generated tables and the rest of the document."""
+    import toml
+
+    try:
+        document = toml.loads(merged)
+    except Exception as e:
+        raise MergeError("Merged pyproject.toml is invalid: {}".format(e)) from e
+    for table, owned in tables:
+        new_table = _get(generated, table) or {}
+        merged_table = _get(document, table) or {}
+        if owned and merged_table != new_table:
+            raise MergeError("[{}] differs after the merge".format('.'.join(table)))
+        if any(merged_table.get(key) != value for key, value in new_table.items()):
+            raise MergeError("[{}] differs after the merge".format('.'.join(table)))
+    owned_names = {table[0] for table, owned in tables if owned}
+    tool_names = set(generated.get('tool', {}))
+    for key in set(current) | set(document):
+        if key in owned_names:
+            continue
+        if key == 'tool':
+            old_tools = {name: value for name, value in current.get('tool', {}).items() if name not in tool_names}
+            new_tools = {name: value for name, value in document.get('tool', {}).items() if name not in tool_names}
+            if old_tools != new_tools:
+                raise MergeError("[tool] tables changed by the merge")
+        elif current.get(key) != document.get(key):
+            raise MergeError("[{}] changed by the merge".format(key))
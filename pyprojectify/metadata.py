@@ -0,0 +1,274 @@
+"""Compact intermediate representation of the metadata of a project, which every emitter reads.
+
+setup() keyword arguments, from setup.py and setup.cfg, are normalized once into a
+ProjectMetadata: a slotted object holding tuples instead of dicts and lists. Strings that
+repeat across projects, such as classifiers, licenses and requirements, are interned, and
+equal tuples of them are shared, so that holding the metadata of many projects costs
+little more than what is specific to each of them.
+"""
+
+import os
+import sys
+from functools import lru_cache
+
+# Typing related imports
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from .requirements import InvalidRequirement, Requirement, parse_requirement
+from .utils import logger
+
+if TYPE_CHECKING:
+    from .manifest import Manifest
+
+CORE_FIELDS_: Tuple[str, ...] = ('name', 'version', 'author', 'author_email', 'maintainer', 'maintainer_email',
+                                 'url', 'license', 'description', 'long_description', 'keywords', 'classifiers')
+# free text specific to each project, not worth interning
+UNSHARED_FIELDS_: Tuple[str, ...] = ('description', 'long_description')
+
+README_CONTENT_TYPES_: Dict[str, str] = {'.rst': 'text/x-rst', '.md': 'text/markdown', '.markdown': 'text/markdown',
+                                         '.txt': 'text/plain'}
+
+
+class Readme(NamedTuple):
+    """Files the long description is read from, concatenated when there are several."""
+
+    files: Tuple[str, ...]
+    content_type: str
+
+
+class EntryPoint(NamedTuple):
+    group: str
+    name: str
+    value: str
+
+
+@lru_cache(maxsize=65536)
+def _shared(value: Any) -> Any:
+    """Return the first value equal to value seen, so that equal tuples are stored once."""
+    return value
+
+
+def _intern(value: Any) -> Any:
+    """Intern strings, and strings in tuples and lists, returning lists as shared tuples."""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, (list, tuple)) and all(isinstance(item, str) for item in value):
+        return _shared(tuple(sys.intern(item) for item in value))
+    return value
+
+
+@lru_cache(maxsize=8192)
+def _requirement(line: str, marker: str = '') -> Requirement:
+    """Parse a requirement with its strings interned, optionally adding a marker to it."""
+    requirement = parse_requirement(line)
+    if marker:
+        combined = '({}) and ({})'.format(requirement.marker, marker) if requirement.marker else marker
+        requirement = requirement._replace(marker=combined)
+    return Requirement(sys.intern(requirement.name), _intern(requirement.extras), sys.intern(requirement.specifier),
+                       requirement.url, requirement.marker and sys.intern(requirement.marker))
+
+
+def requirement_lines(requirements: Any) -> List[str]:
+    """Return requirements given as a list or as a multi-line string as a list of strings."""
+    if not requirements:
+        return []
+    if isinstance(requirements, str):
+        requirements = requirements.splitlines()
+    return [line.strip() for line in requirements if line and not line.strip().startswith('#')]
+
+
+def _requirements(requirements: Any, marker: str = '') -> Tuple[Requirement, ...]:
+    """Parse requirements, reporting and skipping the invalid ones."""
+    parsed = []
+    for line in requirement_lines(requirements):
+        try:
+            parsed.append(_requirement(line, marker))
+        except InvalidRequirement as e:
+            logger.warning(str(e))
+    shared: Tuple[Requirement, ...] = _shared(tuple(parsed))
+    return shared
+
+
+def _entry_points(entry_points: Any) -> Tuple[EntryPoint, ...]:
+    """Return entry points given as a mapping of groups to lines, or as an ini string, as a tuple."""
+    if isinstance(entry_points, str):
+        groups: Dict[str, List[str]] = {}
+        group = None
+        for line in entry_points.splitlines():
+            line = line.strip()
+            if line.startswith('[') and line.endswith(']'):
+                group = line[1:-1].strip()
+            elif line and group is not None and not line.startswith(('#', ';')):
+                groups.setdefault(group, []).append(line)
+        entry_points = groups
+    if not isinstance(entry_points, dict):
+        return ()
+    parsed = []
+    for group, lines in entry_points.items():
+        for line in requirement_lines(lines):
+            name, separator, value = line.partition('=')
+            if separator:
+                parsed.append(EntryPoint(sys.intern(str(group)), name.strip(), value.strip()))
+    return tuple(parsed)
+
+
+def merge_setup_arguments(setup_kwargs: Dict[str, Any], setup_cfg: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Return the arguments of setup.cfg updated with the ones given to setup(), as setuptools does."""
+    if not setup_cfg:
+        return setup_kwargs
+    return dict(setup_cfg, **{key: value for key, value in setup_kwargs.items() if value is not None})
+
+
+def _readme(paths: Tuple[str, ...], content_type: Optional[str]) -> Readme:
+    if not content_type:
+        content_type = README_CONTENT_TYPES_.get(os.path.splitext(paths[0])[1].lower(), 'text/plain')
+    return Readme(_intern(paths), sys.intern(content_type))
+
+
+class ProjectMetadata:
+    """Metadata of a project, normalized from the setup() keyword arguments.
+
+    Core fields are None when they are not given and '' when they are given but cannot be
+    resolved. The long description is either its text or the Readme files it is read from.
+    Classifiers are checked against the bundled trove index, with the deprecated ones
+    replaced, and license_expression is the license as an SPDX expression when it maps to one.
+    """
+
+    __slots__ = CORE_FIELDS_ + ('long_description_content_type', 'license_expression', 'readme', 'python_requires',
+                                'project_urls', 'setup_requires', 'requirements', 'optional_requirements',
+                                'entry_points', 'packages', 'package_dir', 'package_data', 'manifest')
+
+    name: Optional[str]
+    version: Optional[str]
+    author: Optional[str]
+    author_email: Optional[str]
+    maintainer: Optional[str]
+    maintainer_email: Optional[str]
+    url: Optional[str]
+    license: Optional[str]
+    description: Optional[str]
+    long_description: Optional[str]
+    keywords: Union[str, Tuple[str, ...], None]
+    classifiers: Optional[Tuple[str, ...]]
+    long_description_content_type: Optional[str]
+    license_expression: Optional[str]
+    readme: Optional[Readme]
+    python_requires: Optional[str]
+    project_urls: Tuple[Tuple[str, str], ...]
+    setup_requires: Tuple[str, ...]
+    requirements: Tuple[Requirement, ...]
+    optional_requirements: Tuple[Tuple[str, Tuple[Requirement, ...]], ...]
+    entry_points: Tuple[EntryPoint, ...]
+    packages: Optional[Tuple[str, ...]]
+    package_dir: Tuple[Tuple[str, str], ...]
+    package_data: Tuple[Tuple[str, Tuple[str, ...]], ...]
+    manifest: Optional['Manifest']
+
+    def __init__(self, **fields: Any) -> None:
+        for field in self.__slots__:
+            setattr(self, field, fields.pop(field, () if field in ('project_urls', 'setup_requires', 'requirements',
+                                                                   'optional_requirements', 'entry_points',
+                                                                   'package_dir', 'package_data') else None))
+        if fields:
+            raise TypeError("Unknown metadata fields: {}".format(', '.join(fields)))
+
+    def __repr__(self) -> str:
+        return 'ProjectMetadata(name={!r}, version={!r})'.format(self.name, self.version)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ProjectMetadata):
+            return NotImplemented
+        return self.__getstate__() == other.__getstate__()
+
+    def __getstate__(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def __setstate__(self, state: Tuple[Any, ...]) -> None:
+        # unpickled strings are new objects, intern them again
+        for field, value in zip(self.__slots__, state):
+            if field not in UNSHARED_FIELDS_:
+                value = _intern(value)
+            if field == 'requirements':
+                value = _shared(tuple(_shared(item) for item in value))
+            elif field == 'optional_requirements':
+                value = tuple((sys.intern(extra), _shared(tuple(_shared(r) for r in group))) for extra, group in value)
+            setattr(self, field, value)
+
+    @classmethod
+    def from_setup(cls, setup_kwargs: Dict[str, Any], setup_cfg: Optional[Dict[str, Any]] = None,
+                   manifest: Optional['Manifest'] = None) -> 'ProjectMetadata':
+        """Normalize setup() keyword arguments, over the declarative ones of setup.cfg."""
+        from .evaluator import FileContent
+        from .trove import check_classifiers, license_candidates, spdx_expression
+
+        setup_kwargs = merge_setup_arguments(setup_kwargs, setup_cfg)
+
+        fields: Dict[str, Any] = {}
+        for key in CORE_FIELDS_:
+            if key not in setup_kwargs:
+                continue
+            value = setup_kwargs[key]
+            if key == 'long_description' and isinstance(value, FileContent):
+                fields['readme'] = _readme(value.paths, setup_kwargs.get('long_description_content_type'))
+            elif value is None:
+                fields[key] = ''
+            else:
+                fields[key] = value if key in UNSHARED_FIELDS_ else _intern(value)
+        if isinstance(fields.get('classifiers'), tuple):
+            fields['classifiers'] = _intern(check_classifiers(fields['classifiers']))
+        if fields.get('license') and isinstance(fields['license'], str):
+            fields['license_expression'] = spdx_expression(fields['license'])
+            if fields['license_expression'] is None and '\n' not in fields['license'].strip():
+                candidates = license_candidates(fields['license'])
+                logger.warning("License {!r} is {}".format(fields['license'], 'ambiguous, did you mean {}?'.format(
+                    ' or '.join(candidates)) if candidates else 'not an SPDX license expression'))
+        if isinstance(fields.get('long_description'), str) and setup_kwargs.get('long_description_content_type'):
+            fields['long_description_content_type'] = sys.intern(str(setup_kwargs['long_description_content_type']))
+
+        python_requires = setup_kwargs.get('python_requires')
+        if python_requires:
+            try:
+                fields['python_requires'] = _requirement('python' + str(python_requires)).specifier
+            except InvalidRequirement as e:
+                logger.warning(str(e))
+
+        dependencies = _requirements(setup_kwargs.get('install_requires'))
+        extras_require = setup_kwargs.get('extras_require') or {}
+        optional: Dict[str, Tuple[Requirement, ...]] = {}
+        for extra, requirements in extras_require.items():
+            # "group:marker" keys add the marker to the requirements of the group, and ":marker"
+            # keys, without a group, to conditional requirements of the project itself
+            group, _, marker = str(extra).partition(':')
+            if not group.strip():
+                dependencies = _shared(dependencies + _requirements(requirements, marker.strip()))
+                continue
+            optional[group] = optional.get(group, ()) + _requirements(requirements, marker.strip())
+
+        project_urls = setup_kwargs.get('project_urls') or {}
+        packages = setup_kwargs.get('packages')
+        package_dir = setup_kwargs.get('package_dir') or {}
+        package_data = setup_kwargs.get('package_data') or {}
+        return cls(
+            project_urls=tuple((sys.intern(str(label)), str(url)) for label, url in project_urls.items())
+            if isinstance(project_urls, dict) else (),
+            setup_requires=_intern(requirement_lines(setup_kwargs.get('setup_requires'))),
+            requirements=dependencies,
+            optional_requirements=tuple((sys.intern(group), _shared(requirements))
+                                        for group, requirements in optional.items()),
+            entry_points=_entry_points(setup_kwargs.get('entry_points')),
+            packages=_intern(list(packages)) if packages is not None else None,
+            package_dir=tuple((sys.intern(str(package)), sys.intern(str(directory)))
+                              for package, directory in package_dir.items()) if isinstance(package_dir, dict) else (),
+            package_data=tuple((str(package), _intern(list(patterns)))
+                               for package, patterns in package_data.items() if isinstance(patterns, (list, tuple))),
+            manifest=manifest and manifest._replace(include=_intern(list(manifest.include)),
+                                                    exclude=_intern(list(manifest.exclude))),
+            **fields)
+
+    def scripts(self, group: str = 'console_scripts') -> Iterable[EntryPoint]:
+        """Return the entry points of group."""
+        return (entry_point for entry_point in self.entry_points if entry_point.group == group)
+
+    def top_level_packages(self) -> List[str]:
+        """Return the packages that are not subpackages of another one."""
+        return [package for package in self.packages or () if '.' not in package]
@@ -0,0 +1,93 @@
+"""Static replacement of setuptools.find_packages and find_namespace_packages."""
+
+import fnmatch
+import os
+import re
+from functools import lru_cache
+
+# Typing related imports
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+DEFAULT_EXCLUDE_: Tuple[str, ...] = ('ez_setup', '*__pycache__')
+
+
+class FindPackages(NamedTuple):
+    """A find_packages() or find_namespace_packages() call, resolved later against the project directory."""
+
+    where: str = '.'
+    include: Tuple[str, ...] = ('*',)
+    exclude: Tuple[str, ...] = ()
+    namespace: bool = False
+
+    @classmethod
+    def from_call(cls, args: List[Any], kwargs: Dict[str, Any], namespace: bool = False) -> 'FindPackages':
+        """Build from the arguments of a call, find_packages(where='.', exclude=(), include=('*',))."""
+        arguments = dict(zip(('where', 'exclude', 'include'), args), **kwargs)
+        return cls(str(arguments.get('where', '.')), tuple(arguments.get('include', ('*',))),
+                   tuple(arguments.get('exclude', ())), namespace)
+
+
+@lru_cache(maxsize=256)
+def _compile(patterns: Tuple[str, ...]) -> Callable[[str], Any]:
+    """Compile fnmatch patterns into the match method of a single regular expression."""
+    if not patterns:
+        return lambda name: None
+    return re.compile('|'.join(fnmatch.translate(pattern) for pattern in patterns)).match
+
+
+# a listing returns whether a directory has an __init__.py file and its sorted subdirectories
+Listing = Callable[[str], Optional[Tuple[bool, List[str]]]]
+
+
+def scandir_listing(path: str) -> Optional[Tuple[bool, List[str]]]:
+    """List a directory of the file system with a single os.scandir."""
+    has_init = False
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.name == '__init__.py':
+                        has_init = has_init or entry.is_file()
+                    elif '.' not in entry.name and entry.is_dir():
+                        subdirs.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        return None
+    subdirs.sort()
+    return has_init, subdirs
+
+
+def find_packages(root: str, where: str = '.', include: Iterable[str] = ('*',), exclude: Iterable[str] = (),
+                  namespace: bool = False, listing: Listing = scandir_listing) -> List[str]:
+    """Return the packages under root/where, like setuptools' finders without importing setuptools.
+
+    Each directory is listed once, with os.scandir unless another listing is given. Without
+    namespace, a directory without __init__.py is not a package and is not descended into;
+    with namespace, every directory is a PEP 420 package. As with setuptools, excluding a
+    package keeps its subpackages unless the exclude pattern ends with * right after its name.
+    """
+    included = _compile(tuple(include))
+    exclude = tuple(exclude) + DEFAULT_EXCLUDE_
+    excluded = _compile(exclude)
+    pruned = frozenset(exclude)
+
+    packages: List[str] = []
+    base = os.path.join(root, where)
+    top = listing(base)
+    stack = [(os.path.join(base, name), name) for name in reversed(top[1])] if top else []
+    while stack:
+        path, package = stack.pop()
+        listed = listing(path)
+        if listed is None:
+            continue
+        has_init, subdirs = listed
+        if not namespace and not has_init:
+            continue
+        if included(package) and not excluded(package):
+            packages.append(package)
+        if package + '*' in pruned or package + '.*' in pruned:
+            continue
+        stack.extend((os.path.join(path, name), package + '.' + name) for name in reversed(subdirs))
+    return packages
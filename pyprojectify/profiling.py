@@ -0,0 +1,131 @@
+"""Per-stage timing hooks and aggregated profiling reports."""
+
+import time
+from pathlib import Path
+
+# Typing related imports
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Union
+
+STAGES_ = ('read', 'parse', 'evaluate', 'read_config', 'find_packages', 'manifest', 'build', 'emit', 'render', 'write')
+
+
+class StageEvent(NamedTuple):
+    """Start or end of a migration stage; duration and nbytes are only set on end events."""
+
+    stage: str
+    phase: str
+    path: str
+    duration: float = 0.0
+    nbytes: int = 0
+
+
+Hook = Callable[[StageEvent], None]
+
+
+class _NullStage:
+    """Stage used when no hook is registered, so that disabled instrumentation costs a method call."""
+
+    nbytes = 0
+
+    def __enter__(self) -> '_NullStage':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        return None
+
+
+NULL_STAGE = _NullStage()
+
+
+class Stage:
+    """Context manager timing a stage and emitting its start and end events to hooks.
+
+    The code running in the stage may set nbytes to the number of bytes it read or wrote.
+    """
+
+    def __init__(self, hooks: List[Hook], stage: str, path: str) -> None:
+        self.hooks = hooks
+        self.stage = stage
+        self.path = path
+        self.nbytes = 0
+        self._start = 0.0
+
+    def __enter__(self) -> 'Stage':
+        event = StageEvent(self.stage, 'start', self.path)
+        for hook in self.hooks:
+            hook(event)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        event = StageEvent(self.stage, 'end', self.path, time.perf_counter() - self._start, self.nbytes)
+        for hook in self.hooks:
+            hook(event)
+
+
+class StageProfile:
+    """Hook aggregating the end events of any number of projects into per-stage statistics."""
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.projects = 0
+
+    def __call__(self, event: StageEvent) -> None:
+        if event.phase != 'end':
+            return
+        stats = self.stages.get(event.stage)
+        if stats is None:
+            stats = self.stages[event.stage] = {'count': 0, 'total': 0.0, 'max': 0.0, 'bytes': 0}
+        stats['count'] += 1
+        stats['total'] += event.duration
+        stats['max'] = max(stats['max'], event.duration)
+        stats['bytes'] += event.nbytes
+
+    def merge(self, other: Dict[str, Any]) -> None:
+        """Add the statistics of another profile, as returned by as_dict()."""
+        self.projects += other.get('projects', 0)
+        for stage, stats in other.get('stages', {}).items():
+            mine = self.stages.setdefault(stage, {'count': 0, 'total': 0.0, 'max': 0.0, 'bytes': 0})
+            mine['count'] += stats['count']
+            mine['total'] += stats['total']
+            mine['max'] = max(mine['max'], stats['max'])
+            mine['bytes'] += stats['bytes']
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the statistics as plain JSON serializable data, stages in pipeline order."""
+        order = {stage: i for i, stage in enumerate(STAGES_)}
+        stages = {}
+        for stage in sorted(self.stages, key=lambda s: (order.get(s, len(order)), s)):
+            stats = self.stages[stage]
+            stages[stage] = dict(stats, mean=stats['total'] / stats['count'] if stats['count'] else 0.0)
+        return {'projects': self.projects, 'stages': stages}
+
+    def write(self, file_path: Union[str, Path]) -> None:
+        """Write the report as JSON, durations in seconds."""
+        import json
+
+        with open(file_path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+
+class _StatsHolder:
+    """Adapter letting pstats.Stats load raw profiler statistics received from a worker."""
+
+    def __init__(self, stats: Dict[Any, Any]) -> None:
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        return None
+
+
+def merge_cprofile_stats(raw_stats: List[Dict[Any, Any]], file_path: Union[str, Path]) -> Optional[Any]:
+    """Merge the raw cProfile statistics of several workers and dump them to file_path."""
+    import pstats
+
+    if not raw_stats:
+        return None
+    stats = pstats.Stats(_StatsHolder(raw_stats[0]))  # type: ignore[arg-type]
+    for raw in raw_stats[1:]:
+        stats.add(_StatsHolder(raw))  # type: ignore[arg-type]
+    stats.dump_stats(str(file_path))
+    return stats
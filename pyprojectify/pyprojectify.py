@@ -1,14 +1,16 @@
-"""Main module."""
+"""Main module.
 
-import ast
-from collections import OrderedDict
+ast, toml, configparser and re are imported where they are used, so that importing
+pyprojectify stays cheap for the command line and for embedding applications.
+"""
+
+import os
 from pathlib import Path
-from configparser import ConfigParser
-import toml
-import re
 
 # Typing related imports
-from typing import DefaultDict, Dict, List, Optional, Tuple, Union, Generator, Any, Iterator, MutableMapping
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple, Union, MutableMapping
+
+from .profiling import NULL_STAGE, Hook, Stage
 
 PROJECT_METADATA_: Tuple[str, ...] = ('name', 'version', 'author', 'author_email', 'maintainer', 'maintainer_email',
                                       'url', 'license', 'description', 'long_description', 'keywords', 'classifiers')
@@ -18,234 +20,464 @@ try:
 except ModuleNotFoundError or ImportError:
     from .utils import logger
 
+if TYPE_CHECKING:
+    import ast
+    from .discovery import ProjectEntry
+    from .evaluator import Evaluator
+    from .manifest import Manifest
+    from .metadata import ProjectMetadata
+    from .sources import Source
+    from .verify import FieldDiff
+
+
+def _as_toml_types(value: Any) -> Any:
+    """Return value as it reads back from TOML, with tuples as lists and mappings as dicts."""
+    if isinstance(value, dict):
+        return {k: _as_toml_types(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_as_toml_types(v) for v in value]
+    return value
+
 
 class PyProject:
     """Main class."""
 
-    def __init__(self, package_path: Optional[Union[str, Path]] = None) -> None:
-        if package_path:
-            self.package_path = Path(package_path)
+    def __init__(self, package_path: Optional[Union[str, Path]] = None, execute_fallback: bool = False,
+                 backend: Optional[str] = None, merge: bool = False) -> None:
+        """execute_fallback runs setup.py in a sandbox when some setup() arguments cannot be parsed statically.
+
+        backend names the emitter of the pyproject.toml, setuptools by default. With merge, an
+        existing pyproject.toml is updated in place, keeping its other tables and comments,
+        instead of being replaced.
+        """
+        self.package_path = Path(package_path) if package_path else None
+        self.execute_fallback = execute_fallback
+        self.backend = backend
+        self.merge = merge
+        self._listing: Optional[Dict[str, bool]] = None
+        self._evaluator: Optional['Evaluator'] = None
+        self._setup_seq = 0
+        self._unresolved: List[str] = []
+        self._hooks: List[Hook] = []
+        self._source: Optional['Source'] = None
 
         return
 
+    @classmethod
+    def from_entry(cls, entry: 'ProjectEntry', **kwargs: Any) -> 'PyProject':
+        """Create a PyProject from a discovered project, reusing its directory listing."""
+        project = cls(entry.path, **kwargs)
+        project._listing = {'setup.py': entry.has_setup_py, 'setup.cfg': entry.has_setup_cfg,
+                            'MANIFEST.in': entry.has_manifest_in, 'pyproject.toml': entry.has_pyproject}
+        return project
+
+    @classmethod
+    def from_sources(cls, setup_py: Optional[str] = None, setup_cfg: Optional[str] = None,
+                     manifest_in: Optional[str] = None, files: Optional[Iterable[str]] = None,
+                     **kwargs: Any) -> 'PyProject':
+        """Create a PyProject from the content of its input files, for to_dict() and to_toml().
+
+        files lists the files of the project as relative posix paths, which find_packages(),
+        MANIFEST.in and readme files are resolved against; without it, referenced files are
+        assumed to exist. No file is read or written.
+        """
+        from .sources import MemorySource
+
+        inputs = (('setup.py', setup_py), ('setup.cfg', setup_cfg), ('MANIFEST.in', manifest_in))
+        contents = {name: content for name, content in inputs if content is not None}
+        project = cls(**kwargs)
+        project._source = MemorySource(contents, files)  # type: ignore[arg-type]
+        return project
+
     def __str__(self) -> str:
         return "PyProject"
 
     def __repr__(self) -> str:
         return "PyProject"
 
+    def add_hook(self, hook: Hook) -> None:
+        """Register a callable receiving a StageEvent when each migration stage starts and ends."""
+        self._hooks.append(hook)
+
+    def _stage(self, stage: str, path: Union[str, Path] = '') -> Union[Stage, Any]:
+        """Return a context manager timing stage, a shared no-op one when no hook is registered."""
+        if not self._hooks:
+            return NULL_STAGE
+        return Stage(self._hooks, stage, str(path or self.package_path or ''))
+
     @staticmethod
     def _get_current_working_directory() -> Path:
         """Get current working directory."""
         return Path.cwd()
 
     @staticmethod
-    def _has_setup_py(path: Path) -> bool:
-        """Check if setup.py exists."""
-        setup_py = Path(path / "setup.py")
-        return setup_py.is_file()
-
-    @staticmethod
-    def _has_setup_cfg(path: Path) -> bool:
-        """Check if setup.cfg exists."""
-        setup_cfg = Path(path / "setup.cfg")
-        return setup_cfg.is_file()
-
-    @staticmethod
-    def _has_manifest_in_(path: Path) -> bool:
-        """Check if MANIFEST.in exists."""
-        manifest = Path(path / "MANIFEST.in")
-        return manifest.is_file()
-
-    @staticmethod
-    def _has_pyproject(path: Path) -> bool:
-        """Check if pyproject.toml exists."""
-        pyproject = Path(path / "pyproject.toml")
-        return pyproject.is_file()
-
-    @staticmethod
-    def _parse_config_file(config_file: Path) -> Union[List[str], Optional[MutableMapping[str, Any]]]:
-        """Parse config file."""
+    def _parse_config_string(content: str, suffix: str) -> Union[List[str], Optional[MutableMapping[str, Any]]]:
+        """Parse the content of a config file of type suffix."""
         try:
-            if config_file.suffix == '.toml':
-                config = toml.load(config_file)
-            elif config_file.suffix in ('.ini', '.cfg'):
+            if suffix == '.toml':
+                import toml
+                config = toml.loads(content)
+            elif suffix in ('.ini', '.cfg'):
+                from configparser import ConfigParser
                 config = ConfigParser()
-                config.read(config_file)
-            elif config_file.suffix == '.in':
-                with open(config_file, 'r') as f:
-                    config = [line.rstrip() for line in f.readlines() if not line.startswith('#')]  # type: ignore[assignment]
-                    config = [line for line in config if line]  # type: ignore[assignment]
+                # keep the case of the keys, like setuptools, for package names and entry points
+                config.optionxform = str  # type: ignore[assignment, method-assign]
+                config.read_string(content)
+            elif suffix == '.in':
+                config = [line.rstrip() for line in content.splitlines() if not line.startswith('#')]  # type: ignore[assignment]
+                config = [line for line in config if line]  # type: ignore[assignment]
             else:
-                raise ValueError("Unknown config file type: {}".format(config_file.suffix))
+                raise ValueError("Unknown config file type: {}".format(suffix))
         except Exception as e:
             logger.error("Failed to parse config file: {}".format(e))
             raise e
 
         return config
 
-    def _parse_setup_py(self, file_path: Path) -> Dict[str, Any]:
+    def _parse_setup_py(self, file_path: Path, setup_py: Optional[str] = None) -> Dict[str, Any]:
         """Parse setup.py into it's Abstract Syntax Tree representation
         and extracts all keyword arguments from the setup() function.
+
+        setup.py is read from file_path, unless its content is given as setup_py.
         """
+        import ast
+        from .evaluator import Evaluator
+        from .setup_cfg import is_trivial_setup_py
+        from .setup_parser import SetupVisitor
+
         try:
-            with open(file_path, 'r') as f:
-                setup_py = f.read()
+            if setup_py is None:
+                with self._stage('read', file_path) as stage:
+                    with open(file_path, 'r') as f:
+                        setup_py = f.read()
+                    stage.nbytes = len(setup_py)
+            if is_trivial_setup_py(setup_py):
+                # a bare setup() leaves everything to setup.cfg, there is nothing to parse
+                self._unresolved = []
+                return {}
+            with self._stage('parse', file_path):
                 setup_py_ast = ast.parse(setup_py, mode='exec')
-                assignments = [node for node in setup_py_ast.body if isinstance(node, ast.Assign)]
-                self._assignments_dict = {assignment.targets[0].id: self._pluck_value(assignment.value) for assignment in assignments}  # type: ignore[attr-defined]
-                functions = [node for node in setup_py_ast.body if
-                             isinstance(node, ast.Expr) and isinstance(node.value, ast.Call)]
-                setup_function = [node for node in functions if node.value.func.id == 'setup'][0]   # type: ignore[attr-defined]
-                setup_function_kwargs = {arg.arg: self._pluck_value(arg.value) for arg in setup_function.value.keywords}    # type: ignore[attr-defined]
-                print('ok')
+            with self._stage('evaluate', file_path):
+                visitor = SetupVisitor()
+                visitor.visit(setup_py_ast)
+                if visitor.setup_call is None:
+                    raise ValueError("No setup() call found in {}".format(file_path))
+                self._evaluator = Evaluator(visitor.setup_symbols)
+                self._setup_seq = visitor.setup_seq
+                self._unresolved = []
+                setup_function_kwargs: Dict[str, Any] = {}
+                for keyword in visitor.setup_call.keywords:
+                    if keyword.arg is not None:
+                        setup_function_kwargs[keyword.arg] = self._pluck_value(keyword.value, keyword.arg)
+                        continue
+                    # setup(**kwargs)
+                    kwargs = self._pluck_value(keyword.value, '**')
+                    if isinstance(kwargs, dict):
+                        setup_function_kwargs.update(kwargs)
         except Exception as e:
             logger.error("Failed to parse setup.py: {}".format(e))
             raise e
 
         return setup_function_kwargs
 
-    def _pluck_value(self, node: Optional[Union[ast.expr, ast.Constant]]) -> Any:
-        """Pluck value from ast."""
-        if isinstance(node, ast.Str):
-            return node.s
-        elif isinstance(node, ast.Num):
-            return node.n
-        elif isinstance(node, ast.Name):
-            if node.id in self._assignments_dict:
-                return self._assignments_dict[node.id]
-            else:
-                return node.id
-        elif isinstance(node, ast.Constant):
-            return node.value
-        elif isinstance(node, ast.Tuple):
-            return tuple(self._pluck_value(n) for n in node.elts)
-        elif isinstance(node, ast.List):
-            return [self._pluck_value(n) for n in node.elts]
-        elif isinstance(node, ast.Dict):
-            return {self._pluck_value(k): self._pluck_value(n) for k, n in zip(node.keys, node.values)}
-        else:
-            logger.warning("Unknown value type: {}".format(type(node)))
-            return None  # TODO: Better handling of unknown types
-            # raise ValueError("Unknown value type: {}".format(type(node)))
+    def _pluck_value(self, node: Optional['ast.expr'], keyword: Optional[str] = None) -> Any:
+        """Pluck value from ast, returning None for values that cannot be evaluated statically."""
+        from .evaluator import UNRESOLVED
+
+        assert self._evaluator is not None, "_pluck_value is only valid while parsing setup.py"
+        value = self._evaluator.evaluate(node, self._setup_seq)
+        if value is UNRESOLVED:
+            logger.warning("Unresolved value for {}: {} at line {}".format(
+                keyword or 'setup()', type(node).__name__, getattr(node, 'lineno', '?')))
+            self._unresolved.append(keyword or '')
+            return None
+        if keyword == '**' and isinstance(value, dict):
+            return {key: self._file_content(key, item, node) for key, item in value.items()}
+        return self._file_content(keyword, value, node)
+
+    def _file_content(self, keyword: Optional[str], value: Any, node: Optional['ast.expr']) -> Any:
+        """Leave a file read for anything but long_description unresolved, as only a readme is kept as a reference."""
+        from .evaluator import FileContent
+
+        if isinstance(value, FileContent) and keyword != 'long_description':
+            logger.warning("Unresolved value for {}: read from {} at line {}".format(
+                keyword or 'setup()', ', '.join(value.paths), getattr(node, 'lineno', '?')))
+            self._unresolved.append(keyword or '')
+            return None
+        return value
 
     @staticmethod
-    def _build_toml(setup_py: Dict[str, Any], setup_cfg: Optional[MutableMapping[str, Any]], manifest_in: Optional[List[str]]) -> Dict[str, Any]:
-        """Build pyproject.toml."""
-        pyproject: Dict[str, Any] = OrderedDict()
-        pyproject['build-system'] = OrderedDict()
-        pyproject['build-system']['build-backend'] = 'setuptools.build_meta'
-        pyproject['build-system']['requires'] = ['setuptools', 'wheel']
-        pyproject['build-system']['requires'].extend(setup_py.get('setup_requires', []))
-
-        # populate 'project' key with setup.py metadata
-        pyproject['project'] = OrderedDict()
-        for key, value in setup_py.items():
-            if key in PROJECT_METADATA_:
-                if value is not None:
-                    pyproject['project'][key] = value
-                else:
-                    pyproject['project'][key] = ""
-
-        # populate requirements key with setup.py metadata
-        pyproject['dependencies'] = setup_py.get('install_requires', [])
-        for elmt in setup_py.get('extras_require', {}).values():
-            pyproject['dependencies'].append(elmt)
-
-        # add python_requires if it's not already in dependencies
-        if 'python_requires' in setup_py:
-            if setup_py['python_requires'] not in pyproject['dependencies']:
-                pyproject['dependencies'].append('python' + setup_py['python_requires'])
-
-        # format dependencies
-        deps = OrderedDict()
-        for i, dep in enumerate(pyproject['dependencies']):
-            # split dep on arithmetic comparison operators
-            split_dep = re.split(r'([<>=!~]+|\s)', dep)
-            deps[split_dep[0]] = ''.join(split_dep[1:])
-        pyproject['dependencies'] = deps
-
-        # add project entry-points
-        pyproject['script'] = OrderedDict()
-        for elmt in setup_py['entry_points']['console_scripts']:
-            script_name = elmt[:elmt.index('=')]
-            pyproject['script'][script_name] = elmt[elmt.index('=') + 1:]
+    def _execute_setup_py(file_path: Path, setup_py: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill the values static parsing could not resolve by executing setup.py in a sandbox."""
+        from .sandbox import SandboxError, get_pool
 
-        if setup_cfg:
-            # update pyproject with metadata from setup.cfg
-            for key, value in setup_cfg.items():
-                if key in PROJECT_METADATA_:
-                    pyproject['project'][key] = value
-
-        if manifest_in:
-            # update pyproject metadata with metadata from MANIFEST.in
-            pyproject['project']['packages'] = []  # TODO: Implement packages detection
-            pyproject['project']['include'] = [line[8:] for line in manifest_in if line.startswith('include ')]
-            pyproject['project']['exclude'] = [line[8:] for line in manifest_in if line.startswith('exclude ')]
+        try:
+            executed = get_pool().run(file_path)
+        except SandboxError as e:
+            logger.warning(str(e))
+            return setup_py
 
-        return pyproject
+        setup_py = dict(setup_py)
+        for key, value in executed.items():
+            if setup_py.get(key) is None:
+                setup_py[key] = value
+        return setup_py
 
     @staticmethod
-    def _save_toml(pyproject: Dict[str, Any], file_path: Path) -> None:
-        """Save pyproject.toml."""
-        try:
-            with open(file_path, 'w') as f:
-                toml.dump(pyproject, f)
-        except Exception as e:
-            logger.error("Failed to save pyproject.toml: {}".format(e))
-            raise e
-        return
-
-    def migrate(self) -> None:
-        """Migrate setuptools project to pyproject.toml"""
-        if self.package_path:
-            package_dir = self.package_path
-        else:
-            package_dir = self._get_current_working_directory()
+    def _check_file_references(source: 'Source', setup_py: Dict[str, Any]) -> Dict[str, Any]:
+        """Drop the long_description read from files that do not exist, checking them with a stat only."""
+        from .evaluator import FileContent
+
+        long_description = setup_py.get('long_description')
+        if isinstance(long_description, FileContent):
+            missing = [path for path in long_description.paths if not source.is_file(path)]
+            if missing:
+                logger.warning("long_description is read from missing files: {}".format(', '.join(missing)))
+                setup_py = dict(setup_py, long_description=None)
+        return setup_py
 
-        if not self._has_setup_py(package_dir):
-            logger.error("No setup.py found in {}".format(package_dir))
-            raise FileNotFoundError
+    @staticmethod
+    def _find_packages(source: 'Source', setup_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace a find_packages() call by the packages it finds in the project."""
+        from .packages import FindPackages
 
-        if self._has_pyproject(package_dir):
-            logger.warning("pyproject.toml already exists in {}".format(package_dir))
-            # make a backup of pyproject.toml with pathlib
-            pyproject_backup = Path(package_dir) / 'pyproject.toml.bak'
-            if pyproject_backup.exists():
-                pyproject_backup.unlink()
-            old_pyproject = Path(package_dir) / 'pyproject.toml'
-            old_pyproject.rename(pyproject_backup)
+        finder = setup_kwargs.get('packages')
+        if not isinstance(finder, FindPackages):
+            return setup_kwargs
+        return dict(setup_kwargs, packages=source.find_packages(finder))
 
-            # return    # TODO: Prompt user if he wants the file to be over-written
+    @staticmethod
+    def _render_toml(pyproject: Dict[str, Any]) -> str:
+        """Render pyproject.toml and validate that it reads back to the same mapping."""
+        import toml
 
-        # parse setup.py
-        setup_py = self._parse_setup_py(package_dir / "setup.py")
+        rendered: str = toml.dumps(pyproject)
+        try:
+            if toml.loads(rendered) != _as_toml_types(pyproject):
+                raise RuntimeError("pyproject.toml does not round-trip")
+        except Exception as e:
+            logger.error("Failed to parse generated pyproject.toml: {}".format(e))
+            raise e
+        return rendered
 
-        # parse setup.cfg
-        if self._has_setup_cfg(package_dir):
-            setup_cfg = self._parse_config_file(package_dir / "setup.cfg")
-        else:
-            setup_cfg = None
+    @staticmethod
+    def _merge_toml(existing: str, pyproject: Dict[str, Any]) -> Optional[str]:
+        """Merge pyproject into the existing pyproject.toml, return None if it cannot be merged."""
+        from .merge import MergeError, merge_pyproject
 
-        # parse MANIFEST.in
-        if self._has_manifest_in_(package_dir):
-            manifest_in = self._parse_config_file(package_dir / "MANIFEST.in")
-        else:
-            manifest_in = None
+        try:
+            return merge_pyproject(existing, pyproject)
+        except MergeError as e:
+            logger.warning("Cannot merge into the existing pyproject.toml, replacing it: {}".format(e))
+            return None
 
-        # build pyproject dict
-        pyproject = self._build_toml(setup_py, setup_cfg, manifest_in)  # type: ignore[arg-type]
+    @staticmethod
+    def _save_toml(pyproject: Union[Dict[str, Any], str], file_path: Path, backup: bool = True) -> bool:
+        """Save pyproject.toml atomically, return False if the file already had this content.
 
-        # save pyproject.toml
-        self._save_toml(pyproject, package_dir / "pyproject.toml")
+        The new content goes to a temporary file that replaces file_path, so an interrupted
+        write never leaves a truncated pyproject.toml. Unless backup is False, an existing file
+        with different content is copied to pyproject.toml.bak first, so that file_path exists
+        at every point.
+        """
+        import shutil
 
-        # validate pyproject.toml
+        rendered = pyproject if isinstance(pyproject, str) else PyProject._render_toml(pyproject)
+        data = rendered.encode('utf-8')
         try:
-            generated_pyproject = toml.load(package_dir / "pyproject.toml")
-            if not generated_pyproject == dict(pyproject):
-                raise RuntimeError
+            with open(file_path, 'rb') as f:
+                exists = True
+                if f.read() == data:
+                    return False
+        except FileNotFoundError:
+            exists = False
+
+        tmp_path = file_path.with_name('.{}.{}.tmp'.format(file_path.name, os.getpid()))
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if exists and backup:
+                backup_path = file_path.with_name(file_path.name + '.bak')
+                logger.info("Overwriting {}, previous version saved as {}".format(file_path, backup_path.name))
+                shutil.copy2(str(file_path), str(backup_path))
+            os.replace(str(tmp_path), str(file_path))
         except Exception as e:
-            logger.error("Failed to parse generated pyproject.toml: {}".format(e))
+            logger.error("Failed to save pyproject.toml: {}".format(e))
+            if tmp_path.exists():
+                tmp_path.unlink()
             raise e
+        return True
+
+    def _convert(self, source: 'Source') -> Dict[str, Any]:
+        """Run the migration pipeline on the files of source, return the pyproject mapping."""
+        return self._emit(self._collect(source), self.backend, str(source))
+
+    def _emit(self, metadata: 'ProjectMetadata', backend: Optional[str], label: str) -> Dict[str, Any]:
+        from .emitters import DEFAULT_BACKEND_, emit
+
+        with self._stage('emit', label):
+            return emit(metadata, backend or DEFAULT_BACKEND_)
+
+    def _collect(self, source: 'Source') -> 'ProjectMetadata':
+        """Read, parse and normalize the inputs of source into the metadata of the project."""
+        from .metadata import ProjectMetadata
+
+        setup_py, setup_cfg, manifest_in = self._setup_arguments(source)
+        with self._stage('build', Path(str(source))):
+            return ProjectMetadata.from_setup(setup_py, setup_cfg, manifest_in)
+
+    def _setup_arguments(self, source: 'Source') -> Tuple[Dict[str, Any], Optional[Dict[str, Any]],
+                                                          Optional['Manifest']]:
+        """Return the setup() arguments of setup.py and setup.cfg of source, and its resolved MANIFEST.in."""
+        label = Path(str(source))
+        has_setup_py = source.has('setup.py')
+        has_setup_cfg = source.has('setup.cfg')
+        if not (has_setup_py or has_setup_cfg):
+            logger.error("No setup.py or setup.cfg found in {}".format(label))
+            raise FileNotFoundError
+
+        # parse setup.py, unless the project is purely declarative
+        setup_py: Dict[str, Any] = {}
+        if has_setup_py:
+            with self._stage('read', label / "setup.py") as stage:
+                content = source.read_text('setup.py')
+                stage.nbytes = len(content)
+            setup_py = self._parse_setup_py(label / "setup.py", content)
+            if self._unresolved and self.execute_fallback:
+                if source.root is not None:
+                    setup_py = self._execute_setup_py(source.root / "setup.py", setup_py)
+                else:
+                    logger.warning("setup.py cannot be executed from {}".format(label))
+
+        # read the declarative metadata of setup.cfg
+        setup_cfg = None
+        if has_setup_cfg:
+            from .setup_cfg import has_declarative_metadata, read_setup_cfg
+
+            with self._stage('read_config', label / "setup.cfg"):
+                config = self._parse_config_string(source.read_text('setup.cfg'), '.cfg')
+                if has_declarative_metadata(config):  # type: ignore[arg-type]
+                    setup_cfg = read_setup_cfg(config, source.root)  # type: ignore[arg-type]
+        if not (setup_py or setup_cfg):
+            logger.error("No setup() arguments nor [metadata] in setup.cfg found in {}".format(label))
+            raise FileNotFoundError
+        setup_py = self._check_file_references(source, setup_py)
+        if setup_cfg:
+            setup_cfg = self._check_file_references(source, setup_cfg)
+        with self._stage('find_packages', label):
+            setup_py = self._find_packages(source, setup_py)
+            if setup_cfg:
+                setup_cfg = self._find_packages(source, setup_cfg)
+
+        # parse MANIFEST.in and apply it to the files of the project
+        manifest_in = None
+        if source.has('MANIFEST.in'):
+            from .manifest import parse_manifest, resolve_manifest
+
+            with self._stage('read_config', label / "MANIFEST.in"):
+                rules = parse_manifest(self._parse_config_string(source.read_text('MANIFEST.in'), '.in'))  # type: ignore[arg-type]
+            with self._stage('manifest', label):
+                manifest_in = resolve_manifest(rules, source.files())
+        return setup_py, setup_cfg, manifest_in
+
+    def _get_source(self) -> 'Source':
+        if self._source is None:
+            from .sources import DirectorySource
+
+            package_dir = self.package_path or self._get_current_working_directory()
+            self._source = DirectorySource(package_dir, self._listing if self.package_path else None)
+        return self._source
+
+    def to_metadata(self) -> 'ProjectMetadata':
+        """Return the metadata of the project, from which every output format is built."""
+        return self._collect(self._get_source())
+
+    def to_dict(self, backend: Optional[str] = None) -> Dict[str, Any]:
+        """Return the pyproject.toml mapping of the project for backend, without writing anything."""
+        return self._emit(self.to_metadata(), backend or self.backend, str(self._get_source()))
+
+    def to_toml(self, backend: Optional[str] = None) -> str:
+        """Return the pyproject.toml of the project for backend as a string, without writing anything."""
+        from .emitters import DEFAULT_BACKEND_
+
+        backend = backend or self.backend or DEFAULT_BACKEND_
+        return self.render([backend])[backend]
+
+    def render(self, backends: Iterable[str], metadata: Optional['ProjectMetadata'] = None) -> Dict[str, str]:
+        """Return the pyproject.toml of the project for each backend, parsing the project once.
+
+        metadata, when given, is used instead of reading the project.
+        """
+        if metadata is None:
+            metadata = self.to_metadata()
+        label = str(self._source) if self._source is not None else str(self.package_path or '<metadata>')
+        rendered = {}
+        for backend in backends:
+            pyproject = self._emit(metadata, backend, label)
+            with self._stage('render', label) as stage:
+                rendered[backend] = self._render_toml(pyproject)
+                stage.nbytes = len(rendered[backend])
+        return rendered
+
+    def verify(self, backend: Optional[str] = None) -> List['FieldDiff']:
+        """Return the core metadata fields of the pyproject.toml for backend that differ from setup.py.
+
+        Both sides are computed in memory from one parse of the project, nothing is built.
+        backend must write a PEP 621 [project] table.
+        """
+        from .metadata import ProjectMetadata, merge_setup_arguments
+        from .verify import compare, core_metadata, project_core_metadata
+
+        source = self._get_source()
+        setup_py, setup_cfg, manifest_in = self._setup_arguments(source)
+        with self._stage('build', Path(str(source))):
+            metadata = ProjectMetadata.from_setup(setup_py, setup_cfg, manifest_in)
+        pyproject = self._emit(metadata, backend or self.backend, str(source))
+        return compare(core_metadata(merge_setup_arguments(setup_py, setup_cfg)), project_core_metadata(pyproject))
+
+    def migrate(self) -> None:
+        """Migrate setuptools project to pyproject.toml"""
+        from .sources import DirectorySource
+
+        source = self._get_source()
+        if not isinstance(source, DirectorySource):
+            raise ValueError("Only a project directory can be migrated in place, use to_toml() instead")
+        package_dir = source.path
+
+        pyproject = self._convert(source)
+
+        # validate in memory and save pyproject.toml, unless it is unchanged
+        existing = None
+        if self.merge and source.has('pyproject.toml'):
+            existing = source.read_text('pyproject.toml')
+        merged = None
+        with self._stage('render', package_dir) as stage:
+            rendered = self._render_toml(pyproject)
+            if existing is not None:
+                merged = self._merge_toml(existing, pyproject)
+            stage.nbytes = len(merged or rendered)
+        with self._stage('write', package_dir / "pyproject.toml") as stage:
+            if merged is not None:
+                # a merged file keeps everything else, no backup is needed, nor any write when unchanged
+                if merged != existing and self._save_toml(merged, package_dir / "pyproject.toml", backup=False):
+                    stage.nbytes = len(merged)
+            elif self._save_toml(rendered, package_dir / "pyproject.toml"):
+                stage.nbytes = len(rendered)
 
         return
+
+    def convert_archive(self, archive: Union[str, Path]) -> str:
+        """Return the pyproject.toml of an sdist archive, reading it in memory without extracting it."""
+        from .sources import ArchiveSource
+
+        archive = Path(archive)
+        with self._stage('read', archive) as stage:
+            source = ArchiveSource(archive)
+            stage.nbytes = archive.stat().st_size
+        pyproject = self._convert(source)
+        with self._stage('render', archive) as stage:
+            rendered = self._render_toml(pyproject)
+            stage.nbytes = len(rendered)
+        return rendered
@@ -0,0 +1,166 @@
+"""Memoized parser of PEP 508 requirement strings, and comparison of version specifiers."""
+
+import re
+from functools import lru_cache
+
+# Typing related imports
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+_REQUIREMENT_RE = re.compile(r'''
+    ^\s*(?P<name>[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)\s*
+    (?:\[(?P<extras>[^\]]*)\])?\s*
+    (?:@\s*(?P<url>[^\s;]+)\s*|\(?(?P<specifier>[^;()]*)\)?\s*)
+    (?:;\s*(?P<marker>.*?))?\s*$
+''', re.VERBOSE)
+_CLAUSE_RE = re.compile(r'^\s*(~=|===|==|!=|<=|>=|<|>)\s*([^\s,;]+)\s*$')
+_EXTRA_RE = re.compile(r'^[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?$')
+_RELEASE_RE = re.compile(r'^v?(\d+(?:\.\d+)*)')
+_NAME_SEPARATORS_RE = re.compile(r'[-_.]+')
+
+# a bound of a version interval: the release numbers and whether the bound itself is included
+Bound = Tuple[Tuple[int, ...], bool]
+
+
+class InvalidRequirement(ValueError):
+    """Raised for strings that are not PEP 508 requirements."""
+
+
+class Requirement(NamedTuple):
+    """A parsed requirement, with the specifier normalized to comma separated clauses without spaces."""
+
+    name: str
+    extras: Tuple[str, ...] = ()
+    specifier: str = ''
+    url: Optional[str] = None
+    marker: Optional[str] = None
+
+    def __str__(self) -> str:
+        text = self.name
+        if self.extras:
+            text += '[{}]'.format(','.join(self.extras))
+        if self.url:
+            text += ' @ {}'.format(self.url)
+            if self.marker:
+                text += ' '
+        else:
+            text += self.specifier
+        if self.marker:
+            text += '; {}'.format(self.marker)
+        return text
+
+
+@lru_cache(maxsize=8192)
+def parse_requirement(requirement: str) -> Requirement:
+    """Parse a PEP 508 requirement string.
+
+    Results are memoized, as the same requirement strings repeat across the projects of a
+    monorepo, and Requirement being an immutable tuple, they can be shared safely.
+    """
+    match = _REQUIREMENT_RE.match(requirement)
+    if match is None:
+        raise InvalidRequirement("Invalid requirement: {!r}".format(requirement))
+
+    extras: Tuple[str, ...] = ()
+    if match.group('extras'):
+        extras = tuple(extra.strip() for extra in match.group('extras').split(',') if extra.strip())
+        if not all(_EXTRA_RE.match(extra) for extra in extras):
+            raise InvalidRequirement("Invalid extras in requirement: {!r}".format(requirement))
+
+    clauses = []
+    specifier = (match.group('specifier') or '').strip()
+    if specifier:
+        for clause in specifier.split(','):
+            clause_match = _CLAUSE_RE.match(clause)
+            if clause_match is None:
+                raise InvalidRequirement("Invalid version specifier in requirement: {!r}".format(requirement))
+            clauses.append(''.join(clause_match.groups()))
+
+    marker = match.group('marker') or None
+    return Requirement(match.group('name'), extras, ','.join(clauses), match.group('url'), marker)
+
+
+def dependency_value(requirement: Requirement) -> Union[str, Dict[str, Any]]:
+    """Return the value of a requirement in a dependencies table.
+
+    It is the bare specifier when there is nothing else to say, and an inline table with the
+    version, extras, url and markers keys otherwise.
+    """
+    if not (requirement.extras or requirement.url or requirement.marker):
+        return requirement.specifier or '*'
+    value: Dict[str, Any] = {}
+    if requirement.url:
+        value['url'] = requirement.url
+    else:
+        value['version'] = requirement.specifier or '*'
+    if requirement.extras:
+        value['extras'] = list(requirement.extras)
+    if requirement.marker:
+        value['markers'] = requirement.marker
+    return value
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a project name as PEP 503 does, so that Foo_Bar and foo-bar compare equal."""
+    return _NAME_SEPARATORS_RE.sub('-', name).lower()
+
+
+def _release(version: str) -> Optional[Tuple[int, ...]]:
+    match = _RELEASE_RE.match(version)
+    if match is None:
+        return None
+    release = [int(part) for part in match.group(1).split('.')]
+    while len(release) > 1 and release[-1] == 0:
+        release.pop()
+    return tuple(release)
+
+
+def _next_release(release: Tuple[int, ...]) -> Tuple[int, ...]:
+    return release[:-1] + (release[-1] + 1,)
+
+
+def _clause_interval(operator: str, version: str) -> Tuple[Optional[Bound], Optional[Bound]]:
+    """Return the lower and upper bounds of the versions a clause allows, None for no bound."""
+    wildcard = version.endswith('.*')
+    release = _release(version[:-2] if wildcard else version)
+    if release is None or operator == '!=':
+        return None, None
+    if operator in ('==', '===') and wildcard:
+        return (release, True), (_next_release(release), False)
+    if operator in ('==', '==='):
+        return (release, True), (release, True)
+    if operator == '~=':
+        if len(version.split('.')) < 2:
+            return (release, True), None
+        return (release, True), (_next_release(tuple(int(part) for part in version.split('.')[:-1])), False)
+    return {
+        '>=': ((release, True), None), '>': ((release, False), None),
+        '<=': (None, (release, True)), '<': (None, (release, False)),
+    }[operator]
+
+
+@lru_cache(maxsize=8192)
+def specifiers_overlap(*specifiers: str) -> bool:
+    """Check if some version satisfies every one of the normalized specifiers.
+
+    Results are memoized, as the same specifiers repeat across projects. Versions are
+    compared on their release numbers: != clauses and pre-, post- and development releases
+    are ignored, which may report an overlap that does not exist, never miss one.
+    """
+    lower: Optional[Bound] = None
+    upper: Optional[Bound] = None
+    for specifier in specifiers:
+        clauses: List[str] = [clause for clause in specifier.split(',') if clause]
+        for clause in clauses:
+            match = _CLAUSE_RE.match(clause)
+            if match is None:
+                continue
+            clause_lower, clause_upper = _clause_interval(*match.groups())
+            if clause_lower is not None and (lower is None or clause_lower[0] > lower[0]
+                                             or (clause_lower[0] == lower[0] and not clause_lower[1])):
+                lower = clause_lower
+            if clause_upper is not None and (upper is None or clause_upper[0] < upper[0]
+                                             or (clause_upper[0] == upper[0] and not clause_upper[1])):
+                upper = clause_upper
+    if lower is None or upper is None:
+        return True
+    return lower[0] < upper[0] or (lower[0] == upper[0] and lower[1] and upper[1])
@@ -0,0 +1,142 @@
+"""Sandboxed execution of dynamic setup.py files in a pool of warm interpreters."""
+
+import atexit
+import json
+import os
+import queue
+import selectors
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Typing related imports
+from typing import Any, Dict, List, Optional, Union
+
+from .utils import logger
+
+WORKER_SCRIPT_ = Path(__file__).with_name('_sandbox_worker.py')
+DEFAULT_TIMEOUT_ = 10.0
+DEFAULT_MEMORY_LIMIT_ = 1024 * 1024 * 1024
+
+
+class SandboxError(RuntimeError):
+    """Raised when a setup.py cannot be executed in the sandbox."""
+
+
+class _Worker:
+    """A pre-started interpreter running the sandbox worker script."""
+
+    def __init__(self) -> None:
+        self.process = subprocess.Popen([sys.executable, str(WORKER_SCRIPT_)], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self._buffer = b''
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def request(self, payload: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+        assert self.process.stdin is not None and self.process.stdout is not None
+        self.process.stdin.write((json.dumps(payload) + '\n').encode())
+        self.process.stdin.flush()
+
+        fd = self.process.stdout.fileno()
+        with selectors.DefaultSelector() as selector:
+            selector.register(fd, selectors.EVENT_READ)
+            while b'\n' not in self._buffer:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not selector.select(remaining):
+                    raise SandboxError("Sandbox worker did not answer in time")
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    raise SandboxError("Sandbox worker exited unexpectedly")
+                self._buffer += chunk
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return json.loads(line.decode())  # type: ignore[no-any-return]
+
+    def close(self) -> None:
+        if self.alive():
+            self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            if stream is not None:
+                stream.close()
+
+
+class SandboxPool:
+    """Pool of interpreters with setuptools already imported, executing setup.py files on demand.
+
+    Each setup.py runs in its own process, forked from a warm worker on POSIX systems, with
+    setuptools.setup and distutils.core.setup replaced by a stub recording their keyword
+    arguments. Execution is bounded by timeout seconds and memory_limit bytes of address space.
+    """
+
+    def __init__(self, size: int = 1, timeout: float = DEFAULT_TIMEOUT_,
+                 memory_limit: Optional[int] = DEFAULT_MEMORY_LIMIT_) -> None:
+        self.size = size
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self._idle: 'queue.Queue[_Worker]' = queue.Queue()
+        self._workers: List[_Worker] = []
+        return
+
+    def __enter__(self) -> 'SandboxPool':
+        self.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """Start the workers so that they are warm when the first setup.py comes in."""
+        while len(self._workers) < self.size:
+            worker = _Worker()
+            self._workers.append(worker)
+            self._idle.put(worker)
+
+    def _replace(self, worker: _Worker, reason: str) -> None:
+        logger.debug("Replacing sandbox worker {}: {}".format(worker.process.pid, reason))
+        worker.close()
+        self._workers.remove(worker)
+        self.start()
+
+    def run(self, setup_py: Union[str, Path]) -> Dict[str, Any]:
+        """Execute setup_py and return the JSON serializable keyword arguments it passes to setup()."""
+        self.start()
+        worker = self._idle.get()
+        payload = {'path': os.path.abspath(str(setup_py)), 'timeout': self.timeout,
+                   'memory_limit': self.memory_limit}
+        try:
+            # the worker enforces the timeout itself, the margin covers a worker that hangs
+            result = worker.request(payload, time.monotonic() + self.timeout + 5)
+        except (SandboxError, OSError, ValueError) as e:
+            self._replace(worker, str(e))
+            raise SandboxError("Failed to execute {}: {}".format(setup_py, e))
+
+        if result.get('recycle') or not worker.alive():
+            self._replace(worker, 'recycled' if result.get('recycle') else 'exited')
+        else:
+            self._idle.put(worker)
+        if 'error' in result:
+            raise SandboxError("Failed to execute {}: {}".format(setup_py, result['error']))
+        return result['kwargs']  # type: ignore[no-any-return]
+
+    def close(self) -> None:
+        """Stop every worker."""
+        for worker in self._workers:
+            worker.close()
+        self._workers = []
+        self._idle = queue.Queue()
+
+
+_pool: Optional[SandboxPool] = None
+
+
+def get_pool() -> SandboxPool:
+    """Return the pool shared by the current process, starting it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = SandboxPool()
+        _pool.start()
+        atexit.register(_pool.close)
+    return _pool
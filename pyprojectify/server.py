@@ -0,0 +1,113 @@
+"""JSON-RPC 2.0 server converting in-memory projects, one request per line on stdin.
+
+A request converts the content of the input files of a project, which is never written
+to disk::
+
+    {"jsonrpc": "2.0", "id": 1, "method": "convert",
+     "params": {"setup_py": "...", "setup_cfg": "...", "manifest_in": "...", "files": ["..."], "format": "toml",
+                "backend": "setuptools"}}
+    {"jsonrpc": "2.0", "id": 1, "result": {"pyproject": "...", "warnings": []}}
+
+format is "toml" (the default) for the text of pyproject.toml or "json" for its mapping,
+backend is the build backend to emit it for, setuptools by default.
+The "version" method returns the version of pyprojectify and "shutdown" stops the server,
+as does the end of stdin.
+"""
+
+import json
+import sys
+
+# Typing related imports
+from typing import IO, Any, Dict, Optional, Tuple
+
+from . import __version__
+
+PARSE_ERROR_ = -32700
+INVALID_REQUEST_ = -32600
+METHOD_NOT_FOUND_ = -32601
+INVALID_PARAMS_ = -32602
+CONVERSION_ERROR_ = -32000
+
+CONVERT_PARAMS_ = ('setup_py', 'setup_cfg', 'manifest_in', 'files', 'format', 'backend')
+
+
+def _warm_up() -> None:
+    """Import what conversions use up front, so that the first request is as fast as the next ones."""
+    import ast  # noqa: F401
+    import configparser  # noqa: F401
+    import toml  # noqa: F401
+    from . import evaluator, manifest, requirements, setup_cfg, setup_parser, sources  # noqa: F401
+
+
+def _error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+
+def convert(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a project given by the content of its files, returning its pyproject and the warnings."""
+    from .batch import _WarningCollector
+    from .pyprojectify import PyProject
+    from .utils import logger
+
+    output_format = params.get('format', 'toml')
+    project = PyProject.from_sources(params.get('setup_py'), params.get('setup_cfg'), params.get('manifest_in'),
+                                     params.get('files'))
+    collector = _WarningCollector()
+    logger.addHandler(collector)
+    try:
+        pyproject: Any = (project.to_toml(params.get('backend')) if output_format == 'toml'
+                          else project.to_dict(params.get('backend')))
+    finally:
+        logger.removeHandler(collector)
+    return {'pyproject': pyproject, 'warnings': collector.messages}
+
+
+def handle(line: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """Answer one request line, and tell whether the server should stop.
+
+    Notifications, requests without an id, get no answer.
+    """
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        return _error(None, PARSE_ERROR_, str(e)), False
+    if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+        return _error(None, INVALID_REQUEST_, 'Invalid request'), False
+
+    request_id = request.get('id')
+    method = request['method']
+    params = request.get('params') or {}
+    if method == 'convert':
+        if not isinstance(params, dict) or set(params) - set(CONVERT_PARAMS_) \
+                or params.get('format', 'toml') not in ('toml', 'json'):
+            response = _error(request_id, INVALID_PARAMS_,
+                              'Expected parameters among {}'.format(', '.join(CONVERT_PARAMS_)))
+        else:
+            try:
+                response = {'jsonrpc': '2.0', 'id': request_id, 'result': convert(params)}
+            except Exception as e:
+                response = _error(request_id, CONVERSION_ERROR_, repr(e))
+    elif method == 'version':
+        response = {'jsonrpc': '2.0', 'id': request_id, 'result': __version__}
+    elif method == 'shutdown':
+        response = {'jsonrpc': '2.0', 'id': request_id, 'result': None}
+    else:
+        response = _error(request_id, METHOD_NOT_FOUND_, 'Method not found: {}'.format(method))
+    return (response if 'id' in request else None), method == 'shutdown'
+
+
+def serve(stdin: IO[str] = sys.stdin, stdout: IO[str] = sys.stdout) -> int:
+    """Answer requests until shutdown or the end of stdin, return the number of requests handled."""
+    _warm_up()
+    handled = 0
+    for line in stdin:
+        if not line.strip():
+            continue
+        handled += 1
+        response, stop = handle(line)
+        if response is not None:
+            stdout.write(json.dumps(response) + '\n')
+            stdout.flush()
+        if stop:
+            break
+    return handled
@@ -0,0 +1,261 @@
+"""Declarative setup.cfg reading, with cached resolution of attr: and file: directives."""
+
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+
+# Typing related imports
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from .evaluator import FileContent
+from .packages import FindPackages
+from .utils import logger
+
+if TYPE_CHECKING:
+    from configparser import ConfigParser
+
+METADATA_ALIASES_: Dict[str, str] = {'home_page': 'url', 'summary': 'description', 'classifier': 'classifiers',
+                                     'platform': 'platforms'}
+LIST_KEYS_: Tuple[str, ...] = ('classifiers', 'keywords', 'platforms', 'license_files', 'py_modules', 'packages',
+                               'provides', 'requires', 'obsoletes')
+REQUIREMENT_KEYS_: Tuple[str, ...] = ('install_requires', 'setup_requires', 'tests_require')
+FILE_KEYS_: Tuple[str, ...] = ('long_description', 'classifiers', 'license')
+ATTR_KEYS_: Tuple[str, ...] = ('version',)
+BOOL_KEYS_: Tuple[str, ...] = ('zip_safe', 'include_package_data')
+
+# lines of a setup.py that does nothing but call setup() and leaves everything to setup.cfg
+_TRIVIAL_SETUP_PY_RE = re.compile(r'''
+    ^(?:
+        \#.*
+        | import\ setuptools
+        | from\ setuptools\ import\ setup
+        | if\ __name__\ *==\ *['"]__main__['"]\ *:
+        | (?:setuptools\.)?setup\(\s*\)
+    )$
+''', re.VERBOSE)
+
+
+class DirectiveError(ValueError):
+    """Raised when an attr: or file: directive cannot be resolved statically."""
+
+
+def _signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+@lru_cache(maxsize=1024)
+def _read_file(path: str, signature: Tuple[int, int]) -> str:
+    """Read a file referenced by file:, memoized on its path and (size, mtime)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+@lru_cache(maxsize=1024)
+def _module_value(path: str, signature: Tuple[int, int], name: str) -> Any:
+    """Statically evaluate name at the end of a module, memoized on its path and (size, mtime)."""
+    import ast
+    from .evaluator import UNRESOLVED, Evaluator
+    from .setup_parser import SetupVisitor
+
+    visitor = SetupVisitor()
+    visitor.visit(ast.parse(_read_file(path, signature), filename=path))
+    value = Evaluator(visitor.symbols).resolve(name, visitor.symbols.seq + 1)
+    if value is UNRESOLVED:
+        raise DirectiveError("Cannot resolve {} in {} statically".format(name, path))
+    return value
+
+
+def resolve_file(spec: str, root: Optional[Path]) -> str:
+    """Return the content of the comma separated files of a file: directive, joined by newlines."""
+    if root is None:
+        raise DirectiveError("No project directory to read file: {} from".format(spec.strip()))
+    contents = []
+    for name in spec.split(','):
+        path = os.path.join(str(root), name.strip())
+        signature = _signature(path)
+        if signature is None:
+            raise DirectiveError("File not found: {}".format(path))
+        contents.append(_read_file(path, signature))
+    return '\n'.join(contents)
+
+
+def _package_dirs(value: str) -> Dict[str, str]:
+    """Parse the package_dir option, "= src" or dangling "package = directory" lines."""
+    package_dirs = {}
+    for line in _split_list(value):
+        package, _, directory = line.rpartition('=')
+        package_dirs[package.strip()] = directory.strip()
+    return package_dirs
+
+
+def _attr_modules(spec: str, package_dirs: Dict[str, str]) -> Tuple[str, str]:
+    """Return the relative paths the module of an attr: directive may be read from, as a module or a package."""
+    module = spec.strip().rpartition('.')[0]
+    parts = module.split('.') if module else ['__init__']
+    base = package_dirs.get('', '')
+    for i in range(len(parts), 0, -1):
+        prefix = '.'.join(parts[:i])
+        if prefix in package_dirs:
+            base, parts = package_dirs[prefix], parts[i:]
+            break
+    module_path = os.path.join(base, *parts)
+    return module_path + '.py', os.path.join(module_path, '__init__.py')
+
+
+def _parse_dict(value: str) -> Dict[str, str]:
+    """Parse dangling "key = value" lines, splitting them on their first =, as for project_urls."""
+    parsed = {}
+    for line in _split_list(value, '\n'):
+        key, separator, item = line.partition('=')
+        if separator:
+            parsed[key.strip()] = item.strip()
+    return parsed
+
+
+def resolve_attr(spec: str, root: Optional[Path], package_dirs: Dict[str, str]) -> Any:
+    """Return the value of the module attribute of an attr: directive, without importing the module."""
+    if root is None:
+        raise DirectiveError("No project directory to read attr: {} from".format(spec.strip()))
+    name = spec.strip().rpartition('.')[2]
+    for candidate in _attr_modules(spec, package_dirs):
+        path = os.path.join(str(root), candidate)
+        signature = _signature(path)
+        if signature is not None:
+            return _module_value(path, signature, name)
+    raise DirectiveError("Module not found for attr: {}".format(spec.strip()))
+
+
+def directive_files(config: 'ConfigParser') -> List[str]:
+    """Return the relative paths of the files the attr: and file: directives of a parsed setup.cfg read.
+
+    Both the module and the package an attr: directive may be read from are listed.
+    """
+    package_dirs = _package_dirs(config.get('options', 'package_dir', raw=True, fallback=''))
+    files: List[str] = []
+    for section in ('metadata', 'options'):
+        if not config.has_section(section):
+            continue
+        for key, value in config.items(section, raw=True):
+            key = key.replace('-', '_')
+            if section == 'metadata':
+                key = METADATA_ALIASES_.get(key, key)
+            if value.startswith('file:') and key in FILE_KEYS_ + ATTR_KEYS_ and key != 'long_description':
+                files.extend(name.strip() for name in value[len('file:'):].split(','))
+            elif value.startswith('attr:') and key in ATTR_KEYS_:
+                files.extend(_attr_modules(value[len('attr:'):], package_dirs))
+    return files
+
+
+def _package_finder(config: 'ConfigParser', namespace: bool) -> FindPackages:
+    """Return the finder of packages = find: configured by [options.packages.find]."""
+    def option(name: str) -> List[str]:
+        return _split_list(config.get('options.packages.find', name, raw=True, fallback=''))
+
+    where = option('where')
+    return FindPackages(where[0] if where else '.', tuple(option('include') or ['*']), tuple(option('exclude')),
+                        namespace)
+
+
+def _split_list(value: str, separator: str = ',') -> List[str]:
+    """Split a dangling list, or a single line list using separator."""
+    if '\n' in value.strip():
+        items = value.splitlines()
+    else:
+        items = value.split(separator)
+    return [item.strip() for item in items if item.strip() and not item.strip().startswith('#')]
+
+
+def _parse_bool(value: str) -> bool:
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def is_trivial_setup_py(source: str) -> bool:
+    """Check if a setup.py only calls setup() without arguments, leaving the metadata to setup.cfg."""
+    in_docstring = False
+    setup_called = False
+    for line in source.splitlines():
+        line = line.strip()
+        if in_docstring:
+            in_docstring = not line.endswith(('"""', "'''"))
+            continue
+        if not line:
+            continue
+        if line.startswith(('"""', "'''")):
+            in_docstring = not (len(line) >= 6 and line.endswith(line[:3]))
+            continue
+        if not _TRIVIAL_SETUP_PY_RE.match(line):
+            return False
+        setup_called = setup_called or line.endswith(')')
+    return setup_called
+
+
+def has_declarative_metadata(config: 'ConfigParser') -> bool:
+    """Check if a parsed setup.cfg declares the project metadata, and not only tool settings."""
+    return config.has_section('metadata') and config.has_option('metadata', 'name')
+
+
+def read_setup_cfg(config: 'ConfigParser', root: Optional[Path]) -> Dict[str, Any]:
+    """Return the declarative metadata and options of a parsed setup.cfg as setup() keyword arguments.
+
+    Values are converted the way setuptools does: lists may be dangling or comma separated
+    (semicolon separated for requirements), and attr: and file: directives are resolved
+    relative to root, if any, except for long_description, which becomes a FileContent reference.
+    Directives that cannot be resolved are reported and left out.
+    """
+    setup_kwargs: Dict[str, Any] = {}
+    package_dirs = _package_dirs(config.get('options', 'package_dir', raw=True, fallback=''))
+
+    for section in ('metadata', 'options'):
+        if not config.has_section(section):
+            continue
+        for key, raw_value in config.items(section, raw=True):
+            key = key.replace('-', '_')
+            value: Any = raw_value
+            if section == 'metadata':
+                key = METADATA_ALIASES_.get(key, key)
+            try:
+                if value.startswith('file:') and key == 'long_description':
+                    # referenced, not read, see PyProject._check_file_references
+                    value = FileContent(tuple(name.strip() for name in value[len('file:'):].split(',')))
+                elif value.startswith('file:') and key in FILE_KEYS_ + ATTR_KEYS_:
+                    value = resolve_file(value[len('file:'):], root)
+                    if key in ATTR_KEYS_:
+                        value = value.strip()
+                elif value.startswith('attr:') and key in ATTR_KEYS_:
+                    value = resolve_attr(value[len('attr:'):], root, package_dirs)
+            except (DirectiveError, OSError, SyntaxError) as e:
+                logger.warning("Unresolved value for {}: {}".format(key, e))
+                continue
+            if key == 'packages' and value.strip() in ('find:', 'find_namespace:'):
+                value = _package_finder(config, value.strip() == 'find_namespace:')
+            if isinstance(value, str):
+                if key in LIST_KEYS_:
+                    value = _split_list(value)
+                elif key == 'package_dir':
+                    value = dict(package_dirs)
+                elif key == 'project_urls':
+                    value = _parse_dict(value)
+                elif key in REQUIREMENT_KEYS_:
+                    value = _split_list(value, ';')
+                elif key in BOOL_KEYS_:
+                    value = _parse_bool(value)
+            setup_kwargs[key] = value
+
+    if config.has_section('options.extras_require'):
+        setup_kwargs['extras_require'] = {extra: _split_list(value, ';')
+                                          for extra, value in config.items('options.extras_require', raw=True)}
+    if config.has_section('options.package_data'):
+        # "*" is for every package, as "" is with setup()
+        setup_kwargs['package_data'] = {'' if package == '*' else package: _split_list(value)
+                                        for package, value in config.items('options.package_data', raw=True)}
+    if config.has_section('options.entry_points'):
+        setup_kwargs['entry_points'] = {
+            group: ['='.join(part.strip() for part in line.split('=', 1)) for line in _split_list(value, '\n')]
+            for group, value in config.items('options.entry_points', raw=True)
+        }
+    return setup_kwargs
@@ -0,0 +1,226 @@
+"""Single pass extraction of the setup() call from a setup.py Abstract Syntax Tree."""
+
+import ast
+
+# Typing related imports
+from typing import List, Optional, Set, Tuple, Union
+
+from .evaluator import SymbolTable, _dotted_name
+
+SETUP_MODULES_: Tuple[str, ...] = ('setuptools', 'distutils.core')
+MUTATING_METHODS_: Tuple[str, ...] = ('append', 'extend', 'update')
+
+
+class SetupVisitor(ast.NodeVisitor):
+    """Build the symbol table of a setup.py and find its setup() call in one walk of the tree.
+
+    The setup call is recognised whether it is called by name, through an alias
+    (from setuptools import setup as s) or through its module (setuptools.setup,
+    import setuptools as st; st.setup), at the top level or nested under any statement
+    such as if __name__ == "__main__". Assignments, augmented assignments, item assignments,
+    with statement targets and append/extend/update calls are recorded as versioned bindings
+    in symbols, and setup_seq is the position of the setup call in that table.
+
+    Functions, lambdas and classes bind their names in a scope of their own, so that an
+    assignment in a helper function does not change the module globals. setup_symbols is the
+    scope the setup call is made from, which falls back to the module scope.
+
+    A name bound or mutated in a block that may run or not, or run several times (if, for,
+    while, except and else clauses, match cases), is bound as unresolved, except under the
+    if __name__ == "__main__" guard, which always runs.
+    """
+
+    def __init__(self) -> None:
+        self.setup_names: Set[str] = {'setup'}
+        self.module_names: Set[str] = set(SETUP_MODULES_)
+        self.symbols = SymbolTable()
+        self.setup_symbols = self.symbols
+        self.setup_call: Optional[ast.Call] = None
+        self.setup_seq = 0
+        self._scope = self.symbols
+        self._globals: Set[str] = set()
+        self._conditional = 0
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            if alias.name in SETUP_MODULES_:
+                self.module_names.add(alias.asname or alias.name)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        if node.module in SETUP_MODULES_:
+            for alias in node.names:
+                if alias.name == 'setup':
+                    self.setup_names.add(alias.asname or alias.name)
+        elif node.module == 'distutils':
+            for alias in node.names:
+                if alias.name == 'core':
+                    self.module_names.add(alias.asname or alias.name)
+
+    def _table(self, name: str) -> SymbolTable:
+        return self.symbols if name in self._globals else self._scope
+
+    def _record(self, name: str, node: Optional[ast.expr]) -> None:
+        self._table(name).bind(name, None if self._conditional else node)
+
+    def _visit_conditional(self, statements: List[ast.stmt]) -> None:
+        self._conditional += 1
+        try:
+            for statement in statements:
+                self.visit(statement)
+        finally:
+            self._conditional -= 1
+
+    @staticmethod
+    def _is_main_guard(test: ast.expr) -> bool:
+        if not (isinstance(test, ast.Compare) and isinstance(test.left, ast.Name) and test.left.id == '__name__'
+                and len(test.ops) == 1 and isinstance(test.ops[0], ast.Eq)):
+            return False
+        comparator = test.comparators[0]
+        return getattr(comparator, 'value', getattr(comparator, 's', None)) == '__main__'
+
+    def visit_If(self, node: ast.If) -> None:
+        self.visit(node.test)
+        if self._is_main_guard(node.test):
+            for statement in node.body:
+                self.visit(statement)
+        else:
+            self._visit_conditional(node.body)
+        self._visit_conditional(node.orelse)
+
+    def _visit_loop(self, node: Union[ast.For, ast.AsyncFor, ast.While]) -> None:
+        if isinstance(node, ast.While):
+            self.visit(node.test)
+        else:
+            self.visit(node.iter)
+            for target in ast.walk(node.target):
+                if isinstance(target, ast.Name):
+                    self._record(target.id, None)
+        self._visit_conditional(node.body + node.orelse)
+
+    visit_For = _visit_loop
+    visit_AsyncFor = _visit_loop
+    visit_While = _visit_loop
+
+    def visit_Try(self, node: ast.Try) -> None:
+        # an exception may stop the body and pick a handler, only the finally clause always runs
+        if node.handlers:
+            self._visit_conditional(node.body)
+        else:
+            for statement in node.body:
+                self.visit(statement)
+        for handler in node.handlers:
+            if handler.type is not None:
+                self.visit(handler.type)
+            if handler.name is not None:
+                self._record(handler.name, None)
+            self._visit_conditional(handler.body)
+        self._visit_conditional(node.orelse)
+        for statement in node.finalbody:
+            self.visit(statement)
+
+    def visit_Match(self, node: 'ast.Match') -> None:
+        self.visit(node.subject)
+        for case in node.cases:
+            self._visit_conditional(case.body)
+
+    def _visit_scope(self, parameters: List[str], body: List[ast.AST]) -> None:
+        scope, global_names, conditional = self._scope, self._globals, self._conditional
+        self._scope, self._globals, self._conditional = scope.scope(), set(), 0
+        try:
+            for name in parameters:
+                self._scope.bind(name, None)
+            for statement in body:
+                self.visit(statement)
+        finally:
+            self._scope, self._globals, self._conditional = scope, global_names, conditional
+
+    def _visit_function(self, node: Union[ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda]) -> None:
+        # decorators and defaults are evaluated in the enclosing scope, the body in a scope of its own
+        for expr in getattr(node, 'decorator_list', []) + node.args.defaults + node.args.kw_defaults:
+            if expr is not None:
+                self.visit(expr)
+        arguments = node.args
+        parameters = [arg.arg for arg in getattr(arguments, 'posonlyargs', []) + arguments.args + arguments.kwonlyargs]
+        parameters += [arg.arg for arg in (arguments.vararg, arguments.kwarg) if arg is not None]
+        if isinstance(node, ast.Lambda):
+            self._visit_scope(parameters, [node.body])
+            return
+        self._visit_scope(parameters, list(node.body))
+        self._record(node.name, None)
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+    visit_Lambda = _visit_function
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        for expr in node.decorator_list + node.bases + [keyword.value for keyword in node.keywords]:
+            self.visit(expr)
+        self._visit_scope([], list(node.body))
+        self._record(node.name, None)
+
+    def visit_Global(self, node: ast.Global) -> None:
+        self._globals.update(node.names)
+
+    def _bind(self, target: ast.expr, value: ast.expr) -> None:
+        if isinstance(target, ast.Name):
+            self._record(target.id, value)
+        elif isinstance(target, (ast.Tuple, ast.List)) and isinstance(value, (ast.Tuple, ast.List)):
+            for sub_target, sub_value in zip(target.elts, value.elts):
+                self._bind(sub_target, sub_value)
+        elif isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name):
+            # kwargs['name'] = value is recorded as kwargs = {**kwargs, 'name': value}
+            key = target.slice.value if isinstance(target.slice, getattr(ast, 'Index', ())) else target.slice  # type: ignore[attr-defined]
+            name = target.value.id
+            self._record(name, ast.Dict(keys=[None, key], values=[ast.Name(id=name, ctx=ast.Load()), value]))
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        self.generic_visit(node)
+        for target in node.targets:
+            self._bind(target, node.value)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
+        self.generic_visit(node)
+        if node.value is not None:
+            self._bind(node.target, node.value)
+
+    def visit_With(self, node: ast.With) -> None:
+        # with open(path) as f: binds f to the opened file before the body reads it
+        for item in node.items:
+            self.visit(item.context_expr)
+            if item.optional_vars is not None:
+                self._bind(item.optional_vars, item.context_expr)
+        for statement in node.body:
+            self.visit(statement)
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> None:
+        self.generic_visit(node)
+        if isinstance(node.target, ast.Name):
+            name = node.target.id
+            self._record(name, ast.BinOp(left=ast.Name(id=name, ctx=ast.Load()), op=node.op, right=node.value))
+
+    def _is_setup(self, func: ast.expr) -> bool:
+        if isinstance(func, ast.Name):
+            return func.id in self.setup_names
+        if isinstance(func, ast.Attribute) and func.attr == 'setup':
+            return _dotted_name(func.value) in self.module_names
+        return False
+
+    def visit_Call(self, node: ast.Call) -> None:
+        self.generic_visit(node)
+        func = node.func
+        if self.setup_call is None and self._is_setup(func):
+            self.setup_call = node
+            self.setup_symbols = self._scope
+            self.setup_seq = self.symbols.seq + 1
+        elif (isinstance(func, ast.Attribute) and func.attr in MUTATING_METHODS_ and isinstance(func.value, ast.Name)
+              and len(node.args) == 1 and not node.keywords):
+            name, arg = func.value.id, node.args[0]
+            current = ast.Name(id=name, ctx=ast.Load())
+            if func.attr == 'append':
+                self._record(name, ast.BinOp(left=current, op=ast.Add(), right=ast.List(elts=[arg], ctx=ast.Load())))
+            elif func.attr == 'extend':
+                self._record(name, ast.BinOp(left=current, op=ast.Add(),
+                                             right=ast.Call(func=ast.Name(id='list', ctx=ast.Load()),
+                                                            args=[arg], keywords=[])))
+            else:
+                self._record(name, ast.Dict(keys=[None, None], values=[current, arg]))
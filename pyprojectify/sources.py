@@ -0,0 +1,177 @@
+"""Inputs of a migration, read from a project directory or streamed from an sdist archive."""
+
+import os
+import posixpath
+from pathlib import Path
+
+# Typing related imports
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from .packages import FindPackages, find_packages
+
+INPUT_FILES_: Tuple[str, ...] = ('setup.py', 'setup.cfg', 'MANIFEST.in', 'pyproject.toml')
+ARCHIVE_SUFFIXES_: Tuple[str, ...] = ('.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz', '.tar', '.zip')
+MAX_INPUT_SIZE_ = 16 * 1024 * 1024
+
+
+class DirectorySource:
+    """Project files read from a directory, optionally with the presence of the input files known."""
+
+    def __init__(self, path: Path, listing: Optional[Dict[str, bool]] = None) -> None:
+        self.path = path
+        self.root: Optional[Path] = path
+        self._listing = listing
+
+    def __str__(self) -> str:
+        return str(self.path)
+
+    def has(self, name: str) -> bool:
+        """Check if the project has the input file name."""
+        if self._listing is not None:
+            return self._listing[name]
+        return (self.path / name).is_file()
+
+    def read_text(self, name: str) -> str:
+        with open(self.path / name, 'r') as f:
+            return f.read()
+
+    def is_file(self, relative_path: str) -> bool:
+        return (self.path / relative_path).is_file()
+
+    def files(self) -> List[str]:
+        """Return the files of the project as relative posix paths."""
+        from .manifest import snapshot
+
+        return snapshot(str(self.path))
+
+    def find_packages(self, finder: FindPackages) -> List[str]:
+        return find_packages(str(self.path), *finder)
+
+
+class MemorySource:
+    """Project files held in memory: the content of the input files and optionally the names of all the files.
+
+    When the names of the files are not given, the files referenced by the inputs are assumed
+    to exist. There is no project directory to resolve attr: or file: directives against, nor
+    to execute setup.py in.
+    """
+
+    def __init__(self, contents: Dict[str, Union[str, bytes]], files: Optional[Iterable[str]] = None,
+                 label: str = '<memory>') -> None:
+        self.root: Optional[Path] = None
+        self.label = label
+        self._contents = contents
+        self._files = list(files) if files is not None else list(contents)
+        self._file_set = frozenset(self._files) if files is not None else None
+        self._tree: Optional[Dict[str, Tuple[Set[str], Set[str]]]] = None
+
+    def __str__(self) -> str:
+        return self.label
+
+    def has(self, name: str) -> bool:
+        return name in self._contents
+
+    def read_text(self, name: str) -> str:
+        content = self._contents[name]
+        return content.decode('utf-8') if isinstance(content, bytes) else content
+
+    def is_file(self, relative_path: str) -> bool:
+        return self._file_set is None or posixpath.normpath(relative_path) in self._file_set
+
+    def files(self) -> List[str]:
+        return list(self._files)
+
+    def _listing(self, path: str) -> Optional[Tuple[bool, List[str]]]:
+        if self._tree is None:
+            self._tree = {}
+            for name in self._files:
+                directory, _, base = name.rpartition('/')
+                self._tree.setdefault(directory, (set(), set()))[0].add(base)
+                while directory:
+                    parent, _, child = directory.rpartition('/')
+                    entry = self._tree.setdefault(parent, (set(), set()))
+                    if child in entry[1]:
+                        break
+                    entry[1].add(child)
+                    directory = parent
+        directory = posixpath.normpath(path.replace(os.sep, '/'))
+        listed = self._tree.get('' if directory == '.' else directory)
+        if listed is None:
+            return None
+        return '__init__.py' in listed[0], sorted(name for name in listed[1] if '.' not in name)
+
+    def find_packages(self, finder: FindPackages) -> List[str]:
+        return find_packages('', *finder, listing=self._listing)
+
+
+class ArchiveSource(MemorySource):
+    """Project files of an sdist, read in one streaming pass over the archive.
+
+    Only the names of the members are kept, and the content of the input files at the root
+    of the project, which is the top-level directory shared by every member of an sdist.
+    Nothing is extracted to disk.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        if self.path.name.endswith('.zip'):
+            names, contents = self._read_zip()
+        else:
+            names, contents = self._read_tar()
+
+        prefix = ''
+        tops = {name.split('/', 1)[0] for name in names}
+        if len(tops) == 1 and all('/' in name for name in names):
+            prefix = tops.pop() + '/'
+        super().__init__({name[len(prefix):]: data for name, data in contents.items()
+                          if name.startswith(prefix) and '/' not in name[len(prefix):]},
+                         [name[len(prefix):] for name in names if name.startswith(prefix)], str(self.path))
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        name = posixpath.normpath(name.replace('\\', '/'))
+        return name[2:] if name.startswith('./') else name.lstrip('/')
+
+    @staticmethod
+    def _is_input(name: str) -> bool:
+        # input files of a project at the root of the archive or in its top-level directory
+        return name.count('/') <= 1 and posixpath.basename(name) in INPUT_FILES_
+
+    def _read_tar(self) -> Tuple[List[str], Dict[str, bytes]]:
+        import tarfile
+
+        names = []
+        contents = {}
+        with tarfile.open(str(self.path), mode='r|*') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                name = self._normalize(member.name)
+                names.append(name)
+                if self._is_input(name) and member.size <= MAX_INPUT_SIZE_:
+                    f = archive.extractfile(member)
+                    if f is not None:
+                        contents[name] = f.read()
+        return names, contents
+
+    def _read_zip(self) -> Tuple[List[str], Dict[str, bytes]]:
+        import zipfile
+
+        names = []
+        contents = {}
+        with zipfile.ZipFile(str(self.path)) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                name = self._normalize(info.filename)
+                names.append(name)
+                if self._is_input(name) and info.file_size <= MAX_INPUT_SIZE_:
+                    contents[name] = archive.read(info)
+        return names, contents
+
+
+def is_archive(path: Union[str, Path]) -> bool:
+    return str(path).endswith(ARCHIVE_SUFFIXES_)
+
+
+Source = Union[DirectorySource, MemorySource]
@@ -0,0 +1,254 @@
+"""Offline indexes of the trove classifiers and SPDX license identifiers accepted by PyPI.
+
+The indexes are text files bundled in pyprojectify/data, generated from the trove-classifiers
+and packaging distributions by ``python -m pyprojectify.trove`` and stamped with their
+versions. They are read on first use into frozensets and dicts, so checking a classifier
+or a license identifier is a hash lookup and needs no network access.
+"""
+
+import difflib
+import re
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+# Typing related imports
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from .utils import logger
+
+DATA_DIR_ = Path(__file__).parent / 'data'
+CLASSIFIERS_FILE_ = 'classifiers.txt'
+DEPRECATED_CLASSIFIERS_FILE_ = 'deprecated-classifiers.txt'
+LICENSES_FILE_ = 'spdx-licenses.txt'
+EXCEPTIONS_FILE_ = 'spdx-exceptions.txt'
+# classifiers PyPI rejects on purpose, to prevent uploads
+PRIVATE_PREFIX_ = 'Private ::'
+
+# common license names of setup() mapped to SPDX identifiers, compared once normalized
+LICENSE_ALIASES_: Dict[str, str] = {
+    'MIT License': 'MIT', 'Expat': 'MIT',
+    'BSD 3-Clause': 'BSD-3-Clause', 'New BSD': 'BSD-3-Clause',
+    'Modified BSD': 'BSD-3-Clause', 'BSD-new': 'BSD-3-Clause', '3-clause BSD': 'BSD-3-Clause',
+    'BSD 2-Clause': 'BSD-2-Clause', 'Simplified BSD': 'BSD-2-Clause', 'FreeBSD': 'BSD-2-Clause',
+    '2-clause BSD': 'BSD-2-Clause',
+    'Apache 2': 'Apache-2.0', 'Apache 2.0': 'Apache-2.0', 'Apache2': 'Apache-2.0',
+    'Apache License, Version 2.0': 'Apache-2.0', 'Apache Software License 2.0': 'Apache-2.0', 'ASL 2.0': 'Apache-2.0',
+    'GPLv2': 'GPL-2.0-only', 'GPL 2': 'GPL-2.0-only', 'GPLv2+': 'GPL-2.0-or-later',
+    'GPLv3': 'GPL-3.0-only', 'GPL 3': 'GPL-3.0-only', 'GPLv3+': 'GPL-3.0-or-later',
+    'GNU GPLv3': 'GPL-3.0-only', 'GNU General Public License v3': 'GPL-3.0-only',
+    'GNU General Public License v2': 'GPL-2.0-only',
+    'LGPLv2.1': 'LGPL-2.1-only', 'LGPLv2.1+': 'LGPL-2.1-or-later', 'LGPLv3': 'LGPL-3.0-only',
+    'LGPLv3+': 'LGPL-3.0-or-later', 'GNU Lesser General Public License v3': 'LGPL-3.0-only',
+    'AGPLv3': 'AGPL-3.0-only', 'AGPLv3+': 'AGPL-3.0-or-later',
+    'MPL 2.0': 'MPL-2.0', 'Mozilla Public License 2.0': 'MPL-2.0',
+    'EPL 2.0': 'EPL-2.0', 'Eclipse Public License 2.0': 'EPL-2.0',
+    'PSF': 'PSF-2.0', 'Python Software Foundation License': 'PSF-2.0',
+    'CC0': 'CC0-1.0', 'ISC License': 'ISC', 'zlib/libpng': 'Zlib', 'Artistic 2.0': 'Artistic-2.0',
+}
+# license names without their version or variant, which are reported with the identifiers they may stand for
+AMBIGUOUS_LICENSES_: Dict[str, Tuple[str, ...]] = {
+    'BSD': ('BSD-3-Clause', 'BSD-2-Clause', 'BSD-4-Clause'),
+    'Apache': ('Apache-2.0', 'Apache-1.1', 'Apache-1.0'),
+    'Apache Software License': ('Apache-2.0', 'Apache-1.1', 'Apache-1.0'),
+    'GPL': ('GPL-3.0-or-later', 'GPL-3.0-only', 'GPL-2.0-or-later', 'GPL-2.0-only'),
+    'LGPL': ('LGPL-3.0-or-later', 'LGPL-3.0-only', 'LGPL-2.1-or-later', 'LGPL-2.1-only'),
+}
+_OPERATORS = ('AND', 'OR', 'WITH')
+_NOISE_WORDS = {'the', 'license', 'licence', 'licensed', 'version', 'osi', 'approved'}
+
+
+def _read_index(name: str) -> Tuple[str, List[str]]:
+    """Return the version stamped on the first line of an index file and its entries."""
+    with open(DATA_DIR_ / name, encoding='utf-8') as f:
+        header, *lines = f.read().splitlines()
+    return header.lstrip('# '), [line for line in lines if line]
+
+
+def index_versions() -> Dict[str, str]:
+    """Return the versions of the distributions the bundled indexes were generated from."""
+    return {name: _read_index(name)[0] for name in (CLASSIFIERS_FILE_, LICENSES_FILE_)}
+
+
+@lru_cache(maxsize=None)
+def classifiers() -> FrozenSet[str]:
+    """Return the classifiers accepted by PyPI."""
+    return frozenset(sys.intern(line) for line in _read_index(CLASSIFIERS_FILE_)[1])
+
+
+@lru_cache(maxsize=None)
+def deprecated_classifiers() -> Dict[str, Tuple[str, ...]]:
+    """Return the deprecated classifiers, with the classifiers replacing them if any."""
+    deprecated = {}
+    for line in _read_index(DEPRECATED_CLASSIFIERS_FILE_)[1]:
+        classifier, *replacements = line.split('\t')
+        deprecated[classifier] = tuple(replacements)
+    return deprecated
+
+
+@lru_cache(maxsize=None)
+def _trie() -> Dict[str, Any]:
+    """Return the classifiers as a prefix trie of their ' :: ' separated segments."""
+    trie: Dict[str, Any] = {}
+    for classifier in classifiers():
+        node = trie
+        for segment in classifier.split(' :: '):
+            node = node.setdefault(segment, {})
+    return trie
+
+
+@lru_cache(maxsize=4096)
+def suggest_classifier(classifier: str) -> Optional[str]:
+    """Return the known classifier closest to an unknown one, if any is close enough.
+
+    The trie is walked segment by segment, a misspelled segment being replaced with its
+    closest sibling, so that difflib only compares a segment with the few segments that
+    can follow the ones before it.
+    """
+    node = _trie()
+    segments = []
+    for segment in (segment.strip() for segment in classifier.split('::')):
+        if segment not in node:
+            matches = difflib.get_close_matches(segment, list(node), n=1, cutoff=0.8)
+            if not matches:
+                return None
+            segment = matches[0]
+        segments.append(segment)
+        node = node[segment]
+    suggestion = ' :: '.join(segments)
+    return suggestion if suggestion in classifiers() and suggestion != classifier else None
+
+
+def check_classifiers(values: Iterable[str]) -> List[str]:
+    """Return classifiers with the deprecated ones replaced, reporting deprecated and unknown ones.
+
+    Unknown classifiers are kept, with the closest known one suggested in the warning.
+    """
+    known = classifiers()
+    checked: List[str] = []
+    seen = set()
+    for classifier in values:
+        classifier = classifier.strip()
+        if classifier in known or classifier.startswith(PRIVATE_PREFIX_):
+            replacements: Tuple[str, ...] = (classifier,)
+        elif classifier in deprecated_classifiers():
+            replacements = deprecated_classifiers()[classifier]
+            logger.warning("Classifier {!r} is deprecated, {}".format(
+                classifier, 'replaced with ' + ', '.join(map(repr, replacements)) if replacements else 'dropped'))
+        else:
+            suggestion = suggest_classifier(classifier)
+            logger.warning("Unknown classifier {!r}{}".format(
+                classifier, ', did you mean {!r}?'.format(suggestion) if suggestion else ''))
+            replacements = (classifier,)
+        for replacement in replacements:
+            if replacement not in seen:
+                seen.add(replacement)
+                checked.append(replacement)
+    return checked
+
+
+@lru_cache(maxsize=None)
+def licenses() -> Dict[str, str]:
+    """Return the SPDX license identifiers, keyed by their lowercase form."""
+    return {line.lower(): sys.intern(line) for line in _read_index(LICENSES_FILE_)[1]}
+
+
+@lru_cache(maxsize=None)
+def license_exceptions() -> Dict[str, str]:
+    """Return the SPDX license exception identifiers, keyed by their lowercase form."""
+    return {line.lower(): sys.intern(line) for line in _read_index(EXCEPTIONS_FILE_)[1]}
+
+
+def _normalize_license(name: str) -> str:
+    words = re.sub(r'v(?=\d)', ' ', re.sub(r'[^a-z0-9.+]+', ' ', name.lower())).split()
+    return ' '.join(word for word in words if word not in _NOISE_WORDS)
+
+
+@lru_cache(maxsize=None)
+def _aliases() -> Dict[str, str]:
+    return {_normalize_license(alias): expression for alias, expression in LICENSE_ALIASES_.items()}
+
+
+@lru_cache(maxsize=None)
+def _ambiguous() -> Dict[str, Tuple[str, ...]]:
+    return {_normalize_license(name): candidates for name, candidates in AMBIGUOUS_LICENSES_.items()}
+
+
+def license_candidates(license: str) -> Tuple[str, ...]:
+    """Return the SPDX identifiers an ambiguous license name, such as 'BSD', may stand for, () for other names."""
+    return _ambiguous().get(_normalize_license(license.strip()), ())
+
+
+def _expression(text: str) -> Optional[str]:
+    """Return text with its identifiers in SPDX case if it is an SPDX license expression."""
+    tokens = re.findall(r'[()]|[^\s()]+', text)
+    normalized = []
+    after = None
+    for token in tokens:
+        if token in '()':
+            normalized.append(token)
+            continue
+        if token.upper() in _OPERATORS and after not in (None, 'AND', 'OR', 'WITH'):
+            after = token.upper()
+            normalized.append(after)
+            continue
+        plus = '+' if token.endswith('+') and after != 'WITH' else ''
+        identifier = token[:-1] if plus else token
+        if identifier.startswith(('LicenseRef-', 'DocumentRef-')):
+            value: Optional[str] = identifier
+        else:
+            value = (license_exceptions() if after == 'WITH' else licenses()).get(identifier.lower())
+        if value is None:
+            return None
+        after = value
+        normalized.append(value + plus)
+    if not normalized or after in _OPERATORS:
+        return None
+    return re.sub(r'\( | \)', lambda match: match.group().strip(), ' '.join(normalized))
+
+
+def spdx_expression(license: str) -> Optional[str]:
+    """Return a license of setup() as an SPDX license expression, None when it cannot be mapped.
+
+    'mit', 'MIT license' and 'The MIT License' are all 'MIT'. Ambiguous names, such as 'BSD',
+    are not guessed, see license_candidates().
+    """
+    text = license.strip()
+    if not text or '\n' in text:
+        return None
+    expression = _expression(text)
+    if expression is not None:
+        return expression
+    normalized = _normalize_license(text)
+    if normalized in _aliases():
+        return _aliases()[normalized]
+    return licenses().get(normalized.replace(' ', '-'))
+
+
+def update_indexes(directory: Path = DATA_DIR_) -> None:
+    """Write the indexes from the installed trove-classifiers and packaging distributions."""
+    from importlib.metadata import version
+
+    import trove_classifiers
+    from packaging.licenses import _spdx
+
+    trove_version = 'trove-classifiers {}'.format(version('trove-classifiers'))
+    spdx_version = 'SPDX license list {} (packaging {})'.format(_spdx.VERSION, version('packaging'))
+    indexes = {
+        CLASSIFIERS_FILE_: (trove_version, sorted(trove_classifiers.classifiers)),
+        DEPRECATED_CLASSIFIERS_FILE_: (trove_version, ['\t'.join([classifier] + list(replacements)) for
+                                                       classifier, replacements in
+                                                       sorted(trove_classifiers.deprecated_classifiers.items())]),
+        LICENSES_FILE_: (spdx_version, sorted(license['id'] for license in _spdx.LICENSES.values()
+                                              if not license['deprecated'])),
+        EXCEPTIONS_FILE_: (spdx_version, sorted(exception['id'] for exception in _spdx.EXCEPTIONS.values()
+                                                if not exception['deprecated'])),
+    }
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, (stamp, lines) in indexes.items():
+        with open(directory / name, 'w', encoding='utf-8', newline='\n') as f:
+            f.write('\n'.join(['# ' + stamp] + lines) + '\n')
+
+
+if __name__ == '__main__':
+    update_indexes()
@@ -6,4 +6,15 @@ logger = logging.getLogger(__name__)
 
 level = 'WARNING'
 fmt = '\r%(asctime)s%(levelname)8s%(filename)15s %(lineno)4s: %(message)s'
-logging.basicConfig(format=fmt, level=level)
+
+
+def configure_logging(log_level: str = level) -> None:
+    """Configure the root logger for the command line, the library itself never does."""
+    logging.basicConfig(format=fmt, level=log_level)
+
+
+def report_errors_only() -> None:
+    """Let the console handlers of configure_logging print errors only, for commands reporting the warnings."""
+    for handler in logging.getLogger().handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setLevel(logging.ERROR)
@@ -0,0 +1,91 @@
+"""Projects changed since a git revision, found from the paths git reports instead of a full scan."""
+
+import subprocess
+from pathlib import Path
+
+# Typing related imports
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from .discovery import DEFAULT_IGNORES_, IgnoreRules, ProjectEntry, project_entry
+
+
+class VCSError(RuntimeError):
+    """Raised when git is missing, the directory is not in a repository or the revision is unknown."""
+
+
+def _git(cwd: Union[str, Path], *args: str) -> str:
+    try:
+        process = subprocess.run(['git', *args], cwd=str(cwd), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                 universal_newlines=True)
+    except OSError as e:
+        raise VCSError("Cannot run git: {}".format(e)) from e
+    if process.returncode != 0:
+        raise VCSError("git {} failed: {}".format(args[0], process.stderr.strip()))
+    return process.stdout
+
+
+def changed_paths(path: Union[str, Path], since: str) -> List[Path]:
+    """Return the absolute paths of the files changed in the repository of path since the revision since.
+
+    Changes are taken from the merge base of since and HEAD, as a pull request sees them,
+    up to the working tree, so that commits of the branch, uncommitted changes and
+    untracked files that are not ignored all count. A renamed file counts under both names.
+    """
+    top = Path(_git(path, 'rev-parse', '--show-toplevel').strip())
+    try:
+        base = _git(top, 'merge-base', since, 'HEAD').strip()
+    except VCSError:
+        # no common history, e.g. in a shallow clone: compare with the revision itself
+        base = since
+    names = _git(top, 'diff', '--name-only', '--no-renames', '-z', base, '--').split('\0')
+    names += _git(top, 'ls-files', '--others', '--exclude-standard', '-z').split('\0')
+    return sorted({top / name for name in names if name})
+
+
+def changed_projects(roots: Iterable[Union[str, Path]], since: str, ignore: Iterable[str] = (),
+                     default_ignores: bool = True) -> Iterator[ProjectEntry]:
+    """Yield the projects under roots owning a file changed since the revision since, sorted by path.
+
+    A changed file belongs to the closest enclosing project directory, so only the
+    directories between the changed files and the roots are listed, each at most once.
+    Any change counts, not only to the input files: a new module or data file may change
+    the packages or the files included. Projects in ignored directories are left out, as
+    with discover_projects.
+    """
+    rules = IgnoreRules(tuple(DEFAULT_IGNORES_ if default_ignores else ()) + tuple(ignore))
+    entries: Dict[Path, ProjectEntry] = {}
+    for root in roots:
+        resolved = Path(root).resolve()
+        owners: Dict[Path, Optional[Path]] = {}
+        projects = set()
+        for path in changed_paths(root, since):
+            if resolved not in path.parents:
+                continue
+            directory = path.parent
+            visited = []
+            owner = None
+            while directory not in owners:
+                visited.append(directory)
+                entry = project_entry(directory)
+                if entry is not None:
+                    entries[directory] = entry
+                    owner = directory
+                    break
+                if directory == resolved:
+                    break
+                directory = directory.parent
+            else:
+                owner = owners[directory]
+            for directory in visited:
+                owners[directory] = owner
+            if owner is None:
+                continue
+
+            relative = owner.relative_to(resolved).parts
+            if rules and any(rules.ignored('/'.join(relative[:i + 1]), name, True) for i, name in enumerate(relative)):
+                continue
+            projects.add(owner)
+
+        for owner in sorted(projects):
+            entry = entries[owner]
+            yield entry._replace(path=Path(root) / owner.relative_to(resolved))
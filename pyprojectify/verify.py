@@ -0,0 +1,194 @@
+"""Equivalence of the core metadata of setup.py and of the generated pyproject.toml.
+
+The core metadata a build would write to PKG-INFO is computed twice, in this process and
+without building anything: from the setup() arguments as setuptools reads them, and from
+the [project] table as PEP 621 maps it to core metadata. Both are normalized the same way,
+so that only differences a wheel would show are reported: requirements are compared as
+sets with their names normalized, readmes by the files they are read from.
+"""
+
+import re
+
+# Typing related imports
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .metadata import _entry_points, requirement_lines
+from .requirements import InvalidRequirement, normalize_name, parse_requirement
+
+# compared fields, named after their core metadata headers
+CORE_METADATA_FIELDS_: Tuple[str, ...] = (
+    'name', 'version', 'summary', 'description', 'description-content-type', 'keywords', 'author',
+    'maintainer', 'license', 'classifiers', 'requires-python', 'requires-dist', 'provides-extra', 'project-urls',
+    'entry-points')
+# [project] tables of entry point groups, as in emitters.SCRIPT_GROUPS_
+_SCRIPT_TABLES = {'scripts': 'console_scripts', 'gui-scripts': 'gui_scripts'}
+
+
+class FieldDiff(NamedTuple):
+    """A core metadata field whose value differs, None when it is missing."""
+
+    field: str
+    original: Any
+    generated: Any
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None or value == '' or not isinstance(value, (str, int, float)):
+        return None
+    return str(value).strip() or None
+
+
+def _keywords(value: Any) -> Tuple[str, ...]:
+    if isinstance(value, str):
+        value = re.split(r'[,\s]+', value)
+    return tuple(keyword.strip() for keyword in value or () if keyword and keyword.strip())
+
+
+def _specifier(value: Any) -> Optional[str]:
+    if not _text(value):
+        return None
+    try:
+        return ','.join(sorted(parse_requirement('python' + str(value)).specifier.split(',')))
+    except InvalidRequirement:
+        return str(value)
+
+
+def _marker(marker: str) -> str:
+    return re.sub(r'\s+', '', marker.replace("'", '"'))
+
+
+def _requirement(line: str, extra: str = '', marker: str = '') -> str:
+    """Return a requirement as a normalized Requires-Dist value, with the marker of its extra."""
+    try:
+        requirement = parse_requirement(line)
+    except InvalidRequirement:
+        return line
+    text = normalize_name(requirement.name)
+    if requirement.extras:
+        text += '[{}]'.format(','.join(sorted(normalize_name(extra) for extra in requirement.extras)))
+    if requirement.url:
+        text += '@' + requirement.url
+    elif requirement.specifier:
+        text += ','.join(sorted(requirement.specifier.split(',')))
+    if marker and requirement.marker:
+        # as extras_require "group:marker" keys are combined by ProjectMetadata
+        marker = '({}) and ({})'.format(requirement.marker, marker)
+    markers = [_marker(marker or requirement.marker or '')] if marker or requirement.marker else []
+    if extra:
+        markers.append('extra=="{}"'.format(normalize_name(extra)))
+    if markers:
+        text += ';' + 'and'.join('({})'.format(marker) if len(markers) > 1 else marker for marker in markers)
+    return text
+
+
+def _content_type(value: Any, description: Any) -> Optional[str]:
+    """Return the content type of the description, which defaults to reStructuredText."""
+    return (_text(value) or 'text/x-rst') if description else None
+
+
+def _readme(paths: Iterable[str]) -> Tuple[str, Any]:
+    return 'files', tuple(paths)
+
+
+def core_metadata(setup_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the normalized core metadata of setup() arguments, as setuptools writes it.
+
+    setup_kwargs are the arguments of setup.cfg and setup.py merged, the latter overriding
+    the former.
+    """
+    from .evaluator import FileContent
+
+    long_description = setup_kwargs.get('long_description')
+    extras_require = setup_kwargs.get('extras_require')
+    requires_dist = [_requirement(line) for line in requirement_lines(setup_kwargs.get('install_requires'))]
+    provides_extra = []
+    for key, requirements in (extras_require.items() if isinstance(extras_require, dict) else ()):
+        extra, _, marker = str(key).partition(':')
+        if extra:
+            provides_extra.append(normalize_name(extra))
+        requires_dist.extend(_requirement(line, extra, marker.strip()) for line in requirement_lines(requirements))
+    description = (_readme(long_description.paths) if isinstance(long_description, FileContent)
+                   else ('text', _text(long_description)) if _text(long_description) else None)
+    urls = dict(setup_kwargs.get('project_urls') or {})
+    if _text(setup_kwargs.get('url')):
+        urls['Homepage'] = setup_kwargs['url']
+    return {
+        'name': _text(setup_kwargs.get('name')),
+        'version': _text(setup_kwargs.get('version')),
+        'summary': _text(setup_kwargs.get('description')),
+        'description': description,
+        'description-content-type': _content_type(setup_kwargs.get('long_description_content_type'), description),
+        'keywords': _keywords(setup_kwargs.get('keywords')),
+        'author': tuple(person for person in [(_text(setup_kwargs.get('author')),
+                                               _text(setup_kwargs.get('author_email')))] if any(person)),
+        'maintainer': tuple(person for person in [(_text(setup_kwargs.get('maintainer')),
+                                                   _text(setup_kwargs.get('maintainer_email')))] if any(person)),
+        'license': _text(setup_kwargs.get('license')),
+        'classifiers': tuple(sorted(setup_kwargs.get('classifiers') or ())),
+        'requires-python': _specifier(setup_kwargs.get('python_requires')),
+        'requires-dist': tuple(sorted(set(requires_dist))),
+        'provides-extra': tuple(sorted(set(provides_extra))),
+        'project-urls': tuple(sorted((str(label), str(url)) for label, url in urls.items())),
+        'entry-points': tuple(sorted((entry_point.group, entry_point.name, entry_point.value.replace(' ', ''))
+                                     for entry_point in _entry_points(setup_kwargs.get('entry_points')))),
+    }
+
+
+def project_core_metadata(pyproject: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the normalized core metadata of the [project] table of a pyproject.toml mapping.
+
+    The readme of a dynamic readme is read from [tool.setuptools.dynamic], as setuptools does.
+    """
+    project = pyproject.get('project')
+    if not isinstance(project, dict):
+        raise ValueError("pyproject.toml has no [project] table")
+    dynamic = project.get('dynamic') or ()
+
+    readme = project.get('readme')
+    description: Optional[Tuple[str, Any]] = None
+    content_type = None
+    if isinstance(readme, str):
+        description = _readme([readme])
+    elif isinstance(readme, dict):
+        description = _readme([readme['file']]) if 'file' in readme else ('text', _text(readme.get('text')))
+        content_type = readme.get('content-type')
+    elif 'readme' in dynamic:
+        setuptools_readme = pyproject.get('tool', {}).get('setuptools', {}).get('dynamic', {}).get('readme', {})
+        if setuptools_readme.get('file'):
+            files = setuptools_readme['file']
+            description = _readme([files] if isinstance(files, str) else files)
+            content_type = setuptools_readme.get('content-type')
+
+    license = project.get('license')
+    optional = project.get('optional-dependencies') or {}
+    entry_points = [(group, name, value) for table, group in _SCRIPT_TABLES.items()
+                    for name, value in (project.get(table) or {}).items()]
+    entry_points.extend((group, name, value) for group, values in (project.get('entry-points') or {}).items()
+                        for name, value in values.items())
+    return {
+        'name': _text(project.get('name')),
+        'version': _text(project.get('version')),
+        'summary': _text(project.get('description')),
+        'description': description,
+        'description-content-type': _content_type(content_type, description),
+        'keywords': _keywords(project.get('keywords')),
+        'author': tuple((_text(person.get('name')), _text(person.get('email')))
+                        for person in project.get('authors', ())),
+        'maintainer': tuple((_text(person.get('name')), _text(person.get('email')))
+                            for person in project.get('maintainers', ())),
+        'license': _text(license.get('text') if isinstance(license, dict) else license),
+        'classifiers': tuple(sorted(project.get('classifiers') or ())),
+        'requires-python': _specifier(project.get('requires-python')),
+        'requires-dist': tuple(sorted({_requirement(line) for line in project.get('dependencies') or ()}
+                                      | {_requirement(line, extra) for extra, lines in optional.items()
+                                         for line in lines})),
+        'provides-extra': tuple(sorted({normalize_name(extra) for extra in optional})),
+        'project-urls': tuple(sorted((str(label), str(url)) for label, url in (project.get('urls') or {}).items())),
+        'entry-points': tuple(sorted((group, name, value.replace(' ', '')) for group, name, value in entry_points)),
+    }
+
+
+def compare(original: Dict[str, Any], generated: Dict[str, Any]) -> List[FieldDiff]:
+    """Return the fields whose values differ, in the order of CORE_METADATA_FIELDS_."""
+    return [FieldDiff(field, original.get(field), generated.get(field)) for field in CORE_METADATA_FIELDS_
+            if original.get(field) != generated.get(field)]
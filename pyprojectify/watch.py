@@ -0,0 +1,205 @@
+"""Watch projects and migrate them again when their inputs change.
+
+File system notifications come from watchdog (inotify on Linux) when it is installed,
+otherwise the input files of every project are polled against an index of their sizes
+and modification times. Either way the watcher sleeps until something happens: it
+blocks on a queue of changes with a timeout only while a migration is pending or a
+poll is due.
+"""
+
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+# Typing related imports
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .batch import MigrationResult, migrate_project
+from .cache import INPUT_FILES_, MigrationCache
+from .discovery import ProjectEntry, discover_projects, project_entry
+from .utils import logger
+
+DEFAULT_DEBOUNCE_ = 0.5
+DEFAULT_INTERVAL_ = 1.0
+RESCAN_INTERVAL_ = 30.0
+
+Signature = Tuple[Optional[Tuple[int, int]], ...]
+
+
+def _signature(path: Path) -> Signature:
+    """Return the size and modification time of each input file of the project at path."""
+    signature: List[Optional[Tuple[int, int]]] = []
+    for name in INPUT_FILES_:
+        try:
+            stat = os.stat(os.path.join(path, name))
+        except OSError:
+            signature.append(None)
+            continue
+        signature.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+class ProjectWatcher:
+    """Migrate the projects under roots again, in this process, once their inputs stop changing.
+
+    Changes are debounced per project: a project is migrated debounce seconds after the last
+    change of its setup.py, setup.cfg or MANIFEST.in, so that a burst of saves migrates it
+    once. A project whose inputs have the same content as at its last migration is skipped.
+    The process stays warm between changes, with the modules imported and the parsing caches
+    filled. With polling, the input files are checked every interval seconds and the roots
+    are scanned for new projects every RESCAN_INTERVAL_ seconds.
+    """
+
+    def __init__(self, roots: Iterable[Union[str, Path]], ignore: Iterable[str] = (),
+                 options: Optional[Dict[str, Any]] = None, debounce: float = DEFAULT_DEBOUNCE_,
+                 interval: float = DEFAULT_INTERVAL_, polling: bool = False) -> None:
+        self.roots = [Path(root) for root in roots]
+        self.ignore = tuple(ignore)
+        self.options = options
+        self.debounce = debounce
+        self.interval = interval
+        self.polling = polling
+        self.projects: Dict[Path, ProjectEntry] = {}
+        self._index: Dict[Path, Signature] = {}
+        self._keys: Dict[Path, str] = {}
+        self._pending: Dict[Path, float] = {}
+        self._changes: 'queue.Queue[Optional[Path]]' = queue.Queue()
+        self._stopped = threading.Event()
+        self._discover(initial=True)
+
+    def _discover(self, initial: bool = False) -> None:
+        """Index the projects under the roots, new projects found after the first scan are pending."""
+        now = time.monotonic()
+        for entry in discover_projects(self.roots, self.ignore):
+            if entry.path in self.projects:
+                continue
+            self.projects[entry.path] = entry
+            self._index[entry.path] = _signature(entry.path)
+            if not initial:
+                self._pending[entry.path] = now + self.debounce
+
+    def poll(self) -> List[Path]:
+        """Check the input files of every project against the index, return the projects that changed."""
+        changed = []
+        for path in self.projects:
+            signature = _signature(path)
+            if signature != self._index[path]:
+                self._index[path] = signature
+                changed.append(path)
+        return changed
+
+    def notify(self, path: Union[str, Path]) -> None:
+        """Report a change of the file path, thread safe."""
+        self._changes.put(Path(path))
+
+    def stop(self) -> None:
+        """Make run return, thread safe."""
+        self._stopped.set()
+        self._changes.put(None)
+
+    def _owner(self, path: Path) -> Optional[Path]:
+        """Return the project directory a changed file is an input of."""
+        if path.name not in INPUT_FILES_:
+            return None
+        if path.parent in self.projects:
+            return path.parent
+        entry = project_entry(path.parent)
+        if entry is None or not any(root == entry.path or root in entry.path.parents for root in self.roots):
+            return None
+        self.projects[entry.path] = entry
+        self._index[entry.path] = _signature(entry.path)
+        return entry.path
+
+    def _migrate(self, path: Path) -> Optional[MigrationResult]:
+        entry = project_entry(path)
+        if entry is None:
+            # the project is gone
+            self.projects.pop(path, None)
+            self._index.pop(path, None)
+            self._keys.pop(path, None)
+            return None
+        self.projects[path] = entry
+        try:
+            key = MigrationCache.key(path, self.options)
+        except OSError as e:
+            return MigrationResult(str(path), 'error', (), repr(e))
+        if self._keys.get(path) == key:
+            return None
+        result = migrate_project(entry, self.options)
+        if result.status != 'error':
+            self._keys[path] = key
+        return result
+
+    def _start_observer(self) -> Any:
+        """Start a watchdog observer feeding the queue of changes, None when watchdog is not installed."""
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return None
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):  # type: ignore[misc]
+            def on_any_event(self, event: Any) -> None:
+                if event.is_directory:
+                    return
+                for attribute in ('src_path', 'dest_path'):
+                    path = getattr(event, attribute, None)
+                    if path and os.path.basename(path) in INPUT_FILES_:
+                        watcher.notify(path)
+
+        observer = Observer()
+        for root in self.roots:
+            observer.schedule(Handler(), str(root), recursive=True)
+        observer.start()
+        return observer
+
+    def run(self, callback: Callable[[MigrationResult], None]) -> None:
+        """Migrate changed projects, passing each result to callback, until stop is called."""
+        observer = None if self.polling else self._start_observer()
+        if observer is None and not self.polling:
+            logger.info("watchdog is not installed, polling for changes")
+        polling = observer is None
+        next_poll = time.monotonic() + self.interval
+        next_rescan = time.monotonic() + RESCAN_INTERVAL_
+        try:
+            while not self._stopped.is_set():
+                now = time.monotonic()
+                deadlines = list(self._pending.values()) + ([next_poll] if polling else [])
+                timeout = max(min(deadlines) - now, 0.0) if deadlines else None
+                try:
+                    changed: Optional[Path] = self._changes.get(timeout=timeout)
+                except queue.Empty:
+                    changed = None
+                now = time.monotonic()
+                while changed is not None:
+                    owner = self._owner(changed)
+                    if owner is not None:
+                        self._pending[owner] = now + self.debounce
+                    try:
+                        changed = self._changes.get_nowait()
+                    except queue.Empty:
+                        break
+                if self._stopped.is_set():
+                    break
+
+                if polling and now >= next_poll:
+                    if now >= next_rescan:
+                        self._discover()
+                        next_rescan = now + RESCAN_INTERVAL_
+                    for path in self.poll():
+                        self._pending[path] = now + self.debounce
+                    next_poll = now + self.interval
+
+                for path in [path for path, deadline in self._pending.items() if deadline <= now]:
+                    del self._pending[path]
+                    result = self._migrate(path)
+                    if result is not None:
+                        callback(result)
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
@@ -33,7 +33,7 @@ setup(
     description="pyprojectify is a utility allowing python package authors/maintainers/packagers to painlessly migrate their package from setup.py to the new pyproject.toml.",
     entry_points={
         'console_scripts': [
-            'pyprojectify=pyprojectify.cli:main',
+            'pyprojectify=pyprojectify.__main__:main',
         ],
     },
     install_requires=requirements,
@@ -2,12 +2,36 @@
 
 """Tests for `pyprojectify` package."""
 
+import shutil
+import subprocess
+import sys
+import time
+
 import pytest
 from pathlib import Path
 from click.testing import CliRunner
 
+from pyprojectify import __version__ as pyprojectify_version
 from pyprojectify import pyprojectify
+from pyprojectify import batch
+from pyprojectify import cache
 from pyprojectify import cli
+from pyprojectify import discovery
+from pyprojectify import evaluator
+from pyprojectify import index
+from pyprojectify import manifest
+from pyprojectify import merge
+from pyprojectify import metadata
+from pyprojectify import packages
+from pyprojectify import requirements
+from pyprojectify import sandbox
+from pyprojectify import server
+from pyprojectify import sources
+from pyprojectify import trove
+from pyprojectify import vcs
+from pyprojectify import watch
+
+TESTS_DIR = Path(__file__).parent
 
 
 @pytest.fixture
@@ -32,7 +56,1061 @@ def test_command_line_interface():
     runner = CliRunner()
     result = runner.invoke(cli.main)
     assert result.exit_code == 0
-    assert 'pyprojectify.cli.main' in result.output
+    assert 'migrate' in result.output
     help_result = runner.invoke(cli.main, ['--help'])
     assert help_result.exit_code == 0
-    assert '--help  Show this message and exit.' in help_result.output
+    assert 'Show this message and exit.' in help_result.output
+    version_result = runner.invoke(cli.main, ['--version'])
+    assert version_result.output == 'pyprojectify, version {}\n'.format(pyprojectify_version)
+
+
+@pytest.mark.parametrize('code, unwanted', [
+    ('import pyprojectify.pyprojectify', ('ast', 'toml', 'configparser', 'click')),
+    ('from pyprojectify.__main__ import main; main(["--version"])', ('click', 'pyprojectify.pyprojectify')),
+])
+def test_lazy_imports(code, unwanted):
+    """Importing the package or asking for its version does not load the heavy modules."""
+    check = '{}; import sys; print(sorted(m for m in {!r} if m in sys.modules))'.format(code, unwanted)
+    output = subprocess.run([sys.executable, '-c', check], cwd=str(TESTS_DIR.parent), check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True).stdout
+    assert output.splitlines()[-1] == '[]'
+
+
+def test_cli_prints_warnings_once(tmp_path):
+    """A warning is echoed below the status of its project, and not logged to the console as well."""
+    (tmp_path / 'setup.py').write_text("from setuptools import setup\nsetup(name='demo', version=get_version())\n")
+    output = subprocess.run([sys.executable, '-m', 'pyprojectify', 'migrate', '--no-cache', str(tmp_path)],
+                            cwd=str(TESTS_DIR.parent), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            universal_newlines=True).stdout
+    assert output.count('Unresolved value for version') == 1
+    assert '        warning: Unresolved value for version' in output
+
+
+@pytest.fixture
+def monorepo(tmp_path, monkeypatch):
+    """Copy of the test projects plus a project with a broken setup.py."""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    for name in ('proj1', 'proj2', 'proj3'):
+        shutil.copytree(str(TESTS_DIR / name), str(tmp_path / 'packages' / name))
+    broken = tmp_path / 'packages' / 'broken'
+    broken.mkdir()
+    (broken / 'setup.py').write_text('setup(name=\n')
+    return tmp_path
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_migrate_many(monorepo, jobs):
+    """A broken project is reported without aborting the batch."""
+    results = {Path(r.path).name: r for r in batch.migrate_many([monorepo], jobs=jobs)}
+    assert sorted(results) == ['broken', 'proj1', 'proj2', 'proj3']
+    assert results['broken'].status == 'error'
+    assert 'SyntaxError' in results['broken'].error
+    for name in ('proj1', 'proj2', 'proj3'):
+        assert results[name].status in ('ok', 'warning')
+        assert (monorepo / 'packages' / name / 'pyproject.toml').is_file()
+
+
+def test_command_line_migrate(monorepo):
+    """The migrate command streams one line per project and fails on errors."""
+    runner = CliRunner()
+    result = runner.invoke(cli.main, ['migrate', '--jobs', '1', str(monorepo)])
+    assert result.exit_code == 1
+    assert 'error   {}'.format(monorepo / 'packages' / 'broken') in result.output
+    assert result.output.rstrip().endswith('1 failed')
+
+
+def test_migration_cache(monorepo):
+    """Unchanged projects are served from the cache without rewriting pyproject.toml."""
+    migration_cache = cache.MigrationCache(monorepo / 'cache', max_size=10 ** 6)
+    first = {Path(r.path).name: r for r in batch.migrate_many([monorepo], jobs=1, cache=migration_cache)}
+    assert not any(r.cached for r in first.values())
+
+    output = monorepo / 'packages' / 'proj2' / 'pyproject.toml'
+    mtime = output.stat().st_mtime_ns
+    second = {Path(r.path).name: r for r in batch.migrate_many([monorepo], jobs=1, cache=migration_cache)}
+    assert second['proj2'].cached
+    assert second['proj2'].warnings == first['proj2'].warnings
+    assert not second['broken'].cached
+    assert output.stat().st_mtime_ns == mtime
+
+    # editing an input invalidates the entry
+    setup_py = monorepo / 'packages' / 'proj2' / 'setup.py'
+    setup_py.write_text(setup_py.read_text().replace("version='0.1.0'", "version='0.2.0'"))
+    third = {Path(r.path).name: r for r in batch.migrate_many([monorepo], jobs=1, cache=migration_cache)}
+    assert not third['proj2'].cached
+    assert third['proj1'].cached
+
+    migration_cache.max_size = 0
+    assert migration_cache.prune() == 4  # including the stale proj2 entry
+    assert migration_cache.clear() == 0
+
+
+def test_migration_cache_directives(tmp_path):
+    """Files read by attr: and the packages found by find: are inputs of the cache key."""
+    import toml
+
+    project = tmp_path / 'project'
+    (project / 'pkg').mkdir(parents=True)
+    (project / 'pkg' / '__init__.py').write_text("__version__ = '1.0'\n")
+    (project / 'setup.cfg').write_text('[metadata]\nname = pkg\nversion = attr: pkg.__version__\n\n'
+                                       '[options]\npackages = find:\n')
+    migration_cache = cache.MigrationCache(tmp_path / 'cache', max_size=10 ** 6)
+    assert not batch.migrate_project(project, cache=migration_cache).cached
+    assert batch.migrate_project(project, cache=migration_cache).cached
+
+    (project / 'pkg' / '__init__.py').write_text("__version__ = '2.0'\n")
+    (project / 'newpkg').mkdir()
+    (project / 'newpkg' / '__init__.py').write_text('')
+    assert not batch.migrate_project(project, cache=migration_cache).cached
+    pyproject = toml.load(str(project / 'pyproject.toml'))
+    assert pyproject['project']['version'] == '2.0'
+    assert pyproject['tool']['setuptools']['packages'] == ['newpkg', 'pkg']
+    assert batch.migrate_project(project, cache=migration_cache).cached
+
+
+def test_discover_projects(monorepo):
+    """Discovery prunes ignored directories and virtualenvs and reports file presence."""
+    packages = monorepo / 'packages'
+    for ignored in ('node_modules/dep', 'build/lib', '.git/hooks', 'env', 'vendor/thirdparty'):
+        (packages / ignored).mkdir(parents=True)
+        (packages / ignored / 'setup.py').write_text('setup()\n')
+    (packages / 'env' / 'pyvenv.cfg').write_text('home = /usr/bin\n')
+
+    entries = list(discovery.discover_projects([monorepo], ignore=['/packages/vendor/']))
+    assert [entry.path.name for entry in entries] == ['broken', 'proj1', 'proj2', 'proj3']
+    proj1, proj2 = entries[1], entries[2]
+    assert proj1 == (packages / 'proj1', True, True, True, True)
+    assert proj2 == (packages / 'proj2', True, False, True, False)
+
+    rules = discovery.IgnoreRules(['*.egg-info/', 'docs/**/build', '!docs/keep/build'])
+    assert rules.ignored('pkg.egg-info', 'pkg.egg-info', True)
+    assert not rules.ignored('pkg.egg-info', 'pkg.egg-info', False)
+    assert rules.ignored('docs/a/b/build', 'build', True)
+    assert not rules.ignored('docs/keep/build', 'build', True)
+
+
+@pytest.mark.parametrize('source', [
+    "import setuptools\nsetuptools.setup(name='demo', version=VERSION)\n",
+    "from setuptools import setup as s\ns(name='demo', version=VERSION)\n",
+    "import distutils.core as dc\ndc.setup(name='demo', version=VERSION)\n",
+    "from setuptools import setup\nif __name__ == '__main__':\n    setup(name='demo', version=VERSION)\n",
+    "from setuptools import setup\ndef main():\n    kwargs = dict(name='demo')\n"
+    "    kwargs = {'name': 'demo', 'version': VERSION}\n    setup(**kwargs)\nmain()\n",
+])
+def test_parse_setup_py_forms(tmp_path, source):
+    """setup() is found through aliases, modules, nested blocks and keyword expansion."""
+    setup_py = tmp_path / 'setup.py'
+    setup_py.write_text("VERSION = '1.0'\n" + source)
+    kwargs = pyprojectify.PyProject()._parse_setup_py(setup_py)
+    assert kwargs == {'name': 'demo', 'version': '1.0'}
+
+
+def test_parse_setup_py_without_setup_call(tmp_path):
+    """A setup.py that never calls setup() is an error."""
+    setup_py = tmp_path / 'setup.py'
+    setup_py.write_text("x = x\nprint(x)\n")
+    with pytest.raises(ValueError):
+        pyprojectify.PyProject()._parse_setup_py(setup_py)
+
+
+def test_parse_setup_py_function_scopes(tmp_path):
+    """Bindings in functions and classes stay local, setup() sees its own function and the module."""
+    setup_py = tmp_path / 'setup.py'
+    setup_py.write_text('''
+from setuptools import setup
+version = '1.0'
+name = 'demo'
+description = 'module'
+def helper(description):
+    version = '2.0'
+    return description
+class Command:
+    name = 'command'
+def main(author='me'):
+    global description
+    description = 'global'
+    url = 'https://example.com'
+    setup(name=name, version=version, description=description, url=url, author=author, keywords=helper)
+main()
+''')
+    project = pyprojectify.PyProject()
+    kwargs = project._parse_setup_py(setup_py)
+    assert kwargs == {'name': 'demo', 'version': '1.0', 'description': 'global', 'url': 'https://example.com',
+                      'author': None, 'keywords': None}
+    assert project._unresolved == ['author', 'keywords']
+
+
+def test_parse_setup_py_conditional_bindings(tmp_path):
+    """Names bound or mutated in a block that may not run are unresolved, the __main__ guard always runs."""
+    setup_py = tmp_path / 'setup.py'
+    setup_py.write_text('''
+import sys
+from setuptools import setup
+reqs = ['click']
+if sys.version_info < (3,):
+    reqs.append('py2only')
+extras = {'test': ['pytest']}
+for name in ('docs',):
+    extras[name] = [name]
+try:
+    import pypandoc
+    readme = pypandoc.convert_file('README.md', 'rst')
+except ImportError:
+    readme = 'plain'
+if __name__ == '__main__':
+    keywords = 'demo'
+    setup(name='demo', install_requires=reqs, extras_require=extras, long_description=readme, keywords=keywords)
+''')
+    project = pyprojectify.PyProject()
+    kwargs = project._parse_setup_py(setup_py)
+    assert kwargs == {'name': 'demo', 'install_requires': None, 'extras_require': None, 'long_description': None,
+                      'keywords': 'demo'}
+    assert project._unresolved == ['install_requires', 'extras_require', 'long_description']
+
+
+def test_parse_setup_py_static_evaluation(tmp_path):
+    """Common expressions are folded statically, following reassignments in order."""
+    setup_py = tmp_path / 'setup.py'
+    setup_py.write_text('''
+import os
+from setuptools import setup
+
+NAME = 'demo'
+VERSION = (1, 2)
+requirements = ['click>=7']
+requirements += ['toml']
+requirements.append('attrs')
+extras = dict(test=['pytest'] + requirements[:1])
+extras['docs'] = ['sphinx']
+meta = {'url': 'https://example.com/{}'.format(NAME)}
+meta.update(author='me')
+meta = {**meta, 'license': 'MIT'}
+requirements = requirements + ['late']
+
+setup(
+    name=NAME,
+    version='.'.join(str(v) for v in VERSION) if False else '%d.%d' % VERSION,
+    description=f"{NAME!r} version {VERSION[0]:03d}",
+    keywords=', '.join(sorted(['b', 'a'])),
+    install_requires=requirements,
+    tests_require=requirements[:-1],
+    extras_require=extras,
+    data_files=[os.path.join('share', NAME, 'data.json')],
+    cmdclass={'build': BuildCommand},
+    **meta
+)
+''')
+    project = pyprojectify.PyProject()
+    kwargs = project._parse_setup_py(setup_py)
+    assert kwargs['name'] == 'demo'
+    assert kwargs['description'] == "'demo' version 001"
+    assert kwargs['keywords'] == 'a, b'
+    assert kwargs['install_requires'] == ['click>=7', 'toml', 'attrs', 'late']
+    assert kwargs['tests_require'] == ['click>=7', 'toml', 'attrs']
+    assert kwargs['extras_require'] == {'test': ['pytest', 'click>=7'], 'docs': ['sphinx']}
+    assert kwargs['data_files'] == ['share/demo/data.json']
+    assert kwargs['url'] == 'https://example.com/demo'
+    assert kwargs['license'] == 'MIT'
+    # the conditional expression and the undefined command class stay unresolved
+    assert kwargs['version'] is None and kwargs['cmdclass'] is None
+    assert project._unresolved == ['version', 'cmdclass']
+
+
+DYNAMIC_SETUP_PY = """
+import sys
+from setuptools import setup
+
+def get_version():
+    return '.'.join(str(part) for part in (1, 2, 3))
+
+print('noise on stdout')
+setup(name='dynamic', version=get_version(), install_requires=['click'], cmdclass={'x': object})
+"""
+
+
+def test_sandbox_pool(tmp_path):
+    """setup.py runs in a warm worker with a stubbed setup(), bounded by a timeout."""
+    (tmp_path / 'setup.py').write_text(DYNAMIC_SETUP_PY)
+    (tmp_path / 'slow').mkdir()
+    (tmp_path / 'slow' / 'setup.py').write_text('import time\ntime.sleep(30)\n')
+    with sandbox.SandboxPool(size=1, timeout=1) as pool:
+        kwargs = pool.run(tmp_path / 'setup.py')
+        assert kwargs == {'name': 'dynamic', 'version': '1.2.3', 'install_requires': ['click']}
+        with pytest.raises(sandbox.SandboxError, match='TimeoutError'):
+            pool.run(tmp_path / 'slow' / 'setup.py')
+        # the worker survives and stays warm
+        assert pool.run(tmp_path / 'setup.py')['version'] == '1.2.3'
+
+
+def test_migrate_execute_fallback(tmp_path):
+    """Only values left unresolved by static parsing are taken from the sandbox."""
+    (tmp_path / 'setup.py').write_text(DYNAMIC_SETUP_PY)
+    project = pyprojectify.PyProject(tmp_path)
+    static = project._parse_setup_py(tmp_path / 'setup.py')
+    assert static['version'] is None and project._unresolved == ['version', 'cmdclass']
+
+    pyprojectify.PyProject(tmp_path, execute_fallback=True).migrate()
+    assert 'version = "1.2.3"' in (tmp_path / 'pyproject.toml').read_text()
+
+
+def test_save_toml_skips_unchanged_output(tmp_path, caplog):
+    """Unchanged output is neither written nor backed up, changed output is replaced atomically."""
+    target = tmp_path / 'pyproject.toml'
+    pyproject = {'project': {'name': 'demo', 'classifiers': ('a', 'b')}}
+    assert pyprojectify.PyProject._save_toml(pyproject, target)
+    mtime = target.stat().st_mtime_ns
+    assert not pyprojectify.PyProject._save_toml(pyproject, target)
+    assert target.stat().st_mtime_ns == mtime
+    assert not (tmp_path / 'pyproject.toml.bak').exists()
+
+    pyproject['project']['name'] = 'renamed'
+    assert pyprojectify.PyProject._save_toml(pyproject, target)
+    assert 'renamed' in target.read_text()
+    assert 'demo' in (tmp_path / 'pyproject.toml.bak').read_text()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['pyproject.toml', 'pyproject.toml.bak']
+    # a backup is expected, not a problem of the project
+    assert not [record for record in caplog.records if record.levelname == 'WARNING']
+
+
+def test_save_toml_keeps_target_on_failure(tmp_path, monkeypatch):
+    """A failure after the backup leaves the previous pyproject.toml in place."""
+    target = tmp_path / 'pyproject.toml'
+    target.write_text('[project]\nname = "demo"\n')
+
+    def fail(src, dst):
+        raise OSError('interrupted')
+
+    monkeypatch.setattr('os.replace', fail)
+    with pytest.raises(OSError):
+        pyprojectify.PyProject._save_toml({'project': {'name': 'renamed'}}, target)
+    assert target.read_text() == '[project]\nname = "demo"\n'
+    assert (tmp_path / 'pyproject.toml.bak').read_text() == target.read_text()
+
+
+def test_stage_hooks(tmp_path):
+    """Hooks receive a start and an end event for every stage of a migration."""
+    shutil.copytree(str(TESTS_DIR / 'proj1'), str(tmp_path / 'proj1'))
+    events = []
+    project = pyprojectify.PyProject(tmp_path / 'proj1')
+    project.add_hook(events.append)
+    project.migrate()
+    assert [(e.stage, e.phase) for e in events[:4]] == [('read', 'start'), ('read', 'end'),
+                                                        ('parse', 'start'), ('parse', 'end')]
+    ends = {e.stage: e for e in events if e.phase == 'end'}
+    assert sorted(ends) == sorted(['read', 'parse', 'evaluate', 'read_config', 'find_packages', 'manifest', 'build', 'emit',
+                                   'render', 'write'])
+    assert ends['read'].nbytes == len((tmp_path / 'proj1' / 'setup.py').read_text())
+    assert ends['write'].nbytes == 0  # proj1 already has an up to date pyproject.toml
+    assert all(e.duration >= 0 for e in ends.values())
+
+
+@pytest.mark.parametrize('profile_format', ['json', 'cprofile'])
+def test_command_line_profile(monorepo, profile_format):
+    """--profile aggregates the statistics of every project of the batch."""
+    import json
+    import pstats
+
+    report = monorepo / 'profile.out'
+    runner = CliRunner()
+    runner.invoke(cli.main, ['migrate', '--jobs', '2', '--no-cache', '--profile', str(report),
+                             '--profile-format', profile_format, str(monorepo / 'packages')])
+    if profile_format == 'json':
+        stages = json.loads(report.read_text())
+        assert stages['projects'] == 4
+        assert stages['stages']['read']['count'] == 4
+        assert stages['stages']['build']['count'] == 3
+    else:
+        stats = pstats.Stats(str(report))
+        assert any(name == 'migrate' for _, _, name in stats.stats)
+
+
+@pytest.mark.parametrize('requirement, expected', [
+    ('Click>=7.0', ('Click', (), '>=7.0', None, None)),
+    ('requests [security, socks] >= 2.8.1, == 2.8.*', ('requests', ('security', 'socks'), '>=2.8.1,==2.8.*', None, None)),
+    ('name (>=1.0,<2)', ('name', (), '>=1.0,<2', None, None)),
+    ('pip @ https://example.com/pip.zip', ('pip', (), '', 'https://example.com/pip.zip', None)),
+    ('tomli; python_version < "3.11"', ('tomli', (), '', None, 'python_version < "3.11"')),
+])
+def test_parse_requirement(requirement, expected):
+    """Requirements are parsed into name, extras, specifier, url and marker."""
+    assert tuple(requirements.parse_requirement(requirement)) == expected
+
+
+@pytest.mark.parametrize('specifier, other, expected', [
+    ('>=2.20', '<2.28', True),
+    ('>=2.28', '<2.28', False),
+    ('~=2.27', '<2.28', True),
+    ('~=2.28', '<2.28', False),
+    ('==2.28.0', '<=2.28', True),
+    ('==2.*', '<2', False),
+    ('', '<2.28', True),
+])
+def test_specifiers_overlap(specifier, other, expected):
+    assert requirements.specifiers_overlap(specifier, other) is expected
+
+
+def test_parse_requirement_invalid():
+    with pytest.raises(requirements.InvalidRequirement):
+        requirements.parse_requirement('name >=> 1')
+
+
+def _emit(setup_kwargs, backend=None):
+    """Return the pyproject mapping of setup() keyword arguments, as the migration pipeline emits it."""
+    return pyprojectify.PyProject()._emit(metadata.ProjectMetadata.from_setup(setup_kwargs), backend, '<test>')
+
+
+def test_emit_optional_dependencies():
+    """Extras become optional dependency groups instead of being merged into the dependencies."""
+    setup_py = {
+        'name': 'project',
+        'install_requires': 'click>=7\nrequests[socks]',
+        'extras_require': {'test': ['pytest>=3'], 'docs': 'sphinx', 'win:sys_platform == "win32"': ['pywin32'],
+                           ':python_version < "3.8"': ['importlib-metadata']},
+        'python_requires': '>=3.6',
+    }
+    pyproject = _emit(setup_py)
+    assert pyproject['project']['requires-python'] == '>=3.6'
+    # a key without a group is a conditional dependency of the project itself
+    assert pyproject['project']['dependencies'] == ['click>=7', 'requests[socks]',
+                                                    'importlib-metadata; python_version < "3.8"']
+    assert pyproject['project']['optional-dependencies'] == {
+        'test': ['pytest>=3'],
+        'docs': ['sphinx'],
+        'win': ['pywin32; sys_platform == "win32"'],
+    }
+    assert 'dependencies' not in pyproject and 'optional-dependencies' not in pyproject
+
+
+def test_emitters(tmp_path):
+    """One parse of a project is rendered for every backend."""
+    import toml
+    from pyprojectify import emitters
+
+    (tmp_path / 'src' / 'app').mkdir(parents=True)
+    (tmp_path / 'src' / 'app' / '__init__.py').write_text('')
+    (tmp_path / 'README.md').write_text('# App\n')
+    (tmp_path / 'setup.py').write_text(
+        "from setuptools import setup\n"
+        "setup(name='my-app', version='1.0', author='Jane', author_email='jane@example.com',\n"
+        "      long_description=open('README.md').read(), packages=['app'], package_dir={'': 'src'},\n"
+        "      python_requires='>=3.7', install_requires=['click>=7'], extras_require={'yaml': ['pyyaml']},\n"
+        "      url='https://example.com', project_urls={'Source': 'https://example.com/src'},\n"
+        "      entry_points={'console_scripts': ['app=app.cli:main']})\n")
+    assert {'setuptools', 'poetry', 'flit', 'hatch'} <= set(emitters.backends())
+    with pytest.raises(ValueError):
+        emitters.get_emitter('nope')
+
+    events = []
+    project = pyprojectify.PyProject(tmp_path)
+    project.add_hook(events.append)
+    rendered = {backend: toml.loads(text) for backend, text in
+                project.render(['setuptools', 'poetry', 'flit', 'hatch']).items()}
+    assert [event.stage for event in events if event.phase == 'end'].count('parse') == 1
+    assert [event.stage for event in events if event.phase == 'end'].count('emit') == 4
+
+    assert rendered['setuptools']['tool']['setuptools']['package-dir'] == {'': 'src'}
+    assert rendered['setuptools']['project']['urls'] == {'Homepage': 'https://example.com',
+                                                         'Source': 'https://example.com/src'}
+    poetry = rendered['poetry']['tool']['poetry']
+    assert rendered['poetry']['build-system']['build-backend'] == 'poetry.core.masonry.api'
+    assert poetry['authors'] == ['Jane <jane@example.com>']
+    assert poetry['packages'] == [{'include': 'app', 'from': 'src'}]
+    assert poetry['dependencies'] == {'python': '>=3.7', 'click': '>=7', 'pyyaml': {'version': '*', 'optional': True}}
+    assert poetry['extras'] == {'yaml': ['pyyaml']}
+    assert poetry['scripts'] == {'app': 'app.cli:main'}
+    assert poetry['homepage'] == 'https://example.com'
+    assert poetry['urls'] == {'Source': 'https://example.com/src'}
+    assert rendered['flit']['project']['authors'] == [{'name': 'Jane', 'email': 'jane@example.com'}]
+    assert rendered['flit']['tool']['flit']['module'] == {'name': 'app'}
+    assert rendered['hatch']['project']['dependencies'] == ['click>=7']
+    assert rendered['hatch']['tool']['hatch']['build']['targets']['wheel'] == {'packages': ['src/app']}
+
+    out = tmp_path / 'out'
+    result = CliRunner().invoke(cli.main, ['render', '--backend', 'poetry', '--backend', 'hatch', '-o', str(out),
+                                           str(tmp_path)])
+    assert result.exit_code == 0, result.output
+    assert (out / tmp_path.name / 'poetry.toml').is_file() and (out / tmp_path.name / 'hatch.toml').is_file()
+
+
+@pytest.mark.parametrize('license, expected', [
+    ('MIT license', 'MIT'),
+    ('The MIT License', 'MIT'),
+    ('apache-2.0', 'Apache-2.0'),
+    ('GPLv3+', 'GPL-3.0-or-later'),
+    ('mit or (apache-2.0 and bsd-3-clause)', 'MIT OR (Apache-2.0 AND BSD-3-Clause)'),
+    ('GPL-2.0-or-later with Classpath-exception-2.0', 'GPL-2.0-or-later WITH Classpath-exception-2.0'),
+    ('Proprietary', None),
+    ('BSD', None),
+    ('Apache License', None),
+    ('MIT AND', None),
+])
+def test_spdx_expression(license, expected):
+    assert trove.spdx_expression(license) == expected
+
+
+def test_check_classifiers(caplog):
+    """Deprecated classifiers are replaced and misspelled ones reported with a suggestion."""
+    assert 'Programming Language :: Python :: 3' in trove.classifiers()
+    assert set(trove.index_versions()) == {trove.CLASSIFIERS_FILE_, trove.LICENSES_FILE_}
+    deprecated = next(classifier for classifier, replacements in trove.deprecated_classifiers().items()
+                      if replacements)
+    checked = trove.check_classifiers(['Programming Langauge :: Python :: 3', deprecated, 'Private :: Do Not Upload'])
+    assert checked == ['Programming Langauge :: Python :: 3'] + list(trove.deprecated_classifiers()[deprecated]) + [
+        'Private :: Do Not Upload']
+    assert "did you mean 'Programming Language :: Python :: 3'?" in caplog.text
+    assert 'is deprecated' in caplog.text
+
+    pyproject = _emit({'name': 'project', 'license': 'MIT license'})
+    assert pyproject['project']['license'] == {'text': 'MIT'}
+    # an ambiguous name is kept and reported with the identifiers it may stand for
+    pyproject = _emit({'name': 'project', 'license': 'BSD License'})
+    assert pyproject['project']['license'] == {'text': 'BSD License'}
+    assert "License 'BSD License' is ambiguous, did you mean BSD-3-Clause or BSD-2-Clause" in caplog.text
+
+
+def test_verify(tmp_path):
+    """Core metadata of setup.py and of the generated [project] table are compared field by field."""
+    (tmp_path / 'README.md').write_text('# App\n')
+    (tmp_path / 'setup.py').write_text(
+        "from setuptools import setup\n"
+        "setup(name='app', version='1.0', author='Jane', author_email='jane@example.com', license='MIT',\n"
+        "      long_description=open('README.md').read(), long_description_content_type='text/markdown',\n"
+        "      keywords='app, cli', python_requires='>=3.7,<4', url='https://example.com',\n"
+        "      install_requires=['Click >= 7', 'pywin32; sys_platform == \"win32\"'],\n"
+        "      extras_require={'yaml': ['PyYAML'], 'yaml:python_version < \"3.8\"': ['importlib_metadata']},\n"
+        "      entry_points={'console_scripts': ['app = app.cli:main'], 'app.plugins': ['x = app.x']})\n")
+    project = pyprojectify.PyProject(tmp_path)
+    assert project.verify() == []
+    assert project.verify('hatch') == []
+    with pytest.raises(ValueError):
+        project.verify('poetry')
+
+    setup_py = (tmp_path / 'setup.py').read_text()
+    (tmp_path / 'setup.py').write_text(setup_py.replace(
+        "license='MIT'", "license='MIT license', project_urls={'Source': 'https://example.com/src'}"))
+    project = pyprojectify.PyProject(tmp_path)
+    assert [difference.field for difference in project.verify()] == ['license']
+
+    result = CliRunner().invoke(cli.main, ['verify', '--jobs', '1', str(tmp_path)])
+    assert result.exit_code == 1
+    assert "license: 'MIT license' != 'MIT'" in result.output
+    result = CliRunner().invoke(cli.main, ['verify', '--backend', 'poetry', str(tmp_path)])
+    assert result.exit_code == 2 and 'no [project] table' in result.output
+
+
+def test_migrate_merge(tmp_path):
+    """Merging into an existing pyproject.toml only rewrites the values that changed."""
+    import difflib
+    import toml
+
+    (tmp_path / 'setup.py').write_text(
+        "from setuptools import setup\n"
+        "setup(name='app', version='1.1', install_requires=['click>=7'], packages=['app'],\n"
+        "      entry_points={'console_scripts': ['app=app.cli:main']})\n")
+    existing = (
+        "# edited by hand\n"
+        "[build-system]\n"
+        "requires = [\"setuptools>=61.0\", \"wheel\"]\n"
+        "build-backend = \"setuptools.build_meta\"\n"
+        "\n"
+        "[project]\n"
+        "name = \"app\"  # the name\n"
+        "version = \"1.0\"\n"
+        "dependencies = [\n"
+        "    \"click>=7\",  # cli\n"
+        "]\n"
+        "\n"
+        "[tool.black]\n"
+        "line-length = 100\n")
+    (tmp_path / 'pyproject.toml').write_text(existing)
+    pyprojectify.PyProject(tmp_path, merge=True).migrate()
+    merged = (tmp_path / 'pyproject.toml').read_text()
+    assert not (tmp_path / 'pyproject.toml.bak').exists()
+    removed = [line for line in difflib.ndiff(existing.splitlines(), merged.splitlines()) if line.startswith('- ')]
+    assert removed == ['- version = "1.0"']
+    pyproject = toml.loads(merged)
+    assert pyproject['project']['scripts'] == {'app': 'app.cli:main'}
+    assert pyproject['tool']['black'] == {'line-length': 100}
+    assert pyproject['tool']['setuptools'] == {'packages': ['app']}
+
+    mtime = (tmp_path / 'pyproject.toml').stat().st_mtime_ns
+    events = []
+    project = pyprojectify.PyProject(tmp_path, merge=True)
+    project.add_hook(events.append)
+    project.migrate()
+    assert (tmp_path / 'pyproject.toml').stat().st_mtime_ns == mtime
+    assert [event.nbytes for event in events if event.stage == 'write' and event.phase == 'end'] == [0]
+
+    assert merge.merge_pyproject('[tool.black]\nx = 1\n', {'project': {'name': 'app'}}) == (
+        '[project]\nname = "app"\n\n[tool.black]\nx = 1\n')
+    # a backend without a [project] table leaves the existing one alone
+    pyprojectify.PyProject(tmp_path, backend='poetry', merge=True).migrate()
+    pyproject = toml.load(str(tmp_path / 'pyproject.toml'))
+    assert pyproject['project'] == toml.loads(merged)['project']
+    assert pyproject['build-system']['build-backend'] == 'poetry.core.masonry.api'
+    assert pyproject['tool']['poetry']['name'] == 'app'
+    with pytest.raises(merge.MergeError):
+        merge.merge_pyproject('[project\n', {'project': {'name': 'app'}})
+
+
+DECLARATIVE_SETUP_CFG = '''
+[metadata]
+name = declarative
+version = attr: declarative.__version__
+description = A declarative project
+long_description = file: README.rst
+classifiers =
+    Programming Language :: Python :: 3
+project_urls =
+    Source = https://example.com/src
+    Tracker = https://example.com/issues?state=open
+
+[options]
+package_dir =
+    = src
+packages = find:
+install_requires =
+    click>=7
+python_requires = >=3.6
+
+[options.packages.find]
+where = src
+
+[options.package_data]
+* = *.txt
+declarative = data/*.json, py.typed
+
+[options.extras_require]
+test = pytest>=3
+
+[options.entry_points]
+console_scripts =
+    declarative = declarative.cli:main
+'''
+
+
+@pytest.mark.parametrize('setup_py', [None, 'from setuptools import setup\n\nsetup()\n'])
+def test_migrate_declarative_setup_cfg(tmp_path, setup_py):
+    """setup.cfg metadata is read, with attr: and file: resolved, without parsing a bare setup.py."""
+    import toml
+
+    (tmp_path / 'src' / 'declarative').mkdir(parents=True)
+    (tmp_path / 'src' / 'declarative' / '__init__.py').write_text("__version__ = '1.' + '2'\n")
+    (tmp_path / 'README.rst').write_text('Declarative\n')
+    (tmp_path / 'setup.cfg').write_text(DECLARATIVE_SETUP_CFG)
+    if setup_py:
+        (tmp_path / 'setup.py').write_text(setup_py)
+    assert [entry.path for entry in discovery.discover_projects([tmp_path])] == [tmp_path]
+
+    events = []
+    project = pyprojectify.PyProject(tmp_path)
+    project.add_hook(events.append)
+    project.migrate()
+    assert not any(event.stage in ('parse', 'evaluate') for event in events)
+    pyproject = toml.load(str(tmp_path / 'pyproject.toml'))
+    assert pyproject['project']['name'] == 'declarative'
+    assert pyproject['project']['version'] == '1.2'
+    assert pyproject['project']['readme'] == {'file': 'README.rst', 'content-type': 'text/x-rst'}
+    assert pyproject['project']['classifiers'] == ['Programming Language :: Python :: 3']
+    assert pyproject['project']['urls'] == {'Source': 'https://example.com/src',
+                                            'Tracker': 'https://example.com/issues?state=open'}
+    assert pyproject['project']['requires-python'] == '>=3.6'
+    assert pyproject['project']['dependencies'] == ['click>=7']
+    assert pyproject['project']['optional-dependencies'] == {'test': ['pytest>=3']}
+    assert pyproject['project']['scripts'] == {'declarative': 'declarative.cli:main'}
+    assert pyproject['tool']['setuptools']['packages'] == ['declarative']
+    assert pyproject['tool']['setuptools']['package-dir'] == {'': 'src'}
+    assert pyproject['tool']['setuptools']['package-data'] == {'': ['*.txt'],
+                                                               'declarative': ['data/*.json', 'py.typed']}
+
+
+def test_read_setup_cfg_keeps_key_case():
+    """Package names, extras and entry point names keep their case, as with setuptools."""
+    from pyprojectify.setup_cfg import read_setup_cfg
+
+    config = pyprojectify.PyProject._parse_config_string(
+        "[metadata]\nname = MyPkg\n[options]\npackages = MyPkg\n"
+        "[options.package_data]\nMyPkg = data/*.json\n"
+        "[options.extras_require]\nPDF = reportlab\n"
+        "[options.entry_points]\nconsole_scripts =\n    MyTool = MyPkg.cli:main\n", '.cfg')
+    setup_kwargs = read_setup_cfg(config, None)
+    assert setup_kwargs['package_data'] == {'MyPkg': ['data/*.json']}
+    assert setup_kwargs['extras_require'] == {'PDF': ['reportlab']}
+    assert setup_kwargs['entry_points'] == {'console_scripts': ['MyTool=MyPkg.cli:main']}
+
+
+def test_project_metadata():
+    """Metadata is normalized into slotted, shared values, which survive pickling."""
+    import pickle
+
+    def setup_kwargs():
+        return {
+            'name': 'project', 'license': ''.join(['MIT ', 'license']),
+            'classifiers': [''.join(['Programming Language', ' :: Python :: 3'])],
+            'install_requires': ['click>=7'], 'extras_require': {'test:python_version>"3"': ['pytest']},
+            'entry_points': '[console_scripts]\nproject = project.cli:main\n[other]\nx=y\n',
+            'package_data': {'project': ['*.txt']}, 'author': None,
+        }
+
+    first = metadata.ProjectMetadata.from_setup(setup_kwargs())
+    second = metadata.ProjectMetadata.from_setup(setup_kwargs())
+    assert not hasattr(first, '__dict__')
+    assert first == second
+    assert first.license is second.license
+    assert first.classifiers is second.classifiers
+    assert first.requirements[0] is second.requirements[0]
+    assert first.author == '' and first.version is None
+    assert first.optional_requirements[0][1][0].marker == 'python_version>"3"'
+    assert list(first.scripts()) == [metadata.EntryPoint('console_scripts', 'project', 'project.cli:main')]
+    assert first.package_data == (('project', ('*.txt',)),)
+
+    copy = pickle.loads(pickle.dumps(first))
+    assert copy == first
+    assert copy.license is first.license
+    assert copy.requirements is first.requirements
+
+
+def test_long_description_file_references(tmp_path):
+    """Files read into long_description become readme references, without being read."""
+    (tmp_path / 'README.md').write_text('# Readme\n')
+    (tmp_path / 'CHANGES.md').write_text('# Changes\n')
+    (tmp_path / 'setup.py').write_text(
+        "import os\n"
+        "from pathlib import Path\n"
+        "from setuptools import setup\n"
+        "here = os.path.abspath(os.path.dirname(__file__))\n"
+        "with open(os.path.join(here, 'README.md'), encoding='utf-8') as f:\n"
+        "    readme = f.read()\n"
+        "changes = (Path(__file__).parent / 'CHANGES.md').read_text()\n"
+        "setup(name='files', long_description=readme, long_description_content_type='text/markdown')\n"
+    )
+    project = pyprojectify.PyProject(tmp_path)
+    setup_py = project._parse_setup_py(tmp_path / 'setup.py')
+    pyproject = _emit(setup_py)
+    assert pyproject['project']['readme'] == {'file': 'README.md', 'content-type': 'text/markdown'}
+    assert 'long_description' not in pyproject['project']
+
+    setup_py['long_description'] = setup_py['long_description'] + '\n\n' + project._evaluator.resolve('changes', 99)
+    pyproject = _emit(setup_py)
+    assert pyproject['project']['dynamic'] == ['version', 'readme']
+    assert pyproject['tool']['setuptools']['dynamic']['readme']['file'] == ['README.md', 'CHANGES.md']
+
+    (tmp_path / 'README.md').unlink()
+    assert project._check_file_references(sources.DirectorySource(tmp_path), setup_py)['long_description'] is None
+
+
+@pytest.mark.parametrize('read', [
+    "open('README.md').read()",
+    "io.open('README.md', encoding='utf-8').read()",
+    "codecs.open('README.md', 'r', 'utf-8').read()",
+    "Path('README.md').open().read()",
+])
+def test_long_description_file_functions(tmp_path, read):
+    """The functions and methods opening a file for long_description all give a readme reference."""
+    (tmp_path / 'setup.py').write_text(
+        "import codecs\nimport io\nfrom pathlib import Path\nfrom setuptools import setup\n"
+        "setup(name='files', long_description={})\n".format(read))
+    project = pyprojectify.PyProject(tmp_path)
+    assert project._parse_setup_py(tmp_path / 'setup.py')['long_description'] == evaluator.FileContent(('README.md',))
+    assert project._unresolved == []
+
+
+def test_file_read_outside_long_description(tmp_path):
+    """A file read for another field than long_description is left unresolved, without breaking the migration."""
+    (tmp_path / 'VERSION').write_text('1.2.3\n')
+    (tmp_path / 'setup.py').write_text(
+        "from setuptools import setup\n"
+        "meta = dict(description=open('DESC').read())\n"
+        "setup(name='files', version=open('VERSION').read(), **meta)\n")
+    project = pyprojectify.PyProject(tmp_path)
+    setup_py = project._parse_setup_py(tmp_path / 'setup.py')
+    assert setup_py['version'] is None and setup_py['description'] is None
+    assert project._unresolved == ['version', 'description']
+    project.migrate()
+    assert 'name = "files"' in (tmp_path / 'pyproject.toml').read_text()
+
+
+@pytest.mark.parametrize('kwargs, expected', [
+    ({}, ['app', 'app.sub', 'tests']),
+    ({'exclude': ['tests', 'app.sub']}, ['app']),
+    ({'include': ['app*']}, ['app', 'app.sub']),
+    ({'where': 'src'}, ['lib', 'lib.core']),
+    ({'where': 'src', 'namespace': True}, ['lib', 'lib.core', 'nspkg', 'nspkg.plugin']),
+])
+def test_find_packages(tmp_path, kwargs, expected):
+    """Packages are found like setuptools does, including src layouts and PEP 420 namespaces."""
+    for package in ('app', 'app/sub', 'app/sub/__pycache__', 'tests', 'src/lib', 'src/lib/core',
+                    'src/nspkg/plugin', 'docs/_static'):
+        (tmp_path / package).mkdir(parents=True)
+        if package.split('/')[-1] not in ('__pycache__', 'nspkg', 'plugin', '_static'):
+            (tmp_path / package / '__init__.py').write_text('')
+    (tmp_path / 'app' / 'not.a.package').mkdir()
+    assert packages.find_packages(str(tmp_path), **kwargs) == expected
+
+
+def test_parse_setup_py_find_packages(tmp_path):
+    """find_packages() calls are evaluated to a finder resolved against the project directory."""
+    (tmp_path / 'setup.py').write_text(
+        "from setuptools import setup, find_namespace_packages\n"
+        "setup(name='ns', packages=find_namespace_packages(where='src', include=['ns.*']))\n")
+    (tmp_path / 'src' / 'ns' / 'plugin').mkdir(parents=True)
+    project = pyprojectify.PyProject(tmp_path)
+    setup_py = project._parse_setup_py(tmp_path / 'setup.py')
+    assert setup_py['packages'] == packages.FindPackages('src', ('ns.*',), (), True)
+    assert project._find_packages(sources.DirectorySource(tmp_path), setup_py)['packages'] == ['ns.plugin']
+
+
+MANIFEST_FILES = ['README.rst', 'LICENSE', 'setup.py', 'notes.txt', 'docs/index.rst', 'docs/conf.py',
+                  'docs/_build/index.html', 'pkg/__init__.py', 'pkg/__init__.pyc', 'pkg/data/a.json',
+                  'pkg/data/deep/b.json', 'pkg/data/deep/c.csv', 'tests/test_a.py', 'tests/data/x.txt']
+
+
+@pytest.mark.parametrize('lines, include, exclude', [
+    (['include README.rst LICENSE  # two patterns'], ['LICENSE', 'README.rst'], []),
+    (['include *.txt', 'include docs/*.rst'], ['docs/index.rst', 'notes.txt'], []),
+    (['recursive-include pkg *.json *.csv', 'recursive-exclude pkg/data/deep *.csv'],
+     ['pkg/data/a.json', 'pkg/data/deep/b.json'], ['pkg/data/deep/c.csv']),
+    (['global-include *.txt', 'global-exclude tests/*'], ['notes.txt', 'tests/data/x.txt'], ['tests/test_a.py']),
+    (['graft docs', 'prune docs/_build'], ['docs/conf.py', 'docs/index.rst'], ['docs/_build/index.html']),
+    (['graft pkg', 'global-exclude *.py[co]', 'include pkg/__init__.pyc'],
+     ['pkg/__init__.py', 'pkg/__init__.pyc', 'pkg/data/a.json', 'pkg/data/deep/b.json', 'pkg/data/deep/c.csv'], []),
+    (['recursive-include tests \\', '    *.py', 'unknown-command x', 'include'], ['tests/test_a.py'], []),
+])
+def test_manifest(lines, include, exclude):
+    """MANIFEST.in commands apply in order, the last rule matching a file deciding whether it is included."""
+    rules = manifest.parse_manifest(lines)
+    assert manifest.resolve_manifest(rules, MANIFEST_FILES) == (include, exclude)
+
+
+def test_manifest_snapshot(tmp_path):
+    for path in MANIFEST_FILES + ['.git/config', 'build/lib/pkg/__init__.py', 'pkg.egg-info/PKG-INFO']:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text('')
+    assert sorted(manifest.snapshot(str(tmp_path))) == sorted(MANIFEST_FILES)
+
+
+@pytest.fixture
+def sdists(tmp_path):
+    """A .tar.gz and a .zip sdist of proj2, and a broken archive."""
+    import tarfile
+    import zipfile
+
+    archives = tmp_path / 'archives'
+    archives.mkdir()
+    with tarfile.open(str(archives / 'proj2-0.1.0.tar.gz'), 'w:gz') as tar:
+        tar.add(str(TESTS_DIR / 'proj2'), arcname='proj2-0.1.0')
+    with zipfile.ZipFile(str(archives / 'proj2-0.1.0.zip'), 'w') as zf:
+        for path in sorted((TESTS_DIR / 'proj2').rglob('*')):
+            if path.is_file():
+                zf.write(str(path), 'proj2-0.1.0/' + path.relative_to(TESTS_DIR / 'proj2').as_posix())
+    (archives / 'broken.tar.gz').write_bytes(b'not an archive')
+    return archives
+
+
+def test_archive_source(sdists):
+    """Archives are read without extraction, only the input files are kept in memory."""
+    source = sources.ArchiveSource(sdists / 'proj2-0.1.0.tar.gz')
+    assert source.has('setup.py') and source.has('MANIFEST.in') and not source.has('setup.cfg')
+    assert sorted(source._contents) == ['MANIFEST.in', 'setup.py']
+    assert 'proj2/__init__.py' in source.files()
+    assert source.find_packages(packages.FindPackages()) == ['proj2']
+
+
+def test_migrate_archives(sdists):
+    """Archives convert like the directory they come from, broken ones are reported."""
+    import json
+
+    project = sdists.parent / 'proj2'
+    shutil.copytree(str(TESTS_DIR / 'proj2'), str(project))
+    pyprojectify.PyProject(project).migrate()
+    expected = (project / 'pyproject.toml').read_text()
+
+    output = sdists.parent / 'output'
+    jsonl = sdists.parent / 'results.jsonl'
+    runner = CliRunner()
+    result = runner.invoke(cli.main, ['archives', '--jobs', '2', '--output-dir', str(output), '--jsonl', str(jsonl),
+                                      str(sdists)])
+    assert result.exit_code == 1
+    assert result.output.rstrip().endswith('0 ok, 2 with warnings, 1 failed')
+    assert (output / 'proj2-0.1.0.toml').read_text() == expected
+    lines = {Path(line['archive']).name: line for line in map(json.loads, jsonl.read_text().splitlines())}
+    assert lines['proj2-0.1.0.zip']['pyproject'] == expected
+    assert lines['broken.tar.gz']['status'] == 'error'
+
+
+def test_from_sources(monkeypatch):
+    """In-memory inputs are converted without touching the file system."""
+    import builtins
+
+    def no_open(*args, **kwargs):
+        raise AssertionError('file opened: {}'.format(args[0]))
+
+    project = pyprojectify.PyProject.from_sources(
+        setup_py="from setuptools import setup, find_packages\n"
+                 "setup(name='memory', version='0.1', packages=find_packages(exclude=['tests']),\n"
+                 "      long_description=open('README.md').read(), install_requires=['click>=7'])\n",
+        manifest_in='include README.md\nrecursive-exclude tests *\n',
+        files=['setup.py', 'README.md', 'memory/__init__.py', 'tests/__init__.py', 'tests/test_memory.py'])
+    monkeypatch.setattr(builtins, 'open', no_open)
+    pyproject = project.to_dict()
+    assert pyproject['project']['name'] == 'memory'
+    assert pyproject['project']['readme'] == {'file': 'README.md', 'content-type': 'text/markdown'}
+    assert pyproject['project']['dependencies'] == ['click>=7']
+    assert pyproject['tool']['setuptools']['packages'] == ['memory']
+    assert project.to_dict('poetry')['tool']['poetry']['include'] == ['README.md']
+    assert 'name = "memory"' in project.to_toml()
+    with pytest.raises(ValueError):
+        project.migrate()
+
+
+def test_server():
+    """JSON-RPC requests are answered one per line until shutdown."""
+    import io
+    import json
+
+    requests = [
+        {'jsonrpc': '2.0', 'id': 1, 'method': 'convert',
+         'params': {'setup_cfg': '[metadata]\nname = served\nversion = 2.0\n', 'format': 'json'}},
+        {'jsonrpc': '2.0', 'id': 2, 'method': 'convert', 'params': {'setup.py': ''}},
+        {'jsonrpc': '2.0', 'method': 'version'},
+        {'jsonrpc': '2.0', 'id': 3, 'method': 'unknown'},
+        {'jsonrpc': '2.0', 'id': 4, 'method': 'shutdown'},
+        {'jsonrpc': '2.0', 'id': 5, 'method': 'version'},
+    ]
+    stdin = io.StringIO('\n'.join(json.dumps(request) for request in requests) + '\nnot json\n')
+    stdout = io.StringIO()
+    assert server.serve(stdin, stdout) == 5
+    responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert [response['id'] for response in responses] == [1, 2, 3, 4]
+    assert responses[0]['result']['pyproject']['project'] == {'name': 'served', 'version': '2.0'}
+    assert responses[1]['error']['code'] == server.INVALID_PARAMS_
+    assert responses[2]['error']['code'] == server.METHOD_NOT_FOUND_
+    assert server.handle('not json')[0]['error']['code'] == server.PARSE_ERROR_
+    assert server.handle('{"id": 1, "method": "version"}')[0]['result'] == pyprojectify_version
+
+
+def _git(repo, *args):
+    subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com', *args], cwd=str(repo),
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+@pytest.mark.skipif(shutil.which('git') is None, reason='git is not installed')
+def test_migrate_since(monorepo):
+    """Only the projects owning a file changed since the revision are migrated."""
+    packages_dir = monorepo / 'packages'
+    shutil.rmtree(str(packages_dir / 'broken'))
+    _git(monorepo, 'init', '-q', '-b', 'main')
+    _git(monorepo, 'add', '.')
+    _git(monorepo, 'commit', '-q', '-m', 'initial')
+    _git(monorepo, 'checkout', '-q', '-b', 'feature')
+
+    (packages_dir / 'proj1' / 'setup.py').write_text((packages_dir / 'proj1' / 'setup.py').read_text() + '\n')
+    _git(monorepo, 'commit', '-q', '-am', 'change proj1')
+    (packages_dir / 'proj3' / 'notes.txt').write_text('untracked\n')
+    (monorepo / 'README').write_text('outside any project\n')
+
+    entries = list(vcs.changed_projects([packages_dir], 'main'))
+    assert [entry.path for entry in entries] == [packages_dir / 'proj1', packages_dir / 'proj3']
+    assert entries[0].has_setup_py
+    assert list(vcs.changed_projects([packages_dir], 'main', ignore=['proj3'])) == entries[:1]
+
+    results = sorted(Path(r.path).name for r in batch.migrate_many([packages_dir], jobs=1, since='main'))
+    assert results == ['proj1', 'proj3']
+    assert not (packages_dir / 'proj2' / 'pyproject.toml').exists()
+
+    result = CliRunner().invoke(cli.main, ['migrate', '--since', 'no-such-rev', str(packages_dir)])
+    assert result.exit_code == 1
+    assert 'no-such-rev' in result.output
+
+
+@pytest.mark.skipif(shutil.which('git') is None, reason='git is not installed')
+def test_migrate_since_cached(tmp_path):
+    """A project changed only in a module read by attr: is migrated again despite the cache."""
+    import toml
+
+    project = tmp_path / 'packages' / 'project'
+    (project / 'pkg').mkdir(parents=True)
+    (project / 'pkg' / '__init__.py').write_text("__version__ = '1.0'\n")
+    (project / 'setup.cfg').write_text('[metadata]\nname = pkg\nversion = attr: pkg.__version__\n\n'
+                                       '[options]\npackages = find:\n')
+    migration_cache = cache.MigrationCache(tmp_path / 'cache', max_size=10 ** 6)
+    assert [r.status for r in batch.migrate_many([project], jobs=1, cache=migration_cache)] == ['ok']
+    _git(tmp_path, 'init', '-q', '-b', 'main')
+    _git(tmp_path, 'add', '.')
+    _git(tmp_path, 'commit', '-q', '-m', 'initial')
+
+    (project / 'pkg' / '__init__.py').write_text("__version__ = '2.0'\n")
+    results = list(batch.migrate_many([tmp_path / 'packages'], jobs=1, cache=migration_cache, since='main'))
+    assert [(Path(r.path), r.cached) for r in results] == [(project, False)]
+    assert toml.load(str(project / 'pyproject.toml'))['project']['version'] == '2.0'
+
+
+def test_watch(monorepo):
+    """A burst of saves migrates the changed project once, an unchanged save does not."""
+    import queue
+    import threading
+
+    packages_dir = monorepo / 'packages'
+    watcher = watch.ProjectWatcher([packages_dir], debounce=0.2, interval=0.05, polling=True)
+    assert len(watcher.projects) == 4
+    results: 'queue.Queue[batch.MigrationResult]' = queue.Queue()
+    thread = threading.Thread(target=watcher.run, args=(results.put,))
+    thread.start()
+    try:
+        setup_py = packages_dir / 'proj1' / 'setup.py'
+        content = setup_py.read_text()
+        for i in range(3):
+            setup_py.write_text(content + '#' * (i + 1) + '\n')
+            time.sleep(0.05)
+        result = results.get(timeout=10)
+        assert Path(result.path) == packages_dir / 'proj1'
+        assert result.status in ('ok', 'warning')
+
+        # same content again: no migration
+        setup_py.write_text(content + '###\n')
+        (packages_dir / 'proj2' / 'MANIFEST.in').write_text('include README.rst\n')
+        result = results.get(timeout=10)
+        assert Path(result.path) == packages_dir / 'proj2'
+        with pytest.raises(queue.Empty):
+            results.get(timeout=0.5)
+    finally:
+        watcher.stop()
+        thread.join(timeout=10)
+    assert not thread.is_alive()
+
+
+def test_metadata_index(monorepo):
+    """Projects are indexed incrementally and queried without being parsed."""
+    packages_dir = monorepo / 'packages'
+    index_path = monorepo / 'index.sqlite3'
+    with index.MetadataIndex(index_path) as metadata_index:
+        assert metadata_index.update([packages_dir], jobs=1) == (4, 0, 0, 1)
+        assert metadata_index.update([packages_dir], jobs=1) == (0, 4, 0, 0)
+        (packages_dir / 'proj1' / 'setup.py').write_text(
+            "from setuptools import setup\n"
+            "setup(name='Proj_One', version='1.0', install_requires=['requests>=2.20', 'Click'],\n"
+            "      extras_require={'http': ['requests[socks]<2.30; python_version<\"3.8\"']},\n"
+            "      entry_points={'console_scripts': ['proj-one=proj1.cli:main']})\n")
+        shutil.rmtree(str(packages_dir / 'broken'))
+        assert metadata_index.update([packages_dir], jobs=1) == (1, 2, 1, 0)
+
+        proj1 = str(packages_dir / 'proj1')
+        assert metadata_index.depends('requests<2.28') == [
+            index.Dependency(proj1, '', 'requests', '>=2.20', ''),
+            index.Dependency(proj1, 'http', 'requests', '<2.30', 'python_version<"3.8"'),
+        ]
+        assert metadata_index.depends('requests>=2.30') == [index.Dependency(proj1, '', 'requests', '>=2.20', '')]
+        assert metadata_index.depends('click')[0].specifier == ''
+        assert proj1 in metadata_index.missing('requires_python')
+        assert metadata_index.entry_points('proj-one') == [
+            index.EntryPoint(proj1, 'console_scripts', 'proj-one', 'proj1.cli:main')]
+        assert metadata_index.execute('SELECT name FROM projects WHERE path = ?', [proj1]) == [('Proj_One',)]
+
+    runner = CliRunner()
+    result = runner.invoke(cli.main, ['query', '--index', str(index_path), 'depends', 'requests<2.28'])
+    assert result.exit_code == 0
+    assert result.output.splitlines()[0] == '{}\trequests>=2.20'.format(proj1)
+    result = runner.invoke(cli.main, ['query', '--index', str(index_path), 'sql', 'DELETE FROM projects'])
+    assert result.exit_code == 1
+    result = runner.invoke(cli.main, ['query', '--index', str(monorepo / 'none.sqlite3'), 'missing', 'version'])
+    assert result.exit_code == 1